@@ -27,7 +27,6 @@
 
 import config
 import time
-import numpy as np
 
 LCD_1IN44 = 1
 LCD_1IN8 = 0
@@ -56,6 +55,31 @@ D2U_L2R = 7
 D2U_R2L = 8
 SCAN_DIR_DFT = U2D_R2L
 
+#ST7735R register initialization: (register, parameter bytes)
+INIT_SEQUENCE = (
+	(0xB1, b"\x01\x2C\x2D"),	#ST7735R Frame Rate
+	(0xB2, b"\x01\x2C\x2D"),
+	(0xB3, b"\x01\x2C\x2D\x01\x2C\x2D"),
+	(0xB4, b"\x07"),	#Column inversion
+	(0xC0, b"\xA2\x02\x84"),	#ST7735R Power Sequence
+	(0xC1, b"\xC5"),
+	(0xC2, b"\x0A\x00"),
+	(0xC3, b"\x8A\x2A"),
+	(0xC4, b"\x8A\xEE"),
+	(0xC5, b"\x0E"),	#VCOM
+	(0xE0, bytes((0x0f, 0x1a, 0x0f, 0x18, 0x2f, 0x28, 0x20, 0x22,	#ST7735R Gamma Sequence
+		0x1f, 0x1b, 0x23, 0x37, 0x00, 0x07, 0x02, 0x10))),
+	(0xE1, bytes((0x0f, 0x1b, 0x0f, 0x17, 0x33, 0x2c, 0x29, 0x2e,
+		0x30, 0x30, 0x39, 0x3f, 0x00, 0x07, 0x03, 0x10))),
+	(0xF0, b"\x01"),	#Enable test command
+	(0xF6, b"\x00"),	#Disable ram power save mode
+	(0x3A, b"\x05"),	#65k mode
+)
+
+#Solid fill buffers by color, one full frame memory of pixels each
+FILL_CACHE_SIZE = 4
+_fill_buffers = {}
+
 
 class LCD(config.RaspberryPi):
 
@@ -83,107 +107,24 @@ class LCD(config.RaspberryPi):
 		self.digital_write(self.GPIO_DC_PIN, True)
 		self.spi_writebyte([Data])
 
-	def LCD_WriteData_NLen16Bit(self, Data, DataLen):
+	def LCD_WriteData_Bytes(self, Data):
+		#Any length of parameter or pixel bytes in one bulk transfer
 		self.digital_write(self.GPIO_DC_PIN, True)
-		for i in range(0, DataLen):
-			self.spi_writebyte([Data >> 8])
-			self.spi_writebyte([Data & 0xff])
-		
-	"""    Common register initialization    """
-	def LCD_InitReg(self):
-		#ST7735R Frame Rate
-		self.LCD_WriteReg(0xB1)
-		self.LCD_WriteData_8bit(0x01)
-		self.LCD_WriteData_8bit(0x2C)
-		self.LCD_WriteData_8bit(0x2D)
+		self.spi_writebytes2(Data)
 
-		self.LCD_WriteReg(0xB2)
-		self.LCD_WriteData_8bit(0x01)
-		self.LCD_WriteData_8bit(0x2C)
-		self.LCD_WriteData_8bit(0x2D)
+	def LCD_WriteCommand(self, Reg, Data=b""):
+		#A register and all of its parameters: one transfer each
+		self.LCD_WriteReg(Reg)
+		if Data:
+			self.LCD_WriteData_Bytes(Data)
 
-		self.LCD_WriteReg(0xB3)
-		self.LCD_WriteData_8bit(0x01)
-		self.LCD_WriteData_8bit(0x2C)
-		self.LCD_WriteData_8bit(0x2D)
-		self.LCD_WriteData_8bit(0x01)
-		self.LCD_WriteData_8bit(0x2C)
-		self.LCD_WriteData_8bit(0x2D)
-		
-		#Column inversion 
-		self.LCD_WriteReg(0xB4)
-		self.LCD_WriteData_8bit(0x07)
-		
-		#ST7735R Power Sequence
-		self.LCD_WriteReg(0xC0)
-		self.LCD_WriteData_8bit(0xA2)
-		self.LCD_WriteData_8bit(0x02)
-		self.LCD_WriteData_8bit(0x84)
-		self.LCD_WriteReg(0xC1)
-		self.LCD_WriteData_8bit(0xC5)
-
-		self.LCD_WriteReg(0xC2)
-		self.LCD_WriteData_8bit(0x0A)
-		self.LCD_WriteData_8bit(0x00)
-
-		self.LCD_WriteReg(0xC3)
-		self.LCD_WriteData_8bit(0x8A)
-		self.LCD_WriteData_8bit(0x2A)
-		self.LCD_WriteReg(0xC4)
-		self.LCD_WriteData_8bit(0x8A)
-		self.LCD_WriteData_8bit(0xEE)
-		
-		self.LCD_WriteReg(0xC5)#VCOM 
-		self.LCD_WriteData_8bit(0x0E)
-		
-		#ST7735R Gamma Sequence
-		self.LCD_WriteReg(0xe0)
-		self.LCD_WriteData_8bit(0x0f)
-		self.LCD_WriteData_8bit(0x1a)
-		self.LCD_WriteData_8bit(0x0f)
-		self.LCD_WriteData_8bit(0x18)
-		self.LCD_WriteData_8bit(0x2f)
-		self.LCD_WriteData_8bit(0x28)
-		self.LCD_WriteData_8bit(0x20)
-		self.LCD_WriteData_8bit(0x22)
-		self.LCD_WriteData_8bit(0x1f)
-		self.LCD_WriteData_8bit(0x1b)
-		self.LCD_WriteData_8bit(0x23)
-		self.LCD_WriteData_8bit(0x37)
-		self.LCD_WriteData_8bit(0x00)
-		self.LCD_WriteData_8bit(0x07)
-		self.LCD_WriteData_8bit(0x02)
-		self.LCD_WriteData_8bit(0x10)
+	def LCD_WriteData_NLen16Bit(self, Data, DataLen):
+		self.LCD_WriteData_Bytes(Data.to_bytes(2, "big") * DataLen)
 
-		self.LCD_WriteReg(0xe1)
-		self.LCD_WriteData_8bit(0x0f)
-		self.LCD_WriteData_8bit(0x1b)
-		self.LCD_WriteData_8bit(0x0f)
-		self.LCD_WriteData_8bit(0x17)
-		self.LCD_WriteData_8bit(0x33)
-		self.LCD_WriteData_8bit(0x2c)
-		self.LCD_WriteData_8bit(0x29)
-		self.LCD_WriteData_8bit(0x2e)
-		self.LCD_WriteData_8bit(0x30)
-		self.LCD_WriteData_8bit(0x30)
-		self.LCD_WriteData_8bit(0x39)
-		self.LCD_WriteData_8bit(0x3f)
-		self.LCD_WriteData_8bit(0x00)
-		self.LCD_WriteData_8bit(0x07)
-		self.LCD_WriteData_8bit(0x03)
-		self.LCD_WriteData_8bit(0x10) 
-		
-		#Enable test command
-		self.LCD_WriteReg(0xF0)
-		self.LCD_WriteData_8bit(0x01)
-		
-		#Disable ram power save mode
-		self.LCD_WriteReg(0xF6)
-		self.LCD_WriteData_8bit(0x00)
-		
-		#65k mode
-		self.LCD_WriteReg(0x3A)
-		self.LCD_WriteData_8bit(0x05)
+	"""    Common register initialization    """
+	def LCD_InitReg(self):
+		for Reg, Data in INIT_SEQUENCE:
+			self.LCD_WriteCommand(Reg, Data)
 
 	#********************************************************************************
 	#function:	Set the display scan and color transfer modes
@@ -272,28 +213,41 @@ class LCD(config.RaspberryPi):
 	#********************************************************************************/
 	def LCD_SetWindows(self, Xstart, Ystart, Xend, Yend):
 		#set the X coordinates
-		self.LCD_WriteReg(0x2A)
-		self.LCD_WriteData_8bit(0x00)
-		self.LCD_WriteData_8bit((Xstart & 0xff) + self.LCD_X_Adjust)
-		self.LCD_WriteData_8bit(0x00)
-		self.LCD_WriteData_8bit(((Xend - 1) & 0xff) + self.LCD_X_Adjust)
+		self.LCD_WriteCommand(0x2A, bytes((
+			0x00, (Xstart & 0xff) + self.LCD_X_Adjust,
+			0x00, ((Xend - 1) & 0xff) + self.LCD_X_Adjust)))
 
 		#set the Y coordinates
-		self.LCD_WriteReg (0x2B)
-		self.LCD_WriteData_8bit(0x00)
-		self.LCD_WriteData_8bit((Ystart & 0xff) + self.LCD_Y_Adjust)
-		self.LCD_WriteData_8bit(0x00)
-		self.LCD_WriteData_8bit(((Yend - 1) & 0xff )+ self.LCD_Y_Adjust)
+		self.LCD_WriteCommand(0x2B, bytes((
+			0x00, (Ystart & 0xff) + self.LCD_Y_Adjust,
+			0x00, ((Yend - 1) & 0xff) + self.LCD_Y_Adjust)))
 
 		self.LCD_WriteReg(0x2C)
 
-	def LCD_Clear(self):
-		#hello
-		_buffer = [0xff]*(self.width * self.height * 2)
-		self.LCD_SetWindows(0, 0, self.width, self.height)
-		self.digital_write(self.GPIO_DC_PIN, True)
-		for i in range(0,len(_buffer),4096):
-			self.spi_writebyte(_buffer[i:i+4096])
+	#/********************************************************************************
+	#function:	Solid color fills
+	#parameter:
+	#	Color   :   RGB565 color (0xFFFF white, 0x0000 black)
+	#********************************************************************************/
+	def LCD_FillBuffer(self, Color):
+		#A full screen of one color, built once and reused for every fill
+		buf = _fill_buffers.get(Color)
+		if buf is None:
+			if len(_fill_buffers) >= FILL_CACHE_SIZE:
+				_fill_buffers.clear()
+			buf = _fill_buffers[Color] = memoryview(Color.to_bytes(2, "big") * (LCD_X_MAXPIXEL * LCD_Y_MAXPIXEL))
+		return buf
+
+	def LCD_FillRect(self, Xstart, Ystart, Xend, Yend, Color):
+		#The controller has no fill command; the window is streamed from the
+		#cached buffer in a single bulk transfer
+		if Xend <= Xstart or Yend <= Ystart:
+			return
+		self.LCD_SetWindows(Xstart, Ystart, Xend, Yend)
+		self.LCD_WriteData_Bytes(self.LCD_FillBuffer(Color)[:(Xend - Xstart) * (Yend - Ystart) * 2])
+
+	def LCD_Clear(self, Color=0xFFFF):
+		self.LCD_FillRect(0, 0, self.width, self.height, Color)
 
 	def LCD_ShowImage(self,Image,Xstart,Ystart):
 		if (Image is None):
@@ -302,12 +256,11 @@ class LCD(config.RaspberryPi):
 		if imwidth != self.width or imheight != self.height:
 			raise ValueError('Image must be same dimensions as display \
 				({0}x{1}).' .format(self.width, self.height))
+		# numpy is imported here so splash.py can load this module quickly
+		import numpy as np
 		img = np.asarray(Image)
 		pix = np.zeros((self.width,self.height,2), dtype = np.uint8)
 		pix[...,[0]] = np.add(np.bitwise_and(img[...,[0]],0xF8),np.right_shift(img[...,[1]],5))
 		pix[...,[1]] = np.add(np.bitwise_and(np.left_shift(img[...,[1]],3),0xE0),np.right_shift(img[...,[2]],3))
-		pix = pix.flatten().tolist()
 		self.LCD_SetWindows(0, 0, self.width , self.height)
-		self.digital_write(self.GPIO_DC_PIN, True)
-		for i in range(0,len(pix),4096):
-			self.spi_writebyte(pix[i:i+4096])
+		self.LCD_WriteData_Bytes(pix.tobytes())
@@ -1,5 +1,8 @@
 """API clients for streaming services."""
 
+import base64
+import threading
+import time
 from pathlib import Path
 
 from utils import Source
@@ -7,9 +10,12 @@ from utils import Source
 import requests
 import logging
 import jellyfin
+import metrics
+import streaming
 from jellyfin.api import Version
-from jellyfin.generated.api_10_11 import BaseItemKind
-from app_config import JELLYFIN, ABS
+from jellyfin.generated.api_10_11 import BaseItemKind, ItemFields
+from app_config import JELLYFIN, ABS, STREAMING
+from library import SourceAdapter
 
 logger = logging.getLogger(__name__)
 
@@ -19,11 +25,50 @@ JELLYFIN_TIMEOUT = 15
 ABS_TIMEOUT = 15
 
 
-class JellyfinClient:
+def download_file(url, local_path, limiter=None):
+    """Stream url to local_path, returning the bytes written.
+
+    Writes to a .part file first so an interrupted download is never
+    mistaken for a complete one. limiter, if given, is called with each
+    chunk's size (see offline_sync.TokenBucket).
+    """
+    local_path = Path(local_path)
+    partial = local_path.with_name(local_path.name + ".part")
+    start, received = time.monotonic(), 0
+    try:
+        with requests.get(url, stream=True, timeout=ABS_TIMEOUT) as r:
+            r.raise_for_status()
+            with open(partial, "wb") as f:
+                for chunk in r.iter_content(chunk_size=8192):
+                    if limiter is not None:
+                        limiter(len(chunk))
+                    f.write(chunk)
+                    received += len(chunk)
+        partial.replace(local_path)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    # Downloads double as throughput samples for stream caching
+    if limiter is None:
+        streaming.monitor.record_transfer(received, time.monotonic() - start)
+    return received
+
+
+class JellyfinClient(SourceAdapter):
+    source = Source.JELLYFIN
     # We initialize these as None and set them up properly
     _api = None
     server_url = JELLYFIN["url"].rstrip("/")
     api_key = JELLYFIN["api"]
+    user_id = JELLYFIN["user_id"]
+
+    @classmethod
+    def configure(cls):
+        """Pick up changed JELLYFIN settings; the SDK client is rebuilt on next use."""
+        cls.server_url = JELLYFIN["url"].rstrip("/")
+        cls.api_key = JELLYFIN["api"]
+        cls.user_id = JELLYFIN["user_id"]
+        cls._api = None
 
     @classmethod
     def get_instance(cls):
@@ -34,14 +79,22 @@ class JellyfinClient:
         return cls._api
 
     @classmethod
-    def get_items(cls, limit=50):
-        """Fetch Audio items from the server."""
+    @metrics.timed("jellyfin_get_items")
+    def get_items(cls, limit=50, parent_id=None):
+        """Fetch Audio items from the server, optionally inside a playlist or album."""
         api = cls.get_instance()
 
         # We use the search abstraction provided by the SDK
         query = api.items.search.add("include_item_types", [BaseItemKind.AUDIO])
         query.recursive = True
         query.limit = limit
+        # Bitrate comes with the media sources; it decides direct play under a cap
+        query = query.add("fields", [ItemFields.MEDIASOURCES])
+        if parent_id:
+            query = query.add("parent_id", parent_id)
+        if cls.user_id:
+            # Scopes the query to a user so UserData (resume position) is returned
+            query = query.add("user_id", cls.user_id)
 
         # .all is a property that executes the request
         result = query.all
@@ -53,25 +106,120 @@ class JellyfinClient:
                 # Convert RunTimeTicks (100-nanosecond intervals) to milliseconds
                 if hasattr(x, "run_time_ticks") and x.run_time_ticks:
                     item_dict["duration"] = x.run_time_ticks // 10000
+                # Container decides direct play vs transcode (see streaming.py)
+                if getattr(x, "container", None):
+                    item_dict["container"] = x.container.split(",")[0].lower()
+                sources = getattr(x, "media_sources", None)
+                if sources and sources[0].bitrate:
+                    item_dict["bitrate"] = sources[0].bitrate // 1000
+                user_data = getattr(x, "user_data", None)
+                if user_data and user_data.playback_position_ticks:
+                    item_dict["resume_ms"] = user_data.playback_position_ticks // 10000
+                    if user_data.last_played_date:
+                        item_dict["last_played"] = user_data.last_played_date.timestamp()
                 items.append(item_dict)
         return items
 
+    # --- SourceAdapter ---
     @classmethod
-    def get_stream_uri(cls, item_id, container="mp3"):
-        """Constructs a direct stream URI for an audio item."""
-        # Standard Jellyfin streaming endpoint
-        endpoint = f"{cls.server_url}/Audio/{item_id}/stream.{container}"
-        return f"{endpoint}?api_key={cls.api_key}"
+    def list_items(cls):
+        return cls.get_items()
 
+    @classmethod
+    def resolve(cls, item):
+        """One stream with a profile chosen for the item and caching for the network."""
+        profile = streaming.choose_profile(item)
+        caching = streaming.monitor.caching_ms(streaming.expected_bitrate(item, profile))
+        tracks = [(cls.get_stream_uri(item["id"], profile), -1)]
+        return tracks, [], {"caching_ms": caching, "profile": profile}
+
+    @classmethod
+    def metadata(cls, item):
+        artists = item.get("artists") or []
+        return {
+            "title": item["name"],
+            "artist": item.get("album_artist") or (artists[0] if artists else ""),
+            "album": item.get("album") or "",
+            "duration": item.get("duration"),
+        }
 
-class AudiobookshelfClient:
+    @classmethod
+    def artwork_request(cls, item, size):
+        """Primary image, resized by the server; songs without their own use the album's."""
+        image_id = item["id"] if item.get("image_tags") or not item.get("album_id") else item["album_id"]
+        url = (
+            f"{cls.server_url}/Items/{image_id}/Images/Primary"
+            f"?maxWidth={size}&maxHeight={size}&quality=80&api_key={cls.api_key}"
+        )
+        return f"{cls.source.value}_{image_id}", url, {}
+
+    @classmethod
+    def get_stream_uri(cls, item_id, profile=streaming.TRANSCODE, max_bitrate_kbps=None):
+        """Constructs a stream URI for an audio item using a stream profile."""
+        cap = STREAMING["max_bitrate_kbps"] if max_bitrate_kbps is None else max_bitrate_kbps
+        codec = STREAMING["transcode_codec"]
+        if profile == streaming.DIRECT:
+            # Original file, no server-side transcoding
+            return f"{cls.server_url}/Audio/{item_id}/stream?static=true&api_key={cls.api_key}"
+        if profile == streaming.UNIVERSAL:
+            # Server direct-plays anything in the list and transcodes the rest
+            query = (
+                f"Container={','.join(STREAMING['direct_play'])}"
+                f"&TranscodingContainer={codec}&AudioCodec={codec}&TranscodingProtocol=http"
+            )
+            if cap:
+                query += f"&MaxStreamingBitrate={cap * 1000}"
+            return f"{cls.server_url}/Audio/{item_id}/universal?{query}&api_key={cls.api_key}"
+        endpoint = f"{cls.server_url}/Audio/{item_id}/stream.{codec}"
+        bitrate = min(cap, streaming.LOSSY_KBPS) if cap else streaming.LOSSY_KBPS
+        return f"{endpoint}?audioCodec={codec}&audioBitRate={bitrate * 1000}&api_key={cls.api_key}"
+
+    @classmethod
+    def get_download_uri(cls, item_id):
+        """URI of an item's original file, for offline copies."""
+        return f"{cls.server_url}/Items/{item_id}/Download?api_key={cls.api_key}"
+
+    @classmethod
+    def report_progress(cls, item_id, position_ms, paused=False):
+        """Tell the server how far into an item playback has got."""
+        response = requests.post(
+            f"{cls.server_url}/Sessions/Playing/Progress",
+            headers={"X-Emby-Token": cls.api_key},
+            json={
+                "ItemId": item_id,
+                "PositionTicks": position_ms * 10000,
+                "IsPaused": paused,
+            },
+            timeout=JELLYFIN_TIMEOUT,
+        )
+        response.raise_for_status()
+
+    @classmethod
+    def ping_url(cls):
+        """Cheap endpoint for measuring round-trip time to the server."""
+        return f"{cls.server_url}/System/Ping"
+
+
+class AudiobookshelfClient(SourceAdapter):
+    source = Source.ABS
     server_url = ABS["url"].rstrip("/")
     api_key = ABS["api"]
     library_id = ABS.get("lib_id")
     # Define local storage path
     DOWNLOAD_DIR = Path.home() / "music" / "abs"
+    # Book tracks being fetched in the background
+    _downloading = set()
+    _downloads_lock = threading.Lock()
+
+    @classmethod
+    def configure(cls):
+        """Pick up changed ABS settings."""
+        cls.server_url = ABS["url"].rstrip("/")
+        cls.api_key = ABS["api"]
+        cls.library_id = ABS.get("lib_id")
 
     @classmethod
+    @metrics.timed("abs_get_items")
     def get_items(cls, limit=100):
         """Fetch items and resolve to playable episodes/books."""
         cls.DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
@@ -90,14 +238,14 @@ class AudiobookshelfClient:
                 else:
                     # For books, we need the 'ino' (internal node ID) of the audio file
                     # We get this by calling the expanded item API
+                    metadata = item.get("media", {}).get("metadata", {})
                     playlist.append(
                         {
-                            "name": item.get("media", {})
-                            .get("metadata", {})
-                            .get("title", "Book"),
+                            "name": metadata.get("title", "Book"),
                             "id": item["id"],
                             "source": Source.ABS.value,
                             "parent_id": item["id"],
+                            "artist": metadata.get("authorName", ""),
                         }
                     )
             return playlist
@@ -105,7 +253,74 @@ class AudiobookshelfClient:
             logger.error(f"ABS Library Fetch Error: {e}")
             return []
 
+    # --- SourceAdapter ---
+    @classmethod
+    def list_items(cls):
+        return cls.get_items()
+
+    @classmethod
+    def resolve(cls, item):
+        """Book tracks and chapters, or the whole item if the track list fails."""
+        try:
+            tracks, chapters = cls.get_tracks(item)
+        except Exception as e:
+            logger.warning(f"ABS track list failed, using whole item: {e}")
+            tracks, chapters = [(cls.get_stream_uri(item), -1)], []
+        return tracks, chapters, {"profile": Source.ABS.value}
+
+    @classmethod
+    def artwork_request(cls, item, size):
+        """Book or podcast cover, resized by the server (episodes share the podcast's)."""
+        item_id = item.get("parent_id") or item["id"]
+        url = f"{cls.server_url}/api/items/{item_id}/cover?width={size}&height={size}&format=jpeg"
+        return f"{cls.source.value}_{item_id}", url, {"Authorization": f"Bearer {cls.api_key}"}
+
+    @classmethod
+    def get_progress(cls):
+        """Fetch the user's progress for every item.
+
+        Returns {(library_item_id, episode_id or None): (position_ms, updated)}
+        with updated in epoch seconds.
+        """
+        headers = {"Authorization": f"Bearer {cls.api_key}"}
+        response = requests.get(f"{cls.server_url}/api/me", headers=headers, timeout=ABS_TIMEOUT)
+        response.raise_for_status()
+        progress = {}
+        for entry in response.json().get("mediaProgress", []):
+            key = (entry["libraryItemId"], entry.get("episodeId"))
+            progress[key] = (
+                int(entry.get("currentTime", 0) * 1000),
+                entry.get("lastUpdate", 0) / 1000,
+            )
+        return progress
+
     @classmethod
+    def update_progress(cls, updates):
+        """Send several progress updates in one request.
+
+        updates is a list of dicts with library_item_id, episode_id,
+        position_ms and duration_ms.
+        """
+        headers = {"Authorization": f"Bearer {cls.api_key}"}
+        body = []
+        for u in updates:
+            entry = {"libraryItemId": u["library_item_id"], "currentTime": u["position_ms"] / 1000}
+            if u.get("episode_id"):
+                entry["episodeId"] = u["episode_id"]
+            if u.get("duration_ms", 0) > 0:
+                entry["duration"] = u["duration_ms"] / 1000
+                entry["progress"] = min(1.0, u["position_ms"] / u["duration_ms"])
+            body.append(entry)
+        response = requests.patch(
+            f"{cls.server_url}/api/me/progress/batch/update",
+            headers=headers,
+            json=body,
+            timeout=ABS_TIMEOUT,
+        )
+        response.raise_for_status()
+
+    @classmethod
+    @metrics.timed("abs_get_episodes")
     def _get_podcast_episodes(cls, podcast_item):
         """Expand podcast to get episode metadata."""
         headers = {"Authorization": f"Bearer {cls.api_key}"}
@@ -130,6 +345,41 @@ class AudiobookshelfClient:
         except:  # noqa: E722
             return []
 
+    @classmethod
+    def _download(cls, url, local_path):
+        """Download url to local_path; True on success."""
+        try:
+            with metrics.timer("abs_download"):
+                download_file(url, local_path)
+            return True
+        except Exception as e:
+            logger.error(f"Download failed: {e}")
+            return False
+
+    @classmethod
+    def get_series_items(cls, series_id):
+        """Books in a series, as playlist items."""
+        headers = {"Authorization": f"Bearer {cls.api_key}"}
+        # ABS filters take the filter value base64-encoded
+        value = base64.urlsafe_b64encode(series_id.encode()).decode()
+        url = f"{cls.server_url}/api/libraries/{cls.library_id}/items?filter=series.{value}"
+        response = requests.get(url, headers=headers, timeout=ABS_TIMEOUT)
+        response.raise_for_status()
+        return [
+            {
+                "name": item.get("media", {}).get("metadata", {}).get("title", "Book"),
+                "id": item["id"],
+                "source": Source.ABS.value,
+                "parent_id": item["id"],
+            }
+            for item in response.json().get("results", [])
+        ]
+
+    @classmethod
+    def get_track_download_uri(cls, track):
+        """Download URI for one track returned by get_book."""
+        return f"{cls.server_url}{track['content_url']}/download?token={cls.api_key}"
+
     @classmethod
     def get_stream_uri(cls, item):
         """
@@ -138,10 +388,10 @@ class AudiobookshelfClient:
         """
         # Create a safe filename
         safe_name = "".join([c if c.isalnum() else "_" for c in item["name"]])
-        local_path = cls.DOWNLOAD_DIR / f"{item['id']}_{safe_name}.mp3"
+        local_path = cls.DOWNLOAD_DIR / f"{item['id']}_{safe_name}.{item.get('ext', 'mp3')}"
 
         if local_path.exists():
-            logger.info(f"Playing local file: {local_path}")
+            logger.debug(f"Playing local file: {local_path}")
             return str(local_path)
 
         # If not local, download it
@@ -156,14 +406,89 @@ class AudiobookshelfClient:
         if item.get("ino"):
             download_url = f"{cls.server_url}/api/items/{item['parent_id']}/file/{item['ino']}/download?token={cls.api_key}"
 
-        try:
-            with requests.get(download_url, stream=True) as r:
-                r.raise_for_status()
-                with open(local_path, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
+        if cls._download(download_url, local_path):
             return str(local_path)
-        except Exception as e:
-            logger.error(f"Download failed: {e}")
-            # Fallback to the obtuse stream URL if download fails
-            return f"{cls.server_url}/api/items/{item['id']}/play?token={cls.api_key}"
+        # Fallback to the obtuse stream URL if download fails
+        return f"{cls.server_url}/api/items/{item['id']}/play?token={cls.api_key}"
+
+    @classmethod
+    def get_book(cls, item):
+        """Fetch a book's audio tracks and chapters.
+
+        Returns {"tracks": [...], "chapters": [...]} with each track's
+        content_url, ext and duration and each chapter's title, start and
+        end, all times in milliseconds.
+        """
+        headers = {"Authorization": f"Bearer {cls.api_key}"}
+        url = f"{cls.server_url}/api/items/{item['parent_id']}?expanded=1"
+        response = requests.get(url, headers=headers, timeout=ABS_TIMEOUT)
+        response.raise_for_status()
+        media = response.json().get("media", {})
+        tracks = [
+            {
+                "index": t.get("index", i + 1),
+                "content_url": t["contentUrl"],
+                "ext": t.get("metadata", {}).get("ext", ".mp3").lstrip("."),
+                "duration": int(t.get("duration", 0) * 1000),
+            }
+            for i, t in enumerate(media.get("tracks", []))
+        ]
+        chapters = [
+            {
+                "title": c.get("title", f"Chapter {i + 1}"),
+                "start": int(c["start"] * 1000),
+                "end": int(c["end"] * 1000),
+            }
+            for i, c in enumerate(media.get("chapters", []))
+        ]
+        return {"tracks": tracks, "chapters": chapters}
+
+    @classmethod
+    def get_tracks(cls, item):
+        """Playable (uri, duration_ms) tracks and chapters for a playlist item.
+
+        Book tracks are fetched one file at a time: the first is downloaded
+        before playback starts, the rest stream until a background download
+        makes them local. Episodes are a single downloaded file.
+        """
+        if item.get("ino") or item["id"] != item.get("parent_id"):
+            return [(cls.get_stream_uri(item), -1)], []
+
+        book = cls.get_book(item)
+        if not book["tracks"]:
+            return [(cls.get_stream_uri(item), -1)], []
+
+        tracks, pending = [], []
+        for track in book["tracks"]:
+            local_path = cls.DOWNLOAD_DIR / f"{item['id']}_{track['index']:03d}.{track['ext']}"
+            if local_path.exists():
+                uri = str(local_path)
+            else:
+                uri = f"{cls.server_url}{track['content_url']}?token={cls.api_key}"
+                pending.append((len(tracks), cls.get_track_download_uri(track), local_path))
+            tracks.append((uri, track["duration"]))
+
+        if pending and pending[0][0] == 0:
+            # First file blocks, as single-file downloads always have
+            _, url, local_path = pending.pop(0)
+            if cls._download(url, local_path):
+                tracks[0] = (str(local_path), tracks[0][1])
+        if pending:
+            threading.Thread(
+                target=cls._download_tracks, args=(pending,), name="abs-tracks", daemon=True
+            ).start()
+        return tracks, book["chapters"]
+
+    @classmethod
+    def _download_tracks(cls, pending):
+        """Background download of book tracks, skipping ones already in flight."""
+        for _, url, local_path in pending:
+            with cls._downloads_lock:
+                if local_path in cls._downloading or local_path.exists():
+                    continue
+                cls._downloading.add(local_path)
+            try:
+                cls._download(url, local_path)
+            finally:
+                with cls._downloads_lock:
+                    cls._downloading.discard(local_path)
@@ -1,22 +1,37 @@
 """Application configuration from environment variables."""
 import os
-from dotenv import load_dotenv
+from dotenv import find_dotenv, load_dotenv
 
-# Load environment variables
-load_dotenv()
+# Load environment variables; config_service.py watches the file for changes
+ENV_FILE = find_dotenv() or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+load_dotenv(ENV_FILE)
 
-# Feature toggles
+
+
+def _env_flag(name):
+    return os.getenv(name, "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+# Feature toggles; the ones that talk to servers or write to disk on
+# their own are off until enabled with FEATURE_<NAME>=1 (.env or settings.json)
 FEATURES = {
     "JELLYFIN": True,
     "ABS": True,
     "LOCAL": True,
     "BT_PAIR": True,
+    "PROGRESS_SYNC": _env_flag("FEATURE_PROGRESS_SYNC"),
+    "OFFLINE_SYNC": _env_flag("FEATURE_OFFLINE_SYNC"),
+    "RESUME_SESSION": _env_flag("FEATURE_RESUME_SESSION"),
+    "ARTWORK": _env_flag("FEATURE_ARTWORK"),
+    "VISUALIZER": _env_flag("FEATURE_VISUALIZER"),
 }
 
 # Jellyfin configuration
 JELLYFIN = {
     "url": os.getenv("JELLYFIN_URL", "http://YOUR_IP:8096"),
     "api": os.getenv("JELLYFIN_API_KEY", "YOUR_KEY"),
+    # Needed for resume positions (UserData); progress reports work without it
+    "user_id": os.getenv("JELLYFIN_USER_ID", ""),
 }
 
 # Audiobookshelf configuration
@@ -26,10 +41,180 @@ ABS = {
     "lib_id": os.getenv("ABS_LIB_ID", "YOUR_LIB_ID"),
 }
 
+# Library (per-source item caches behind the merged browser, see library.py)
+LIBRARY = {
+    # Refetch a source's catalog after this many seconds; 0 = keep until restart
+    "max_age_s": {"LOCAL": 30, "JELLY": 900, "ABS": 900},
+    # Last fetched catalog per source, read back when resuming a session offline
+    "catalog_dir": "catalogs",
+}
+
 # Paths
 LOCAL_PATH = os.path.expanduser("~/music")
 BOOKMARK_FILE = "bookmarks.json"
+PROGRESS_QUEUE_FILE = "progress_queue.json"
+SESSION_FILE = "session.json"
+# Settings saved from the web API; override .env (see config_service.py)
+SETTINGS_FILE = "settings.json"
 
 # Display
 DISPLAY_WIDTH = 128
 DISPLAY_HEIGHT = 128
+
+# Input (button debounce and auto-repeat timing)
+INPUT = {
+    "debounce_ms": 30,
+    "repeat_delay_ms": 400,
+    "repeat_interval_ms": 150,
+    "repeat_min_interval_ms": 30,
+    "repeat_accel": 0.85,
+}
+
+# Bluetooth discovery (devices are listed as the scan finds them, see bluetooth.py)
+BLUETOOTH = {
+    # The scan keeps going while the list is open, up to this long
+    "scan_timeout_s": 20,
+    # Weaker devices (dBm) are too far away to be worth listing
+    "min_rssi": -85,
+    # Hide devices known not to be audio sinks (phones, watches, keyboards)
+    "audio_only": True,
+    # The BT indicator shows a connection state at most this old; checks run off the main loop
+    "status_ttl_s": 5,
+}
+
+# Audio routing between connected Bluetooth sinks (see audio_routing.py)
+AUDIO_ROUTING = {
+    # Volume percent for a device until it has been changed
+    "default_volume": 80,
+    # How long to wait for PulseAudio to create a new connection's sink
+    "sink_timeout_s": 10,
+    "poll_s": 0.25,
+}
+
+# Power (render rate per view and backlight timeouts, see governor.py)
+POWER = {
+    # Frames per second with nothing happening; 0 = only redraw on changes
+    "view_fps": {"MENU": 0, "BROWSER": 0, "BT_SCAN": 0, "PLAYING": 2},
+    # Full rate for a moment after each button (scrolling, held keys)
+    "burst_fps": 20,
+    "burst_s": 1.0,
+    # Redraw at least this often so status icons stay current (seconds)
+    "refresh_s": 10,
+    # Longest main-loop sleep (track ends, bookmark saves)
+    "idle_wakeup_s": 1.0,
+    # Backlight percent, and idle seconds before dimming/blanking (0 = never)
+    "backlight": 100,
+    "dim_backlight": 20,
+    "dim_after_s": int(os.getenv("DIM_AFTER_S", "30")),
+    "blank_after_s": int(os.getenv("BLANK_AFTER_S", "120")),
+    "report_interval_s": 60,
+}
+
+# Logging (queued JSON lines in a rotating file, see logging_setup.py)
+LOGGING = {
+    # "" = no log file, stderr only
+    "file": os.getenv("LOG_FILE", "mediapi.log"),
+    "json": True,
+    # Rotate at this size or age, keeping this many old files
+    "max_bytes": 1024 * 1024,
+    "max_age_s": 24 * 3600,
+    "backups": 3,
+    # Records waiting for the writer thread; beyond this they are dropped
+    "queue_size": 2000,
+    "console_level": "INFO",
+    # Level per logger name ("" is the root); hot-path modules stay quiet under LOG_LEVEL=DEBUG
+    "levels": {
+        "": os.getenv("LOG_LEVEL", "INFO"),
+        "seek": "INFO",
+        "timeline": "INFO",
+        "werkzeug": "WARNING",
+        "urllib3": "WARNING",
+    },
+}
+
+# Metrics (hot-path timers served at /api/metrics)
+METRICS = {
+    "enabled": os.getenv("METRICS_ENABLED", "1") == "1",
+    "profile_interval_ms": 10,
+}
+
+# Streaming (Jellyfin stream profiles and VLC network caching)
+STREAMING = {
+    # 0 = no cap; otherwise lossless files are transcoded down to this bitrate
+    "max_bitrate_kbps": int(os.getenv("STREAM_MAX_BITRATE", "0")),
+    "direct_play": ("mp3", "aac", "m4a", "ogg", "opus", "flac", "wav"),
+    "transcode_codec": "mp3",
+    "min_caching_ms": 300,
+    "max_caching_ms": 5000,
+    "default_caching_ms": 3000,
+}
+
+# Marquee (titles too wide for their row scroll, see marquee.py)
+MARQUEE = {
+    "speed_px_s": 24,
+    "fps": 12,
+    # Rest at the start of each pass so the beginning can be read
+    "pause_s": 1.5,
+    "gap_px": 24,
+    # Passes before the title rests until the next button press; 0 = forever
+    "passes": 2,
+}
+
+# Visualizer (spectrum bars in the PLAYING view, see visualizer.py)
+VISUALIZER = {
+    # PulseAudio source to tap; the monitor of the default sink is what VLC plays
+    "source": os.getenv("VISUALIZER_SOURCE", "@DEFAULT_MONITOR@"),
+    "rate": 44100,
+    # Frames per second at most; halved while over the CPU budget
+    "fps": 15,
+    "cpu_budget": 0.05,
+    "bars": 8,
+    # 256-point FFT over every 4th sample (averaged): 43 Hz bins up to 5.5 kHz
+    "fft_size": 256,
+    "decimate": 4,
+    "floor_db": 50,
+    "ceiling_db": 120,
+    # Share of a bar's height kept per frame as it falls
+    "decay": 0.75,
+    # RGB565 bar colours: body and top quarter
+    "color": 0x07FF,
+    "peak_color": 0xFFE0,
+}
+
+# Artwork (cover thumbnails in the PLAYING view, see artwork.py)
+ARTWORK = {
+    # Tile edge in pixels; tiles are cached pre-converted to RGB565
+    "size": 64,
+    "cache_dir": "artwork",
+    # 8 KB per tile, so 4 MB holds about 500 covers
+    "max_bytes": int(os.getenv("ARTWORK_CACHE_MB", "4")) * 1024 * 1024,
+    # Decoded tiles kept in memory
+    "memory_tiles": 8,
+    # Queued tracks whose art is fetched ahead of time
+    "prefetch": 3,
+    # Seconds before a failed fetch is tried again
+    "retry_s": 300,
+}
+
+# Progress sync (positions pushed to Jellyfin/ABS in batches)
+PROGRESS = {
+    "flush_interval_s": 30,
+}
+
+
+def _env_list(name):
+    return [v.strip() for v in os.getenv(name, "").split(",") if v.strip()]
+
+
+# Offline sync (Jellyfin playlists/albums and ABS series kept on the Pi)
+OFFLINE = {
+    "jellyfin_collections": _env_list("OFFLINE_JELLYFIN_IDS"),
+    "abs_series": _env_list("OFFLINE_ABS_SERIES"),
+    "concurrency": 2,
+    # 0 = unlimited
+    "bandwidth_kbps": int(os.getenv("OFFLINE_BANDWIDTH_KBPS", "0")),
+    # Empty = any network counts as home
+    "home_ssids": _env_list("OFFLINE_HOME_SSIDS"),
+    "require_charging": True,
+    "interval_s": 1800,
+}
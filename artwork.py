@@ -0,0 +1,243 @@
+"""Cover art thumbnails for the PLAYING view.
+
+Art is requested already resized by the server (Jellyfin maxWidth, the
+ABS cover endpoint's width), decoded and scaled on a background thread,
+and stored as a 64x64 RGB565 tile. Tiles live in a size-bounded disk
+cache evicted least-recently-used first, plus a few in memory, so a
+track change never waits on a download or a JPEG decode: the view shows
+a placeholder until the tile arrives. Art for the next tracks in the
+queue is fetched ahead of time.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import metrics
+from app_config import ARTWORK
+from assets import Frame
+from library import adapter
+
+logger = logging.getLogger(__name__)
+
+ART_TIMEOUT = 10
+
+
+def tile_from_image(data, size):
+    """A size x size RGB565 tile from encoded image bytes (cropped to a square)."""
+    from PIL import Image, ImageOps
+
+    from display import to_rgb565
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", (size, size))
+        tile = ImageOps.fit(image.convert("RGB"), (size, size), Image.Resampling.BILINEAR)
+    return to_rgb565(tile)
+
+
+class TileCache:
+    """Fixed-size RGB565 tiles on disk, evicted least-recently-used.
+
+    File modification times record use, so recency survives a restart.
+    """
+
+    def __init__(self, path, max_bytes, tile_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.tile_bytes = tile_bytes
+        self._lock = threading.Lock()
+        # Tile file names, least recently used first; read from disk on first use
+        self._index = None
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode()).hexdigest())
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith(".tmp"):
+                continue
+            try:
+                entries.append((os.stat(os.path.join(self.path, name)).st_mtime, name))
+            except OSError:
+                continue
+        self._index = OrderedDict((name, None) for _, name in sorted(entries))
+
+    def get(self, key):
+        """Tile bytes, or None if not cached."""
+        path = self._file(key)
+        with self._lock:
+            self._load_index()
+            name = os.path.basename(path)
+            if name not in self._index:
+                return None
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)
+            except OSError:
+                self._index.pop(name, None)
+                return None
+            self._index.move_to_end(name)
+        return data if len(data) == self.tile_bytes else None
+
+    def put(self, key, data):
+        """Store a tile, evicting the least recently used beyond max_bytes."""
+        path = self._file(key)
+        with self._lock:
+            self._load_index()
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            name = os.path.basename(path)
+            self._index[name] = None
+            self._index.move_to_end(name)
+            while len(self._index) * self.tile_bytes > self.max_bytes:
+                old, _ = self._index.popitem(last=False)
+                try:
+                    os.remove(os.path.join(self.path, old))
+                except OSError:
+                    pass
+                metrics.count("artwork_evictions")
+
+    def __len__(self):
+        with self._lock:
+            self._load_index()
+            return len(self._index)
+
+
+class Artwork:
+    """Tiles for playlist items, fetched in the background.
+
+    get() never blocks; version goes up whenever a new tile is ready so
+    the view knows to redraw.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or ARTWORK
+        size = self.config["size"]
+        self.size = size
+        self.disk = TileCache(self.config["cache_dir"], self.config["max_bytes"], size * size * 2)
+        # key -> Frame, most recent last
+        self._memory = OrderedDict()
+        # key -> monotonic time to try again; no art on the server is never retried
+        self._unavailable = {}
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._pending = set()
+        self._thread = None
+        self.version = 0
+
+    def _request(self, item):
+        """(cache key, url, headers) for an item's art, or None if its source has none."""
+        try:
+            return adapter(item["source"]).artwork_request(item, self.size)
+        except Exception as e:
+            logger.debug(f"No artwork request for {item.get('name')}: {e}")
+            return None
+
+    def get(self, item):
+        """The item's tile as an assets.Frame, or None if not available (yet)."""
+        request = self._request(item)
+        if request is None:
+            return None
+        key = request[0]
+        frame = self._memory.get(key)
+        if frame is not None:
+            self._memory.move_to_end(key)
+            metrics.count("artwork_memory_hits")
+            return frame
+        if self._waiting(key):
+            return None
+        data = self.disk.get(key)
+        if data is None:
+            self._enqueue(request, urgent=True)
+            return None
+        metrics.count("artwork_disk_hits")
+        return self._remember(key, data)
+
+    def prefetch(self, items):
+        """Fetch art for items that are not cached yet, after any urgent request."""
+        for item in items:
+            request = self._request(item)
+            if request is None or request[0] in self._memory or self._waiting(request[0]):
+                continue
+            self._enqueue(request, urgent=False)
+
+    @property
+    def pending(self):
+        """Number of tiles queued or being fetched."""
+        with self._cond:
+            return len(self._pending)
+
+    def _waiting(self, key):
+        """True while key failed recently (or has no art) and should not be fetched."""
+        retry_at = self._unavailable.get(key)
+        return retry_at is not None and time.monotonic() < retry_at
+
+    def _remember(self, key, data):
+        frame = Frame(key, 0, 0, self.size, self.size, data)
+        self._memory[key] = frame
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.config["memory_tiles"]:
+            self._memory.popitem(last=False)
+        return frame
+
+    # --- Background fetching ---
+    def _enqueue(self, request, urgent):
+        with self._cond:
+            if request[0] in self._pending:
+                if urgent:
+                    # Jump ahead of prefetches for the track now playing
+                    for queued in self._queue:
+                        if queued[0] == request[0]:
+                            self._queue.remove(queued)
+                            self._queue.appendleft(queued)
+                            break
+                return
+            self._pending.add(request[0])
+            if urgent:
+                self._queue.appendleft(request)
+            else:
+                self._queue.append(request)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="artwork", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                request = self._queue.popleft()
+            key = request[0]
+            try:
+                if self.disk.get(key) is None:
+                    self._fetch(*request)
+            except Exception as e:
+                logger.warning(f"Artwork fetch failed for {key}: {e}")
+                self._unavailable[key] = time.monotonic() + self.config["retry_s"]
+            finally:
+                with self._cond:
+                    self._pending.discard(key)
+
+    @metrics.timed("artwork_fetch")
+    def _fetch(self, key, url, headers):
+        import requests
+
+        response = requests.get(url, headers=headers, timeout=ART_TIMEOUT)
+        if response.status_code == 404:
+            self._unavailable[key] = float("inf")
+            return
+        response.raise_for_status()
+        metrics.count("artwork_bytes", len(response.content))
+        self.disk.put(key, tile_from_image(response.content, self.size))
+        self.version += 1
@@ -0,0 +1,218 @@
+"""Pre-rendered RGB565 screens and icons in a memory-mapped bundle.
+
+Static screens (splash, menu background, message and error banners) are
+drawn once by `python assets.py build` with the same code the app falls
+back to, converted to the LCD's RGB565 format and stored in assets.bin.
+At runtime frames are sliced straight out of the mmap and sent over SPI,
+skipping PIL drawing and the numpy conversion.
+
+Bundle layout: b"MPA1", u32 header length, JSON header, frame data.
+This module only imports the standard library at load time so splash.py
+can use it before the rest of the app is imported.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+
+from app_config import DISPLAY_HEIGHT, DISPLAY_WIDTH, FEATURES
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets.bin")
+MAGIC = b"MPA1"
+
+
+# Menu rows: y of the first entry and row pitch (seven entries fit above the notice line)
+MENU_TOP = 22
+MENU_ROW = 15
+
+
+def menu_options():
+    """Main menu entries for the enabled features."""
+    options = []
+    if sum(FEATURES[source] for source in ("JELLYFIN", "ABS", "LOCAL")) > 1:
+        # Every source in one browser (library.py)
+        options.append("Library")
+    if FEATURES["JELLYFIN"]:
+        options.extend(["Jellyfin", "Jellyfin Shuffle"])
+    if FEATURES["ABS"]:
+        options.append("Audiobookshelf")
+    if FEATURES["LOCAL"]:
+        options.extend(["Local Files", "Local Shuffle"])
+    if FEATURES["BT_PAIR"]:
+        options.append("Bluetooth Pair")
+    return options
+
+
+# --- Drawing code for each static screen (draws onto a Display) ---
+def draw_splash(display):
+    display.draw_rectangle(0, 0, DISPLAY_WIDTH, DISPLAY_HEIGHT, fill="BLACK")
+    display.draw_rectangle(14, 44, 114, 84, outline="CYAN")
+    display.draw_text(43, 52, "MediaPI", fill="CYAN")
+    display.draw_text(37, 66, "starting...", fill="GRAY")
+
+
+def draw_menu(display):
+    display.draw_text(5, 5, "-- SOURCES --", fill="YELLOW")
+    for i, opt in enumerate(menu_options()):
+        display.draw_text(10, MENU_TOP + i * MENU_ROW, opt, fill="GRAY")
+
+
+def draw_banner(display, color):
+    display.draw_rectangle(0, 0, DISPLAY_WIDTH, DISPLAY_HEIGHT, fill=color)
+
+
+def draw_error(display):
+    draw_banner(display, "RED")
+    display.draw_text(10, 50, "ERROR:", fill="WHITE")
+
+
+def draw_bt_icon(display):
+    display.draw_text(105, 5, "BT", fill="CYAN")
+
+
+# name -> (drawing function, (x1, y1, x2, y2) region stored in the bundle)
+FULL = (0, 0, DISPLAY_WIDTH, DISPLAY_HEIGHT)
+SCREENS = {
+    "splash": (draw_splash, FULL),
+    "menu": (draw_menu, FULL),
+    "error": (draw_error, FULL),
+    "banner_BLUE": (lambda d: draw_banner(d, "BLUE"), FULL),
+    "banner_GREEN": (lambda d: draw_banner(d, "GREEN"), FULL),
+    "icon_bt": (draw_bt_icon, (104, 4, 124, 16)),
+}
+
+# name -> what a screen shows that settings can change; a frame built for
+# other values is drawn from code instead, and the rest of the bundle still used
+KEYS = {
+    "menu": menu_options,
+}
+
+
+def source_hash():
+    """Fingerprint of the drawing code and screen size; a bundle built from anything else is stale."""
+    with open(os.path.abspath(__file__), "rb") as f:
+        source = f.read()
+    extra = json.dumps([DISPLAY_WIDTH, DISPLAY_HEIGHT]).encode()
+    return hashlib.sha1(source + extra).hexdigest()
+
+
+class Frame:
+    """One pre-rendered region: RGB565 bytes plus where they go."""
+
+    __slots__ = ("name", "x", "y", "width", "height", "data", "_image")
+
+    def __init__(self, name, x, y, width, height, data):
+        self.name, self.x, self.y = name, x, y
+        self.width, self.height = width, height
+        self.data = data
+        self._image = None
+
+    def image(self):
+        """The frame as a PIL image (decoded once), for drawing on top of it."""
+        if self._image is None:
+            import numpy as np
+            from PIL import Image
+
+            raw = np.frombuffer(self.data, dtype=">u2").reshape(self.height, self.width)
+            rgb = np.empty((self.height, self.width, 3), dtype=np.uint8)
+            rgb[..., 0] = (raw >> 8) & 0xF8
+            rgb[..., 1] = (raw >> 3) & 0xFC
+            rgb[..., 2] = (raw << 3) & 0xF8
+            self._image = Image.fromarray(rgb, "RGB")
+        return self._image
+
+
+class AssetBundle:
+    """Read-only view of assets.bin; frames are slices of the mapping."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:4] != MAGIC:
+            raise ValueError(f"{path} is not an asset bundle")
+        (length,) = struct.unpack_from("<I", self._map, 4)
+        self.header = json.loads(self._map[8:8 + length])
+        self._base = 8 + length
+        self._frames = {}
+
+    def get(self, name):
+        """Frame by name, or None if the bundle doesn't have it or it is out of date (KEYS)."""
+        entry = self.header["frames"].get(name)
+        if entry is None:
+            return None
+        if name in KEYS and entry.get("key") != KEYS[name]():
+            return None
+        frame = self._frames.get(name)
+        if frame is None:
+            start = self._base + entry["offset"]
+            data = memoryview(self._map)[start:start + entry["width"] * entry["height"] * 2]
+            frame = self._frames[name] = Frame(
+                name, entry["x"], entry["y"], entry["width"], entry["height"], data
+            )
+        return frame
+
+    def close(self):
+        self._frames.clear()
+        self._map.close()
+        self._file.close()
+
+
+def load(path=BUNDLE_PATH):
+    """Open the bundle, or None if it is missing, corrupt or out of date."""
+    if not os.path.exists(path):
+        return None
+    try:
+        bundle = AssetBundle(path)
+    except Exception as e:
+        logger.warning(f"Ignoring asset bundle: {e}")
+        return None
+    if bundle.header.get("hash") != source_hash():
+        logger.warning("Asset bundle is out of date; run `python assets.py build`")
+        bundle.close()
+        return None
+    return bundle
+
+
+def blit(lcd, data, x, y, width, height):
+    """Send RGB565 bytes to a window of the LCD."""
+    lcd.LCD_SetWindows(x, y, x + width, y + height)
+    lcd.LCD_WriteData_Bytes(data)
+
+
+def build(path=BUNDLE_PATH):
+    """Render every screen in SCREENS and write the bundle to path."""
+    from display import Display, to_rgb565
+
+    display = Display(use_hardware=False)
+    frames, blobs, offset = {}, [], 0
+    for name, (draw, box) in SCREENS.items():
+        display.clear()
+        draw(display)
+        data = to_rgb565(display.image.crop(box))
+        x1, y1, x2, y2 = box
+        frames[name] = {"offset": offset, "x": x1, "y": y1, "width": x2 - x1, "height": y2 - y1}
+        if name in KEYS:
+            frames[name]["key"] = KEYS[name]()
+        blobs.append(data)
+        offset += len(data)
+
+    header = json.dumps({"hash": source_hash(), "frames": frames}).encode()
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, path)
+    return frames
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["build"]:
+        sys.exit("usage: python assets.py build")
+    built = build()
+    print(f"Wrote {len(built)} frames to {BUNDLE_PATH}")
@@ -1,46 +1,199 @@
 """Audio playback management."""
+import logging
+import threading
 import time
-import vlc
+
+import metrics
+import startup
+from app_config import STREAMING
+
+logger = logging.getLogger(__name__)
+
+# Longest stretch get_time() extrapolates past the last TimeChanged event (ms)
+MAX_INTERPOLATION = 1000
+
+
+class AudioUnavailable(RuntimeError):
+    """VLC could not be started, so nothing can be played."""
 
 
 class AudioPlayer:
-    """Manages VLC audio playback."""
-
-    def __init__(self):
-        """Initialize VLC instance."""
-        instance = vlc.Instance(
-            "--no-video", "--network-caching=3000", "--aout=pulse"
-        )
-        self.player = instance.media_player_new()
-        self.instance = instance
-
-    def load_uri(self, uri):
-        """Load and play a URI."""
+    """Manages VLC audio playback.
+
+    Playback state is pushed by libvlc's event manager into plain
+    attributes, so position, length and play state are read without
+    crossing into libvlc on every frame.
+    """
+
+    def __init__(self, background=False):
+        """Initialize VLC instance, optionally on a warm-up thread."""
+        self.instance = None
+        self.player = None
+        self._ready = threading.Event()
+
+        # Cached playback state, written from libvlc's event thread
+        self.time = 0
+        self._time_at = time.monotonic()
+        self._seek_started = None
+        self.length = -1
+        self.playing = False
+        self.buffering = 100.0
+        self.profile = None
+        self._load_started = None
+        self._rebuffering = False
+        self._ended = False
+        self._error = False
+
+        if background:
+            threading.Thread(target=self._init_vlc, name="vlc-warmup", daemon=True).start()
+        else:
+            self._init_vlc()
+
+    def _init_vlc(self):
+        """Import libvlc, create the player and subscribe to its events."""
+        try:
+            vlc = startup.timed_import("vlc")
+            instance = vlc.Instance(
+                "--no-video",
+                f"--network-caching={STREAMING['default_caching_ms']}",
+                "--aout=pulse",
+            )
+            player = instance.media_player_new()
+            events = player.event_manager()
+            for event_type, handler in (
+                (vlc.EventType.MediaPlayerTimeChanged, self._on_time),
+                (vlc.EventType.MediaPlayerLengthChanged, self._on_length),
+                (vlc.EventType.MediaPlayerBuffering, self._on_buffering),
+                (vlc.EventType.MediaPlayerPlaying, self._on_playing),
+                (vlc.EventType.MediaPlayerPaused, self._on_stopped),
+                (vlc.EventType.MediaPlayerStopped, self._on_stopped),
+                (vlc.EventType.MediaPlayerEndReached, self._on_end),
+                (vlc.EventType.MediaPlayerEncounteredError, self._on_error),
+            ):
+                events.event_attach(event_type, handler)
+            self.player = player
+            self.instance = instance
+            startup.mark("vlc_ready")
+        except Exception as e:
+            logger.error(f"VLC init failed: {e}")
+        finally:
+            self._ready.set()
+
+    # --- libvlc event callbacks (run on libvlc's thread; keep them tiny) ---
+    def _on_time(self, event):
+        self.time = event.u.new_time
+        self._time_at = time.monotonic()
+        if self._load_started is not None:
+            metrics.observe(f"first_audio_{self.profile}", self._time_at - self._load_started)
+            self._load_started = None
+            if startup.mark("first_audio"):
+                # Power-on to sound, the number a resumed session is meant to shrink
+                metrics.gauge("boot_to_audio_ms", round(startup.marks["first_audio"] * 1000))
+        if self._seek_started is not None:
+            metrics.observe("seek_to_audio", self._time_at - self._seek_started)
+            self._seek_started = None
+
+    def _on_length(self, event):
+        self.length = event.u.new_length
+
+    def _on_buffering(self, event):
+        self.buffering = event.u.new_cache
+        # A dip after audio started (and not caused by a seek) is a rebuffer
+        if self.buffering < 100.0:
+            if not self._rebuffering and self._load_started is None and self._seek_started is None:
+                self._rebuffering = True
+                metrics.count(f"rebuffer_{self.profile}")
+        else:
+            self._rebuffering = False
+
+    def _on_playing(self, event):
+        self.playing = True
+
+    def _on_stopped(self, event):
+        self.playing = False
+
+    def _on_end(self, event):
+        self.playing = False
+        self._ended = True
+
+    def _on_error(self, event):
+        self.playing = False
+        self._error = True
+
+    def _vlc(self):
+        """Return the media player, waiting for warm-up to finish."""
+        self._ready.wait()
+        if self.player is None:
+            raise AudioUnavailable("VLC is not available")
+        return self.player
+
+    @metrics.timed("vlc_load")
+    def load_uri(self, uri, start_time=0, caching_ms=None, profile="local"):
+        """Load and play a URI, optionally starting at start_time ms.
+
+        caching_ms overrides VLC's network caching for this media; profile
+        labels the time-to-first-audio and rebuffer metrics.
+        """
+        player = self._vlc()
         media = self.instance.media_new(uri)
-        self.player.set_media(media)
-        self.player.play()
-        time.sleep(0.6)
+        if start_time > 0:
+            media.add_option(f":start-time={start_time / 1000:.3f}")
+        if caching_ms:
+            media.add_option(f":network-caching={caching_ms}")
+        self.time, self.length, self.buffering = start_time, -1, 0.0
+        self._time_at, self._seek_started = time.monotonic(), None
+        self.profile, self._load_started, self._rebuffering = profile, self._time_at, False
+        self._ended = self._error = False
+        player.set_media(media)
+        player.play()
 
     def play(self):
         """Resume playback."""
-        self.player.play()
+        self._vlc().play()
 
     def pause(self):
         """Pause playback."""
-        self.player.pause()
+        self._vlc().pause()
 
     def get_time(self):
-        """Get current playback position in milliseconds."""
-        return self.player.get_time()
+        """Get current playback position in milliseconds.
+
+        Between VLC's TimeChanged events the position is extrapolated from
+        the monotonic clock, so the progress bar moves smoothly.
+        """
+        position = self.time
+        if self.playing and self.buffering >= 100.0:
+            ahead = int((time.monotonic() - self._time_at) * 1000)
+            position += min(ahead, MAX_INTERPOLATION)
+            if self.length > 0:
+                position = min(position, self.length)
+        return position
 
+    @metrics.timed("vlc_set_time")
     def set_time(self, position):
         """Set playback position in milliseconds."""
-        self.player.set_time(position)
+        self._seek_started = time.monotonic()
+        self._vlc().set_time(position)
+        self.time, self._time_at = position, time.monotonic()
 
     def get_duration(self):
         """Get total duration in milliseconds."""
-        return self.player.get_length()
+        return self.length
 
     def is_playing(self):
         """Check if currently playing."""
-        return self.player.is_playing()
+        return self.playing
+
+    def is_buffering(self):
+        """Check if the stream is still filling its cache."""
+        return self.buffering < 100.0
+
+    def consume_end(self):
+        """Return True once after the current track reaches its end."""
+        ended, self._ended = self._ended, False
+        return ended
+
+    def consume_error(self):
+        """Return True once after libvlc reports a playback error."""
+        error, self._error = self._error, False
+        return error
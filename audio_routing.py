@@ -0,0 +1,136 @@
+"""PulseAudio routing between Bluetooth sinks.
+
+Devices stay connected after they stop being the output, so each keeps
+its A2DP sink. Switching between paired headphones and a speaker only
+points the default sink at the new one and moves the live VLC stream
+across with move-sink-input: no reconnect, no settle delay, and VLC keeps
+playing. Each device's volume is read back when it stops being the
+output and applied again when it becomes the output.
+"""
+import logging
+import re
+import time
+
+import metrics
+from app_config import AUDIO_ROUTING
+from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+# bluez_sink.AA_BB_..._FF.a2dp_sink on PulseAudio, bluez_output.AA_BB_..._FF.1 on PipeWire
+_BLUEZ_SINK = re.compile(r"^bluez_(?:sink|output)\.((?:[0-9A-F]{2}_){5}[0-9A-F]{2})\.")
+_VOLUME = re.compile(r"(\d+)%")
+
+
+def sink_mac(sink):
+    """Device address of a Bluetooth sink name, or None for other sinks."""
+    match = _BLUEZ_SINK.match(sink)
+    return match.group(1).replace("_", ":") if match else None
+
+
+class AudioRouter:
+    """Which Bluetooth sink plays, and each device's volume.
+
+    run is a callable(cmd) -> (ok, stdout), normally BluetoothManager._run_cmd.
+    """
+
+    def __init__(self, run, config=None):
+        self.run = run
+        self.config = config or AUDIO_ROUTING
+        # Address of the device audio goes to
+        self.active = None
+        self._volumes = None
+
+    @property
+    def volumes(self):
+        """{mac: percent}, loaded on first use."""
+        if self._volumes is None:
+            self._volumes = Storage.load_bluetooth_volumes()
+        return self._volumes
+
+    def volume(self, mac):
+        return self.volumes.get(mac, self.config["default_volume"])
+
+    def sinks(self):
+        """{mac: (sink index, sink name)} for the Bluetooth sinks that exist now."""
+        _, out = self.run("pactl list short sinks")
+        result = {}
+        for line in out.split("\n"):
+            fields = line.split("\t")
+            if len(fields) > 1:
+                mac = sink_mac(fields[1])
+                if mac is not None:
+                    result[mac] = (fields[0], fields[1])
+        return result
+
+    def wait_for_sink(self, mac, timeout=None):
+        """The device's sink name once PulseAudio has created it, or None after timeout."""
+        timeout = self.config["sink_timeout_s"] if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            sink = self.sinks().get(mac)
+            if sink is not None:
+                return sink[1]
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.config["poll_s"])
+
+    def switch(self, mac):
+        """Send audio to a connected device; False if it has no sink (not connected)."""
+        start = time.monotonic()
+        sinks = self.sinks()
+        if mac not in sinks:
+            return False
+        index, sink = sinks[mac]
+        if self.active is not None and self.active != mac and self.active in sinks:
+            self._remember(self.active, sinks[self.active][1])
+
+        self.run(f"pactl set-default-sink {sink}")
+        # Streams already playing (VLC) follow without being restarted
+        moved = 0
+        _, out = self.run("pactl list short sink-inputs")
+        for line in out.split("\n"):
+            fields = line.split("\t")
+            if len(fields) > 1 and fields[0].isdigit() and fields[1] != index:
+                self.run(f"pactl move-sink-input {fields[0]} {sink}")
+                moved += 1
+        self.run(f"pactl set-sink-volume {sink} {self.volume(mac)}%")
+        self.active = mac
+        duration = time.monotonic() - start
+        metrics.observe("audio_switch", duration)
+        logger.info(
+            f"Audio routed to {sink} ({moved} streams moved)",
+            extra={"sink": sink, "moved": moved, "duration_ms": round(duration * 1000, 1)},
+        )
+        return True
+
+    def set_volume(self, percent, mac=None):
+        """Set and remember a device's volume (the active one by default)."""
+        mac = mac or self.active
+        if mac is None:
+            return False
+        percent = max(0, min(100, int(percent)))
+        self.volumes[mac] = percent
+        Storage.save_bluetooth_volumes(self.volumes)
+        sink = self.sinks().get(mac)
+        if sink is not None:
+            self.run(f"pactl set-sink-volume {sink[1]} {percent}%")
+        return True
+
+    def _remember(self, mac, sink):
+        """Keep the volume a device was left at (it may have been changed on the device)."""
+        ok, out = self.run(f"pactl get-sink-volume {sink}")
+        match = _VOLUME.search(out) if ok else None
+        if match is not None and int(match.group(1)) != self.volumes.get(mac):
+            self.volumes[mac] = int(match.group(1))
+            Storage.save_bluetooth_volumes(self.volumes)
+
+    def status(self):
+        """Connected Bluetooth sinks, which one is active and their volumes."""
+        return {
+            "active": self.active,
+            "sinks": [
+                {"mac": mac, "sink": sink, "volume": self.volume(mac), "active": mac == self.active}
+                for mac, (_, sink) in sorted(self.sinks().items())
+            ],
+        }
@@ -0,0 +1,1193 @@
+"""Off-Pi benchmarks for MediaPI.
+
+Every benchmark runs the real player against the fakes in fakes.py, so
+results are comparable between a dev box and CI.
+
+Usage:
+    python benchmark.py                          # run everything
+    python benchmark.py fps input_latency        # run selected benchmarks
+    python benchmark.py --output bench.json      # also write results to JSON
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+
+import metrics
+from fakes import Harness
+from input import InputManager
+from navigation import PERCENT_STEP, VISIBLE_ROWS
+
+# Main loop frame period (seconds), matching MP3Player.run
+FRAME = 0.05
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": _ms(statistics.median(samples)),
+        "p99_ms": _ms(samples[min(len(samples) - 1, int(len(samples) * 0.99))]),
+        "max_ms": _ms(samples[-1]),
+    }
+
+
+def navigation_cost(harness, target, total, strategy):
+    """Frames and button presses needed to move the browser selection to target.
+
+    strategy is "hold" (UP/DOWN only), "page" (KEY2/KEY3 pages then single
+    rows) or "percent" (hold LEFT/RIGHT for 10% jumps, then hold UP/DOWN).
+    Time is simulated, one frame per main-loop tick.
+    """
+    player = harness.browser(total)
+    player.input = InputManager(use_hardware=False)
+    gpio = player.input.backend
+    now, frames, presses, held = 0.0, 0, 0, None
+
+    while player.scroll_index != target and frames < 100000:
+        diff = target - player.scroll_index
+        if strategy == "page" and abs(diff) >= VISIBLE_ROWS:
+            want, tap = ("KEY2" if diff > 0 else "KEY3"), True
+        elif strategy == "percent" and abs(diff) > total * PERCENT_STEP / 100:
+            want, tap = ("RIGHT" if diff > 0 else "LEFT"), False
+        else:
+            want, tap = ("DOWN" if diff > 0 else "UP"), strategy == "page"
+
+        if held is not None and (held != want or tap):
+            gpio.release(held, now)
+            held = None
+        elif held is None:
+            gpio.press(want, now)
+            presses += 1
+            held = want
+
+        for event in player.input.get_events(now):
+            if event.kind != "release":
+                player.handle_event(event)
+        now += FRAME
+        frames += 1
+
+    return {"frames": frames, "presses": presses, "seconds": round(frames * FRAME, 2)}
+
+
+def bench_navigation():
+    total = 5000
+    results = {}
+    with Harness() as harness:
+        for target in (50, 1000, 4999):
+            for strategy in ("hold", "page", "percent"):
+                results[f"{strategy}_to_{target}"] = navigation_cost(
+                    harness, target, total, strategy
+                )
+    return results
+
+
+def bench_fps(frames=100):
+    """Render + LCD push rate per view through the real LCD driver on a fake SPI bus."""
+    results = {}
+    with Harness() as harness:
+        player = harness.player
+        harness.browser(5000)
+        player.play_selection(0)
+        for view in ("MENU", "BROWSER", "PLAYING"):
+            player.view_state = view
+            sent = harness.spi.bytes_written
+            start = time.perf_counter()
+            for _ in range(frames):
+                player.render()
+            elapsed = time.perf_counter() - start
+            results[view] = {
+                "fps": round(frames / elapsed, 1),
+                "spi_bytes_per_frame": (harness.spi.bytes_written - sent) // frames,
+            }
+    return results
+
+
+def bench_lcd(runs=20):
+    """Low-level ST7735 driver on a fake SPI bus: register init, windows, clear and images."""
+    from PIL import Image
+
+    from fakes import FakeSpiDev, install_fake_hardware
+
+    install_fake_hardware()
+    import LCD_1in44
+
+    spi = FakeSpiDev()
+    lcd = LCD_1in44.LCD(spi=spi)
+    # Each D/C toggle is a GPIO write on the Pi
+    gpio_writes = [0]
+    digital_write = lcd.digital_write
+
+    def counted_write(pin, value):
+        gpio_writes[0] += 1
+        digital_write(pin, value)
+
+    lcd.digital_write = counted_write
+    image = Image.new("RGB", (lcd.width, lcd.height), "BLUE")
+    ops = {
+        "init_regs": lambda: (lcd.LCD_InitReg(), lcd.LCD_SetGramScanWay(LCD_1in44.SCAN_DIR_DFT)),
+        "set_windows": lambda: lcd.LCD_SetWindows(0, 0, lcd.width, lcd.height),
+        "clear": lcd.LCD_Clear,
+        "fill_rect": lambda: lcd.LCD_FillRect(0, 40, 128, 80, 0x001F),
+        "show_image": lambda: lcd.LCD_ShowImage(image, 0, 0),
+    }
+    results = {}
+    for name, op in ops.items():
+        calls, transfers = spi.calls, spi.transfers
+        sent, writes = spi.bytes_written, gpio_writes[0]
+        start = time.perf_counter()
+        for _ in range(runs):
+            op()
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "ms": round(elapsed * 1000 / runs, 3),
+            "spi_calls": (spi.calls - calls) // runs,
+            "spi_transfers": (spi.transfers - transfers) // runs,
+            "spi_bytes": (spi.bytes_written - sent) // runs,
+            "gpio_writes": (gpio_writes[0] - writes) // runs,
+        }
+    lcd.module_exit()
+    return results
+
+
+def bench_display_writer(frames=200, spi_mhz=40):
+    """Main-loop cost per frame with SPI inline vs on the writer thread, at a real bus speed."""
+    results = {}
+    for mode, threaded in (("sync", False), ("threaded", True)):
+        with Harness(threaded_display=threaded) as harness:
+            player = harness.player
+            harness.browser(500)
+            player.play_selection(0)
+            harness.spi.byte_time = 8 / (spi_mhz * 1e6)
+            metrics.reset()
+            samples = []
+            for i in range(frames):
+                player.view_state = "PLAYING" if i % 2 else "BROWSER"
+                start = time.perf_counter()
+                player.render()
+                samples.append(time.perf_counter() - start)
+            player.display.flush()
+            # LCD() shares one default SpiDev, so later benchmarks would inherit the delay
+            harness.spi.byte_time = 0.0
+            summary = metrics.summary()
+            counters = summary["counters"]
+            results[mode] = {"main_thread": _percentiles(samples)}
+            if threaded:
+                latency = summary["stages"]["frame_latency"]
+                results[mode].update(
+                    frames_written=counters.get("frames_written", 0),
+                    frames_dropped=counters.get("frames_dropped", 0),
+                    latency_p50_ms=latency["p50_ms"],
+                    latency_p99_ms=latency["p99_ms"],
+                )
+    return results
+
+
+def bench_assets(frames=100):
+    """Static screens from the RGB565 bundle vs drawn and converted every time."""
+    import assets
+
+    results = {}
+    with Harness() as harness, tempfile.TemporaryDirectory() as tmp:
+        player, display = harness.player, harness.player.display
+        path = os.path.join(tmp, "assets.bin")
+        start = time.perf_counter()
+        assets.build(path)
+        build_ms = _ms(time.perf_counter() - start)
+        saved = display.assets
+        for mode, bundle in (("drawn", None), ("bundle", assets.load(path))):
+            display.assets, display._static = bundle, None
+            player.view_state, player.scroll_index = "MENU", 0
+            for screen, draw in (
+                ("menu", player.render),
+                ("message", lambda: player.draw_message("BLUETOOTH", "Scanning (5s)...")),
+            ):
+                sent = harness.spi.bytes_written
+                start = time.perf_counter()
+                for i in range(frames):
+                    player.scroll_index = i % len(player.menu_options)
+                    draw()
+                elapsed = time.perf_counter() - start
+                results.setdefault(screen, {})[mode] = {
+                    "ms_per_frame": round(elapsed * 1000 / frames, 3),
+                    "spi_bytes_per_frame": (harness.spi.bytes_written - sent) // frames,
+                }
+        display.assets = saved
+    results["build_ms"] = build_ms
+    return results
+
+
+def bench_power(seconds=2.0):
+    """Wakeups, frames and main-loop CPU per view: fixed 20 fps vs the render governor."""
+    from app_config import POWER
+
+    results = {}
+    with Harness() as harness:
+        player = harness.player
+        governor = player.governor
+        harness.browser(500)
+        player.play_selection(0)
+        render = player.render
+        frames = [0]
+
+        def counted_render():
+            frames[0] += 1
+            render()
+
+        player.render = counted_render
+
+        def scenario(view, governed, presses=False, config=None):
+            governor.config = config or POWER
+            governor.last_activity = governor.clock() - 10
+            governor.update_backlight()
+            player.view_state, player.scroll_index = view, 0
+            governor.invalidate()
+            stop = threading.Event()
+            stats = {}
+
+            def loop():
+                wakeups, cpu = 0, time.thread_time()
+                frames[0] = 0
+                while not stop.is_set():
+                    if not governed:
+                        governor.invalidate()
+                    player.tick()
+                    wakeups += 1
+                    timeout = governor.timeout(player.target_fps()) if governed else FRAME
+                    player.input.wait(timeout)
+                stats.update(
+                    wakeups_per_s=round(wakeups / seconds, 1),
+                    frames_per_s=round(frames[0] / seconds, 1),
+                    cpu_percent=round((time.thread_time() - cpu) / seconds * 100, 1),
+                )
+
+            thread = threading.Thread(target=loop)
+            thread.start()
+            end = time.monotonic() + seconds
+            while time.monotonic() < end:
+                if presses:
+                    harness.gpio.press("DOWN")
+                    time.sleep(0.05)
+                    harness.gpio.release("DOWN")
+                time.sleep(0.25)
+            stop.set()
+            thread.join()
+            stats["backlight"] = governor.backlight
+            return stats
+
+        for mode, governed in (("fixed", False), ("governed", True)):
+            results[mode] = {
+                "menu_idle": scenario("MENU", governed),
+                "browser_scrolling": scenario("BROWSER", governed, presses=True),
+                "playing": scenario("PLAYING", governed),
+            }
+        results["governed"]["blanked"] = scenario(
+            "PLAYING", True, config=dict(POWER, dim_after_s=0.2, blank_after_s=0.5)
+        )
+        governor.config = POWER
+        player.render = render
+    return results
+
+
+def bench_input_latency(presses=40):
+    """Edge-to-dispatch latency with the main loop running on its own thread."""
+    latencies = []
+    with Harness() as harness:
+        player = harness.player
+        harness.browser(500)
+        handle_event = player.handle_event
+
+        def timed_handle_event(event):
+            latencies.append(time.monotonic() - event.timestamp)
+            handle_event(event)
+
+        player.handle_event = timed_handle_event
+        stop = threading.Event()
+
+        def loop():
+            while not stop.is_set():
+                player.tick()
+                player.input.wait(player.governor.timeout(player.target_fps()))
+
+        thread = threading.Thread(target=loop)
+        thread.start()
+        for i in range(presses):
+            time.sleep(0.037 * (1 + i % 3))  # land at different points in the frame
+            button = "DOWN" if i % 2 == 0 else "UP"
+            harness.gpio.press(button)
+            time.sleep(0.04)
+            harness.gpio.release(button)
+        time.sleep(0.1)
+        stop.set()
+        thread.join()
+    return {"presses": presses, "dispatched": len(latencies), **_percentiles(latencies)}
+
+
+def bench_track_switch(switches=10):
+    """play_selection latency per source, including the first ABS download."""
+    results = {}
+    with Harness() as harness:
+        player = harness.player
+        for source, load in (
+            ("jellyfin", player.load_jellyfin),
+            ("abs", player.load_abs),
+            ("local", player.load_local),
+        ):
+            load()
+            samples = []
+            for i in range(switches):
+                start = time.perf_counter()
+                player.play_selection(i % len(player.playlist))
+                samples.append(time.perf_counter() - start)
+            results[source] = _percentiles(samples)
+    return results
+
+
+def bench_session_resume(items=2000, latency=0.05):
+    """Boot to audio: restoring the session snapshot vs picking the track again.
+
+    Both boots build a fresh player against the same scratch directory;
+    latency is added to every fake server request.
+    """
+    from display import Display
+    from fakes import FakeAudioPlayer
+    from player import MP3Player
+
+    results = {}
+    with Harness(jellyfin_items=items, latency=latency) as harness:
+        harness.player.load_jellyfin(shuffle=True)
+        harness.player.next()
+        harness.player.save_session()
+
+        def boot(resume):
+            requests = sum(harness.server.requests.values())
+            start = time.perf_counter()
+            player = MP3Player(
+                use_hardware=False,
+                auto_connect_bt=False,
+                display=Display(use_hardware=False),
+                input_manager=InputManager(use_hardware=False),
+                audio=FakeAudioPlayer(),
+                start_server=False,
+            )
+            if not resume:
+                player.load_jellyfin()
+                player.play_selection(harness.player.current_index)
+            result = {
+                "boot_to_audio_ms": _ms(time.perf_counter() - start),
+                "requests": sum(harness.server.requests.values()) - requests,
+                "playing": player.audio.uri is not None,
+            }
+            player.shutdown()
+            return result
+
+        results["resumed"] = boot(resume=True)
+        os.remove("session.json")
+        results["cold"] = boot(resume=False)
+    return results
+
+
+def bench_artwork(changes=10, latency=0.03):
+    """Track change to first frame, and to the first frame showing cover art.
+
+    "naive" is what drawing art inline would cost: a full-size cover
+    fetched, decoded and scaled on the main thread. "cold" skips through
+    a new queue as soon as each cover shows, "prefetched" lets the
+    background fetches for the next tracks finish first (as they would
+    while a song plays), "disk" is a fresh cache object reading tiles back
+    from disk.
+    """
+    import requests
+
+    from artwork import Artwork, tile_from_image
+
+    def change(player, step):
+        start = time.perf_counter()
+        step()
+        player.render()
+        frame = time.perf_counter() - start
+        song = player.playlist[player.current_index]
+        while player.artwork.get(song) is None:
+            time.sleep(0.001)
+        player.render()
+        return frame, time.perf_counter() - start
+
+    results = {}
+    with Harness(jellyfin_items=changes * 2, latency=latency) as harness:
+        player = harness.player
+        player.load_jellyfin()
+        item = player.playlist[0]
+        url = f"{harness.server.url}/Items/{item['id']}/Images/Primary"
+        samples = []
+        for _ in range(changes):
+            start = time.perf_counter()
+            tile_from_image(requests.get(url, timeout=5).content, player.artwork.size)
+            samples.append(time.perf_counter() - start)
+        results["naive"] = _percentiles(samples)
+
+        for name, setup in (
+            ("cold", lambda: player.play_selection(0)),
+            ("prefetched", None),
+            ("disk", lambda: setattr(player, "artwork", Artwork())),
+        ):
+            if setup is not None:
+                setup()
+            frames, art = [], []
+            for i in range(changes):
+                while name == "prefetched" and player.artwork.pending:
+                    time.sleep(0.001)
+                step = player.next if i or name == "prefetched" else lambda: player.play_selection(0)
+                frame, shown = change(player, step)
+                frames.append(frame)
+                art.append(shown)
+            results[name] = {"frame": _percentiles(frames), "art": _percentiles(art)}
+        results["cached_tiles"] = len(player.artwork.disk)
+        results["art_requests"] = sum(
+            n for path, n in harness.server.requests.items() if path.endswith("/Images/Primary")
+        )
+    return results
+
+
+def bench_marquee(steps=100):
+    """One step of a scrolling title: a full PLAYING frame vs sending the strip window."""
+    results = {}
+    with Harness(abs_items=3) as harness:
+        player = harness.player
+        player.load_abs()
+        player.playlist[0]["name"] = "The Unabridged Collected Works of an Exceedingly Verbose Author"
+        player.play_selection(0)
+        player.render()
+        marquee = player.marquee
+        # Simulated clock advanced one marquee frame per step, from the end of the pause
+        clock = [0.0]
+        marquee.clock = lambda: clock[0]
+
+        def full_frame():
+            player.render()
+
+        def window():
+            player.display.show_window(marquee.window())
+
+        for mode, step in (("full_frame", full_frame), ("strip_window", window)):
+            clock[0] = marquee.started + marquee.config["pause_s"]
+            sent = harness.spi.bytes_written
+            start = time.perf_counter()
+            for _ in range(steps):
+                clock[0] += 1 / marquee.config["fps"]
+                step()
+            elapsed = time.perf_counter() - start
+            results[mode] = {
+                "ms_per_step": round(elapsed * 1000 / steps, 3),
+                "spi_bytes_per_step": (harness.spi.bytes_written - sent) // steps,
+            }
+    return results
+
+
+def bench_visualizer(seconds=3.0):
+    """Visualizer worker CPU against its budget while the player runs, and audio underruns.
+
+    A fake PCM source writes one period at a time on its own deadline, as a
+    sound card callback would; the main loop runs as on the device.
+    """
+    from app_config import VISUALIZER
+    from fakes import FakePcmSource
+    from visualizer import Visualizer
+
+    results = {}
+    with Harness() as harness:
+        player = harness.player
+        player.load_local()
+        player.play_selection(0)
+        for mode in ("off", "on"):
+            source = FakePcmSource(rate=VISUALIZER["rate"])
+            if mode == "on":
+                player.visualizer = Visualizer(32, 4, 64, tap=source)
+            else:
+                source.start(Visualizer(32, 4, 64).ring)
+            metrics.reset()
+            cpu, start = time.process_time(), time.monotonic()
+            while time.monotonic() - start < seconds:
+                player.tick()
+                time.sleep(player.sleep_time())
+            elapsed = time.monotonic() - start
+            result = {
+                "process_cpu_percent": round((time.process_time() - cpu) / elapsed * 100, 1),
+                "underruns": source.underruns,
+                "max_late_ms": _ms(source.max_late),
+                "lcd_windows_per_s": round(
+                    metrics.summary()["counters"].get("window_blits", 0) / elapsed, 1
+                ),
+            }
+            if mode == "on":
+                visualizer = player.visualizer
+                frame = metrics.summary()["stages"].get("visualizer_frame", {})
+                worker_cpu = metrics.summary()["gauges"].get("visualizer_cpu_percent")
+                result.update({
+                    "bars_fps": round(visualizer.version / elapsed, 1),
+                    "frame_p50_ms": frame.get("p50_ms"),
+                    "frame_p99_ms": frame.get("p99_ms"),
+                    "worker_cpu_percent": worker_cpu,
+                    "budget_percent": VISUALIZER["cpu_budget"] * 100,
+                    "within_budget": worker_cpu is not None
+                    and worker_cpu <= VISUALIZER["cpu_budget"] * 100,
+                })
+                visualizer.stop()
+                player.visualizer = None
+            else:
+                source.stop()
+            results[mode] = result
+    return results
+
+
+def bench_bt_scan(timeout=3.0):
+    """Bluetooth scan: a blocking scan then `bluetoothctl devices`, vs streaming discovery.
+
+    The fake radio finds headphones, a phone, a nameless beacon, a speaker
+    and a distant speaker over two seconds; bluez also has an old car kit
+    cached that is out of range.
+    """
+    from app_config import BLUETOOTH
+    from bluetooth import BluetoothManager
+
+    results = {}
+    with Harness() as harness:
+        player = harness.player
+        # What the menu used to do: nothing on screen until the scan is over
+        start = time.monotonic()
+        BluetoothManager._run_cmd(f"bluetoothctl --timeout {timeout} scan on")
+        _, out = BluetoothManager._run_cmd("bluetoothctl devices")
+        listed = [line.split(" ", 2)[2] for line in out.split("\n") if line.startswith("Device")]
+        blocked = time.monotonic() - start
+        results["blocking"] = {
+            "first_device_s": round(blocked, 2),
+            "ui_blocked_s": round(blocked, 2),
+            "listed": listed,
+        }
+
+        saved = BLUETOOTH["scan_timeout_s"]
+        BLUETOOTH["scan_timeout_s"] = timeout
+        try:
+            start = time.monotonic()
+            player.scan_bluetooth()
+            first, longest_tick, frames = None, 0.0, metrics.summary()["counters"].get("frames", 0)
+            while player.discovery is not None and time.monotonic() - start < timeout + 1:
+                tick = time.monotonic()
+                player.tick()
+                longest_tick = max(longest_tick, time.monotonic() - tick)
+                if first is None and player.bt_devices:
+                    first = time.monotonic() - start
+                player.input.wait(player.sleep_time())
+            results["streaming"] = {
+                "first_device_s": round(first, 2) if first is not None else None,
+                "ui_blocked_s": round(longest_tick, 3),
+                "frames_during_scan": metrics.summary()["counters"].get("frames", 0) - frames,
+                "listed": [device["name"] for device in player.bt_devices],
+            }
+
+            # Connecting as soon as the headphones show up ends the scan
+            player.scan_bluetooth()
+            start = time.monotonic()
+            while not player.bt_devices and time.monotonic() - start < timeout:
+                player.tick()
+                player.input.wait(player.sleep_time())
+            discovery = player.discovery
+            player.connect_bluetooth(0)
+            results["streaming"]["connected_mid_scan"] = sorted(harness.shell.connected)
+            results["streaming"]["scan_stopped_on_connect"] = discovery is not None and (
+                not discovery.running
+            )
+        finally:
+            BLUETOOTH["scan_timeout_s"] = saved
+    return results
+
+
+def bench_audio_routing(switches=10, connect_delay=1.0, sink_delay=1.5):
+    """Switching output between two paired devices: reconnecting vs moving the live stream.
+
+    connect_delay and sink_delay stand in for the Bluetooth link coming up
+    and PulseAudio then creating its A2DP sink.
+    """
+    from bluetooth import BluetoothManager, router
+
+    headphones, speaker = "AA:BB:CC:DD:EE:01", "AA:BB:CC:DD:EE:02"
+    results = {}
+    with Harness() as harness:
+        shell = harness.shell
+        shell.connect_delay, shell.sink_delay = connect_delay, sink_delay
+        player = harness.player
+        player.load_local()
+        player.play_selection(0)
+        loads = harness.audio.loads
+
+        # What every switch used to cost: connect, a fixed 4 s settle, then sinks every 2 s
+        start = time.monotonic()
+        BluetoothManager._run_cmd(f"bluetoothctl connect {headphones}")
+        time.sleep(4)
+        while shell._sink(headphones) not in BluetoothManager._run_cmd("pactl list short sinks")[1]:
+            time.sleep(2)
+        BluetoothManager._run_cmd(f"pactl set-default-sink {shell._sink(headphones)}")
+        results["reconnect_s"] = round(time.monotonic() - start, 2)
+        router.switch(headphones)
+
+        # A device not connected yet: the sink is polled for instead of waited out
+        start = time.monotonic()
+        BluetoothManager.connect(speaker, "Fake Speaker")
+        results["cold_connect_s"] = round(time.monotonic() - start, 2)
+
+        # Both connected now; every further switch only moves the stream
+        router.set_volume(35, headphones)
+        shell.volumes[shell._sink(speaker)] = "60%"  # turned down on the speaker itself
+        durations, followed, commands = [], 0, len(shell.commands)
+        for i in range(switches):
+            mac = headphones if i % 2 == 0 else speaker
+            start = time.monotonic()
+            BluetoothManager.connect(mac)
+            durations.append(time.monotonic() - start)
+            followed += shell.sink_of_stream() == shell._sink(mac)
+        results["warm_switch"] = _percentiles(durations)
+        # Each is a process spawn on the Pi, which dominates the real switch time
+        results["commands_per_switch"] = (len(shell.commands) - commands) / switches
+        results["stream_followed"] = f"{followed}/{switches}"
+        results["vlc_restarts"] = harness.audio.loads - loads
+        results["volumes_restored"] = {
+            "headphones": shell.volumes[shell._sink(headphones)],
+            "speaker": shell.volumes[shell._sink(speaker)],
+        }
+    return results
+
+
+def bench_seek(bursts=5, presses=4, seek_delay=0.15):
+    """Skip bursts: seeks actually sent, and press-to-seek-applied latency.
+
+    seek_delay stands in for the HTTP range request VLC makes on a stream.
+    """
+    latencies, displayed_lag = [], []
+    with Harness() as harness:
+        player, audio = harness.player, harness.audio
+        audio.seek_delay = seek_delay
+        player.load_local()
+        player.play_selection(0)
+        for _ in range(bursts):
+            seeks = audio.seeks
+            start = time.monotonic()
+            target = player.seek.position()
+            for _ in range(presses):
+                harness.gpio.press("RIGHT")
+                player.handle_input()
+                target += 30000
+                displayed_lag.append(abs(player.seek.position() - target))
+                time.sleep(0.06)
+                harness.gpio.release("RIGHT")
+                player.handle_input()
+                time.sleep(0.04)  # past the debounce window
+            while audio.seeks == seeks or player.seek.target is not None:
+                time.sleep(0.005)
+            latencies.append(time.monotonic() - start)
+            player.seek.seek_to(0)
+            while player.seek.target is not None:
+                time.sleep(0.005)
+        sent = audio.seeks - bursts
+    return {
+        "presses": bursts * presses,
+        "seeks_sent": sent,
+        "max_displayed_lag_ms": max(displayed_lag),
+        "burst_to_applied": _percentiles(latencies),
+    }
+
+
+def bench_streaming(tracks=5):
+    """Profile choice and VLC caching per Jellyfin item on a LAN and weak Wi-Fi."""
+    import streaming
+
+    results = {}
+    for network, latency, bandwidth in (("lan", 0.0, 0), ("weak_wifi", 0.08, 2000)):
+        with Harness(latency=latency, bandwidth_kbps=bandwidth) as harness:
+            player = harness.player
+            start = time.monotonic()
+            player.load_jellyfin()
+            while streaming.monitor.throughput is None and time.monotonic() - start < 10:
+                time.sleep(0.01)
+            tracks_played = {}
+            for i in range(tracks):
+                player.play_selection(i)
+                item = player.playlist[i]
+                tracks_played[item.get("container") or "unknown"] = {
+                    "profile": harness.audio.profile,
+                    "caching_ms": harness.audio.caching_ms,
+                }
+            results[network] = {
+                "rtt_ms": round(streaming.monitor.rtt * 1000, 1),
+                "throughput_kbps": round(streaming.monitor.throughput),
+                "probe_ms": _ms(time.monotonic() - start),
+                "tracks": tracks_played,
+            }
+    return results
+
+
+def bench_progress_sync(seconds=3.0, save_every=0.01, flush_every=0.5):
+    """Server requests caused by frequent bookmark saves, and offline replay.
+
+    Saves run far faster than on the device (every 15 s) to stress coalescing;
+    requests per flush is what matters, not per second.
+    """
+    import api_clients
+    from progress_sync import ProgressSync
+
+    with Harness() as harness:
+        player, server = harness.player, harness.server
+        player.progress.stop()
+        player.progress = ProgressSync(interval=flush_every)
+        player.load_abs()
+        abs_items = player.playlist
+        player.load_jellyfin()
+        tracks = [abs_items[0], abs_items[1], player.playlist[0]]
+        before = sum(server.requests[p] for p in PROGRESS_PATHS)
+
+        saves, start = 0, time.monotonic()
+        while time.monotonic() - start < seconds:
+            player.playlist = tracks
+            player.play_selection(saves * len(tracks) // int(seconds / save_every))
+            player.save_bookmark()
+            saves += 1
+            time.sleep(save_every)
+        player.progress.flush()
+        requests_sent = sum(server.requests[p] for p in PROGRESS_PATHS) - before
+
+        # Offline: updates queue to disk, then go out on the next flush
+        abs_client = api_clients.AudiobookshelfClient
+        url, abs_client.server_url = abs_client.server_url, "http://127.0.0.1:9"
+        player.progress.record(tracks[0], 1234)
+        player.progress.flush()
+        queued_on_disk = os.path.exists(player.progress.queue_file)
+        abs_client.server_url = url
+        replayed = ProgressSync(start=False).flush()
+        player.progress.pending.clear()
+
+    return {
+        "bookmark_saves": saves,
+        "flushes": int(seconds / flush_every) + 1,
+        "requests": requests_sent,
+        "offline_queued_to_disk": queued_on_disk,
+        "replayed_after_reconnect": replayed,
+    }
+
+
+PROGRESS_PATHS = ("/api/me/progress/batch/update", "/Sessions/Playing/Progress")
+
+
+def bench_offline_sync(bandwidth_kbps=2000, concurrency=2):
+    """Bulk download of a Jellyfin album and an ABS series, then a no-op re-sync."""
+    from local_library import LocalLibrary
+    from offline_sync import OfflineSync
+
+    config = {
+        "jellyfin_collections": ["f" * 32],
+        "abs_series": ["series"],
+        "concurrency": concurrency,
+        "bandwidth_kbps": bandwidth_kbps,
+        "home_ssids": [],
+        "require_charging": False,
+    }
+    with Harness() as harness:
+        sync = OfflineSync(config)
+        start = time.monotonic()
+        first = dict(sync.sync())
+        elapsed = time.monotonic() - start
+        received = harness.server.requests.total()
+
+        start = time.monotonic()
+        second = dict(sync.sync())
+        resync = time.monotonic() - start
+        downloads = sum(n for p, n in harness.server.requests.items()
+                        if p.lower().endswith("/download"))
+
+        # A synced Jellyfin song plays from disk even with the server gone
+        player = harness.player
+        player.load_jellyfin()
+        harness.server.stop()
+        player.play_selection(0)
+        return {
+            "files": first["downloaded"],
+            "failed": first["failed"],
+            "seconds": round(elapsed, 2),
+            "kbps": round(downloads * len(harness.server.audio) * 8 / 1000 / elapsed),
+            "limit_kbps": bandwidth_kbps,
+            "requests_first_sync": received,
+            "resync_downloads": second["downloaded"],
+            "resync_ms": _ms(resync),
+            "offline_items": len(LocalLibrary.offline_items()),
+            "plays_from_disk": not harness.audio.uri.startswith("http"),
+        }
+
+
+def bench_library_load(items=500, duplicates=20):
+    """Catalog load per source, revisits served from the library cache, and the merged index.
+
+    duplicates local files are copies of Jellyfin songs ("Artist - Title.mp3")
+    that the merged index should fold into one entry each.
+    """
+    import local_library
+
+    results = {}
+    with Harness(jellyfin_items=items, abs_items=items, local_files=items) as harness:
+        player = harness.player
+        for i in range(duplicates):
+            name = f"Artist {i % 10} - Song {i:04d}.mp3"
+            with open(os.path.join(local_library.LOCAL_PATH, name), "wb") as f:
+                f.write(harness.server.audio)
+        for visit in ("first", "revisit"):
+            for source, load in (
+                ("jellyfin", player.load_jellyfin),
+                ("abs", player.load_abs),
+                ("local", player.load_local),
+            ):
+                requests = sum(harness.server.requests.values())
+                start = time.perf_counter()
+                load()
+                results.setdefault(source, {})[visit] = {
+                    "ms": _ms(time.perf_counter() - start),
+                    "items": len(player.playlist),
+                    "requests": sum(harness.server.requests.values()) - requests,
+                }
+
+        requests = sum(harness.server.requests.values())
+        start = time.perf_counter()
+        player.load_library()
+        while player.library.loading:
+            time.sleep(0.001)
+        player.refresh_library_view()
+        merged = player.playlist
+        results["merged"] = {
+            "ms": _ms(time.perf_counter() - start),
+            "items": len(merged),
+            "folded_duplicates": sum(len(item["alternates"]) for item in merged),
+            "requests": sum(harness.server.requests.values()) - requests,
+        }
+    return results
+
+
+def bench_queue(sizes=(1000, 100000, 1000000), steps=1000):
+    """Shuffle setup and per-track cost of the play queue against copying and shuffling a list."""
+    import random
+
+    from play_queue import PlayQueue
+
+    results = {}
+    for n in sizes:
+        playlist = list(range(n))
+        start = time.perf_counter()
+        shuffled = list(playlist)
+        random.shuffle(shuffled)
+        list_ms = _ms(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        queue = PlayQueue(n, shuffle=True, seed=1)
+        setup_ms = _ms(time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(steps):
+            queue.next()
+        next_us = round((time.perf_counter() - start) / steps * 1e6, 2)
+        start = time.perf_counter()
+        queue.set_shuffle(False)
+        queue.set_shuffle(True)
+        toggle_ms = _ms(time.perf_counter() - start)
+        results[n] = {
+            "list_shuffle_ms": list_ms,
+            "queue_setup_ms": setup_ms,
+            "next_us": next_us,
+            "toggle_ms": toggle_ms,
+        }
+    return results
+
+
+def bench_memory():
+    """Python heap peak across a session of loads, renders and track changes."""
+    tracemalloc.start()
+    with Harness(jellyfin_items=500, abs_items=200, local_files=50) as harness:
+        player = harness.player
+        for load in (player.load_jellyfin, player.load_abs, player.load_local):
+            load()
+            for i in range(5):
+                player.play_selection(i)
+                player.render()
+        current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "heap_current_kb": current // 1024,
+        "heap_peak_kb": peak // 1024,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def bench_metrics_overhead(calls=200000):
+    """Per-call cost of a metrics.timed wrapper, disabled and enabled."""
+
+    def plain():
+        pass
+
+    wrapped = metrics.timed("bench")(plain)
+    was_enabled = metrics.enabled
+    results = {"plain_ns": timeit.timeit(plain, number=calls) / calls * 1e9}
+    for state in (False, True):
+        metrics.set_enabled(state)
+        cost = timeit.timeit(wrapped, number=calls) / calls * 1e9
+        results[f"{'enabled' if state else 'disabled'}_ns"] = cost
+    metrics.set_enabled(was_enabled)
+    return {k: round(v, 1) for k, v in results.items()}
+
+
+# Modules that must not be imported before the first frame is drawn
+DEFERRED_MODULES = ("jellyfin", "flask", "server", "api_clients", "vlc")
+
+_FIRST_FRAME = """
+import json, startup
+from player import MP3Player
+MP3Player(use_hardware=False, auto_connect_bt=False, start_server=False)
+print(json.dumps(startup.report()))
+"""
+
+
+def _run_python(args, cwd):
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.run(
+        [sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True
+    )
+
+
+def bench_logging(records=1000, write_latency=0.002, burst=5000):
+    """Caller-side cost of a log call: a synchronous FileHandler vs the queued writer.
+
+    write_latency stands in for an SD card stalling on each flush. The
+    queued writer is also given a burst larger than its queue, and a small
+    size cap, to show dropping and rotation.
+    """
+    import logging
+    import queue
+
+    import logging_setup
+    from app_config import LOGGING
+
+    def slow(handler):
+        flush = handler.flush
+
+        def slow_flush():
+            time.sleep(write_latency)
+            flush()
+
+        handler.flush = slow_flush
+        return handler
+
+    def log_all(logger, count):
+        durations = []
+        for i in range(count):
+            start = time.perf_counter()
+            logger.info(f"Seek to {i * 1000} ms", extra={"duration_ms": 0.4})
+            durations.append(time.perf_counter() - start)
+        return durations
+
+    logger = logging.getLogger("bench.logging")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # What basicConfig's FileHandler did: the write happens in the caller
+        handler = slow(logging.FileHandler(os.path.join(tmp, "sync.log")))
+        handler.setFormatter(logging.Formatter(logging_setup.TEXT_FORMAT))
+        logger.addHandler(handler)
+        start = time.monotonic()
+        durations = log_all(logger, records)
+        results["sync"] = {**_percentiles(durations), "caller_s": round(time.monotonic() - start, 2)}
+        logger.removeHandler(handler)
+        handler.close()
+
+        config = dict(LOGGING, file=os.path.join(tmp, "queued.log"), max_bytes=64 * 1024, backups=2)
+        handler = slow(logging_setup.file_handler(config))
+        pending = queue.Queue(config["queue_size"])
+        listener = logging_setup.QueueListener(pending, handler)
+        listener.start()
+        queued = logging_setup.QueueHandler(pending)
+        logger.addHandler(queued)
+        metrics.reset()
+        start = time.monotonic()
+        durations = log_all(logger, records)
+        caller = time.monotonic() - start
+        log_all(logger, burst)
+        listener.stop()
+        logger.removeHandler(queued)
+        handler.close()
+        files = [f for f in os.listdir(tmp) if f.startswith("queued.log")]
+        results["queued"] = {
+            **_percentiles(durations),
+            "caller_s": round(caller, 2),
+            "burst_dropped": metrics.summary()["counters"].get("log_dropped", 0),
+            "log_files": len(files),
+            "bytes_on_disk": sum(os.path.getsize(os.path.join(tmp, f)) for f in files),
+            "cap_bytes": (config["backups"] + 1) * config["max_bytes"],
+        }
+    return results
+
+
+def bench_config_reload(toggles=6):
+    """Settings applied live vs a restart, with a Jellyfin track playing throughout.
+
+    An edit to .env points Jellyfin at a second server; feature toggles go
+    through the web API path (settings.json); an invalid URL must change
+    nothing.
+    """
+    import api_clients
+    from app_config import FEATURES, JELLYFIN
+    from config_service import ConfigService
+    from fakes import FakeMediaServer
+
+    results = {}
+    saved_features, saved_jellyfin = dict(FEATURES), dict(JELLYFIN)
+    with Harness() as harness:
+        player = harness.player
+        player.settings.stop()
+        settings = player.settings = ConfigService(
+            env_file=os.path.abspath(".env"), settings_file=os.path.abspath("settings.json"),
+            on_change=player.input.wake,
+        )
+        settings.start()
+        player.load_jellyfin()
+        player.play_selection(0)
+        loads = harness.audio.loads
+        second = FakeMediaServer(20, 5).start()
+
+        def until(check):
+            start = time.monotonic()
+            while not check() and time.monotonic() - start < 10:
+                player.tick()
+                player.input.wait(player.sleep_time())
+            return time.monotonic() - start
+
+        try:
+            time.sleep(0.1)  # watcher thread up
+            with open(".env", "w") as f:
+                f.write(f"JELLYFIN_URL={second.url}\nJELLYFIN_API_KEY=fake\n")
+            applied = until(lambda: api_clients.JellyfinClient.server_url == second.url)
+            player.load_jellyfin()
+            results["watcher"] = settings.mode
+            results["env_edit_to_applied_ms"] = _ms(applied)
+            results["new_server_requests"] = sum(second.requests.values())
+
+            durations = []
+            for i in range(toggles):
+                on = i % 2 == 1
+                start = time.monotonic()
+                settings.update({"FEATURE_ARTWORK": on, "FEATURE_ABS": on})
+                until(lambda: (player.artwork is not None) == on)
+                durations.append(time.monotonic() - start)
+            results["feature_toggle"] = _percentiles(durations)
+            results["menu_after_toggles"] = player.menu_options
+
+            results["invalid_rejected"] = settings.update({"JELLYFIN_URL": "not a url"})
+            player.tick()
+            results["url_kept"] = api_clients.JellyfinClient.server_url == second.url
+            results["playback_interrupted"] = (
+                harness.audio.loads != loads or not harness.audio.is_playing()
+            )
+        finally:
+            settings.stop()
+            second.stop()
+            FEATURES.update(saved_features)
+            JELLYFIN.update(saved_jellyfin)
+
+    # What the same change cost before: a restart, up to the menu being drawn
+    with tempfile.TemporaryDirectory() as cwd:
+        proc = _run_python(["-c", _FIRST_FRAME], cwd)
+        results["restart_to_first_frame_ms"] = json.loads(
+            proc.stdout.strip().splitlines()[-1]
+        )["stages"]["first_frame"]
+    return results
+
+
+def bench_startup(runs=3):
+    """Cold-start cost: import profile of player.py and time to the first frame."""
+    with tempfile.TemporaryDirectory() as cwd:
+        # -X importtime lines: "import time: self [us] | cumulative | name"
+        proc = _run_python(["-X", "importtime", "-c", "import player"], cwd)
+        imports = {}
+        for line in proc.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                _, cumulative, name = line[len("import time:"):].split("|")
+                if cumulative.strip().isdigit():
+                    imports[name.strip()] = int(cumulative) / 1000
+        top = sorted(imports.items(), key=lambda kv: kv[1], reverse=True)[:10]
+
+        first_frames = []
+        for _ in range(runs):
+            proc = _run_python(["-c", _FIRST_FRAME], cwd)
+            first_frames.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    return {
+        "import_player_ms": round(imports.get("player", 0), 1),
+        "slowest_imports_ms": {name: round(ms, 1) for name, ms in top},
+        "eager_heavy_imports": [m for m in DEFERRED_MODULES if m in imports],
+        "first_frame_ms": min(r["stages"]["first_frame"] for r in first_frames),
+        "stages_ms": first_frames[-1]["stages"],
+    }
+
+
+BENCHMARKS = {
+    "fps": bench_fps,
+    "assets": bench_assets,
+    "marquee": bench_marquee,
+    "lcd": bench_lcd,
+    "display_writer": bench_display_writer,
+    "power": bench_power,
+    "input_latency": bench_input_latency,
+    "track_switch": bench_track_switch,
+    "seek": bench_seek,
+    "artwork": bench_artwork,
+    "visualizer": bench_visualizer,
+    "bt_scan": bench_bt_scan,
+    "audio_routing": bench_audio_routing,
+    "logging": bench_logging,
+    "config_reload": bench_config_reload,
+    "session_resume": bench_session_resume,
+    "streaming": bench_streaming,
+    "progress_sync": bench_progress_sync,
+    "offline_sync": bench_offline_sync,
+    "library_load": bench_library_load,
+    "queue": bench_queue,
+    "memory": bench_memory,
+    "navigation": bench_navigation,
+    "startup": bench_startup,
+    "metrics_overhead": bench_metrics_overhead,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", choices=list(BENCHMARKS))
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    results = {name: BENCHMARKS[name]() for name in args.names or BENCHMARKS}
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
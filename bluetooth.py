@@ -1,14 +1,246 @@
+import re
+import shlex
 import subprocess
+import threading
 import time
 import logging
+
+import metrics
+from app_config import BLUETOOTH
+from audio_routing import AudioRouter
 from storage import Storage
 
 logger = logging.getLogger(__name__)
 
+# bluetoothctl colours its output and wraps prompts in readline markers
+_ANSI = re.compile(r"\x1b\[[0-9;]*m|[\x01\x02]")
+_EVENT = re.compile(r"\[(NEW|CHG|DEL)\] Device ((?:[0-9A-F]{2}:){5}[0-9A-F]{2}) ?(.*)")
+_RSSI = re.compile(r"(-?\d+)\)?$")
+# Advanced Audio Distribution sink profile
+AUDIO_SINK_UUID = "0000110b"
+# Major device class "Audio/Video" in a Class of Device value
+MAJOR_CLASS_AUDIO = 0x04
+
+
+def signal_level(rssi):
+    """0-3 bars for an RSSI in dBm (0 if unknown)."""
+    if rssi is None:
+        return 0
+    if rssi >= -60:
+        return 3
+    return 2 if rssi >= -75 else 1
+
+
+class Discovery:
+    """A running scan; devices are listed as bluetoothctl reports them.
+
+    Only devices heard during this scan are listed, in the order they were
+    found, so the selection never moves under the user. Devices weaker than
+    min_rssi are skipped, and with audio_only so are devices known not to
+    be audio sinks (phones, keyboards...); devices of unknown type are shown.
+    Nameless devices (mostly BLE beacons) are never listed. Devices that
+    are already connected are listed first.
+    """
+
+    def __init__(self, timeout=None, min_rssi=None, audio_only=None, on_change=None,
+                 config=None):
+        self.config = config or BLUETOOTH
+        self.timeout = self.config["scan_timeout_s"] if timeout is None else timeout
+        self.min_rssi = self.config["min_rssi"] if min_rssi is None else min_rssi
+        self.audio_only = self.config["audio_only"] if audio_only is None else audio_only
+        self.on_change = on_change
+        # mac -> what the scan has learnt about it, listed or not
+        self._seen = {}
+        # Devices already looked up with bluetoothctl info
+        self._checked = set()
+        self._listed = []
+        self._lock = threading.Lock()
+        self._process = None
+        self._stopped = False
+        self._thread = None
+        self.running = False
+        self.version = 0
+
+    @property
+    def devices(self):
+        """Snapshot of the listed devices: dicts with mac, name, rssi and audio."""
+        with self._lock:
+            return [dict(device) for device in self._listed]
+
+    def start(self):
+        """Scan on a background thread, calling on_change as the list changes."""
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="bt-scan", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for _ in self.scan():
+                self._changed()
+        except Exception as e:
+            logger.error(f"Bluetooth scan failed: {e}")
+        finally:
+            self.running = False
+            self._changed()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def stop(self):
+        """End the scan early (e.g. to connect); safe to call more than once."""
+        self._stopped = True
+        process = self._process
+        if process is not None:
+            try:
+                process.terminate()
+            except OSError:
+                pass
+
+    def scan(self):
+        """Yield each device (and each change to a listed one) as the scan reports it."""
+        self.running = True
+        started = time.monotonic()
+        BluetoothManager._run_cmd("bluetoothctl power on")
+        # Names of cached devices; scan events for them only carry the RSSI
+        _, out = BluetoothManager._run_cmd("bluetoothctl devices")
+        cached = {}
+        for line in out.split("\n"):
+            parts = line.split(" ", 2)
+            if len(parts) == 3 and parts[0] == "Device":
+                cached[parts[1]] = parts[2]
+
+        self._process = BluetoothManager._stream_cmd(
+            f"bluetoothctl --timeout {self.timeout} scan on"
+        )
+        try:
+            # Connected devices stop advertising; list them first so they can be switched to
+            for mac in router.sinks():
+                device = self._update("CHG", mac, "", cached)
+                if device is not None:
+                    yield device
+            if self._stopped:
+                return
+            for line in self._process.stdout:
+                if self._stopped:
+                    break
+                match = _EVENT.search(_ANSI.sub("", line))
+                if match is None:
+                    continue
+                device = self._update(*match.groups(), cached)
+                if device is not None:
+                    if self.version == 1:
+                        metrics.observe("bt_first_device", time.monotonic() - started)
+                    yield device
+        finally:
+            process = self._process
+            self.stop()
+            try:
+                process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            self._process = None
+            self.running = False
+
+    def _update(self, kind, mac, rest, cached):
+        """Apply one event; the device if the list changed, else None."""
+        if kind == "DEL":
+            return None
+        device = self._seen.get(mac)
+        if device is None:
+            device = {"mac": mac, "name": cached.get(mac), "rssi": None, "audio": None}
+            self._seen[mac] = device
+        key, _, value = rest.partition(": ")
+        if kind == "NEW":
+            # A name that is just the address with dashes means it has none yet
+            if rest and rest.replace("-", ":") != mac:
+                device["name"] = rest
+        elif key in ("Name", "Alias") and value and value.replace("-", ":") != mac:
+            device["name"] = value
+        elif key == "RSSI":
+            match = _RSSI.search(value)
+            if match:
+                device["rssi"] = int(match.group(1))
+        elif key in ("Icon", "Class", "UUIDs"):
+            self._classify(device, key, value)
+        if device["name"] and mac not in self._checked:
+            # Once per named device; scan events rarely carry its type
+            self._checked.add(mac)
+            self._lookup(device)
+
+        with self._lock:
+            listed = next((d for d in self._listed if d["mac"] == mac), None)
+            if listed is None:
+                if not self._wanted(device):
+                    return None
+                listed = dict(device)
+                self._listed.append(listed)
+                metrics.count("bt_devices_found")
+            else:
+                # Listed devices stay put; only what is drawn for them changes
+                if listed["name"] == device["name"] and signal_level(
+                    listed["rssi"]
+                ) == signal_level(device["rssi"]):
+                    listed["rssi"] = device["rssi"]
+                    return None
+                listed.update(device)
+            self.version += 1
+            return dict(listed)
+
+    def _lookup(self, device):
+        """Fill in a device's type, and its RSSI if known, from bluetoothctl info.
+
+        A [NEW] event carries only the name, so this is how a new device's
+        signal is known before it is listed.
+        """
+        _, out = BluetoothManager._run_cmd(f"bluetoothctl info {device['mac']}")
+        for line in out.split("\n"):
+            key, _, value = line.strip().partition(": ")
+            if key in ("Icon", "Class", "UUID"):
+                self._classify(device, key, value)
+            elif key == "RSSI" and device["rssi"] is None:
+                match = _RSSI.search(value)
+                if match:
+                    device["rssi"] = int(match.group(1))
+            elif key == "Name" and value and not device["name"]:
+                device["name"] = value
+
+    @staticmethod
+    def _classify(device, key, value):
+        value = value.lower()
+        if key == "Icon":
+            device["audio"] = value.startswith("audio")
+        elif key == "Class":
+            try:
+                device["audio"] = (int(value.split()[0], 16) >> 8) & 0x1F == MAJOR_CLASS_AUDIO
+            except ValueError:
+                pass
+        elif AUDIO_SINK_UUID in value:
+            device["audio"] = True
+
+    def _wanted(self, device):
+        if not device["name"]:
+            return False
+        if device["rssi"] is not None and device["rssi"] < self.min_rssi:
+            return False
+        return not (self.audio_only and device["audio"] is False)
+
 
 class BluetoothManager:
+    # Optional callable(cmd) -> (ok, stdout) replacing the shell, e.g. fakes.FakeShell
+    command_runner = None
+    # Optional callable(cmd) -> process with .stdout lines and .terminate(), e.g. FakeShell.stream
+    stream_runner = None
+    # Last known connection state for is_connected(), and when it was checked
+    _connected = False
+    _checked_at = None
+    _refreshing = False
+    _status_lock = threading.Lock()
+
     @staticmethod
     def _run_cmd(cmd):
+        if BluetoothManager.command_runner is not None:
+            return BluetoothManager.command_runner(cmd)
         try:
             res = subprocess.run(
                 cmd, shell=True, capture_output=True, text=True, timeout=15
@@ -18,44 +250,50 @@ class BluetoothManager:
             return False, ""
 
     @staticmethod
+    def _stream_cmd(cmd):
+        """Start cmd and return the process, its output readable line by line."""
+        if BluetoothManager.stream_runner is not None:
+            return BluetoothManager.stream_runner(cmd)
+        return subprocess.Popen(
+            shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, bufsize=1,
+        )
+
+    @staticmethod
+    @metrics.timed("bt_connect")
     def connect(mac, name=None):
+        # Still connected from before: only the output moves, no reconnect
+        if router.switch(mac):
+            logger.info(f"Switched audio to {name or mac}")
+            Storage.save_last_bluetooth_device(mac, name or "Unknown")
+            BluetoothManager._set_connected(True)
+            return True
+
         logger.info(f"Connecting to {name or mac}...")
         BluetoothManager._run_cmd("bluetoothctl power on")
         BluetoothManager._run_cmd(f"bluetoothctl trust {mac}")
         success, _ = BluetoothManager._run_cmd(f"bluetoothctl connect {mac}")
 
         if success:
-            logger.info("Bluetooth link OK. Finding PulseAudio sink...")
-            time.sleep(4)  # Allow Pi Zero CPU to process the sink
-            if BluetoothManager._route_audio(mac):
+            logger.info("Bluetooth link OK. Waiting for its PulseAudio sink...")
+            if router.wait_for_sink(mac) is not None and router.switch(mac):
                 Storage.save_last_bluetooth_device(mac, name or "Unknown")
+                BluetoothManager._set_connected(True)
                 return True
         return False
 
     @staticmethod
-    def _route_audio(mac):
-        mac_fmt = mac.replace(":", "_")
-        for _ in range(5):
-            _, out = BluetoothManager._run_cmd("pactl list short sinks")
-            for line in out.split("\n"):
-                if mac_fmt in line and "bluez_sink" in line:
-                    sink = line.split("\t")[1]
-                    BluetoothManager._run_cmd(f"pactl set-default-sink {sink}")
-                    BluetoothManager._run_cmd(f"pactl set-sink-volume {sink} 80%")
-                    logger.info(f"Audio routed to {sink}")
-                    return True
-            time.sleep(2)
-        return False
+    def discover(timeout=None, min_rssi=None, audio_only=None):
+        """Yield devices in range as they are found (see Discovery)."""
+        yield from Discovery(timeout, min_rssi, audio_only).scan()
 
     @staticmethod
     def scan_devices(timeout=5):
-        BluetoothManager._run_cmd(f"bluetoothctl --timeout {timeout} scan on")
-        _, out = BluetoothManager._run_cmd("bluetoothctl devices")
-        return [
-            {"mac": x.split()[1], "name": x.split(" ", 2)[2]}
-            for x in out.split("\n")
-            if x.startswith("Device")
-        ]
+        """Devices in range after a full scan of timeout seconds."""
+        discovery = Discovery(timeout)
+        for _ in discovery.scan():
+            pass
+        return discovery.devices
 
     @staticmethod
     def auto_connect_last_device():
@@ -64,6 +302,39 @@ class BluetoothManager:
 
     @staticmethod
     def is_connected():
-        """Check if any Bluetooth device is currently connected."""
-        success, out = BluetoothManager._run_cmd("bluetoothctl info")
-        return "Connected: yes" in out if success else False
+        """Whether a Bluetooth device is connected, as last checked.
+
+        Called on every render, so it never runs bluetoothctl itself: once
+        the state is older than status_ttl_s a background check refreshes
+        it, and the cached value is returned meanwhile.
+        """
+        with BluetoothManager._status_lock:
+            checked = BluetoothManager._checked_at
+            due = checked is None or time.monotonic() - checked >= BLUETOOTH["status_ttl_s"]
+            if due and not BluetoothManager._refreshing:
+                BluetoothManager._refreshing = True
+                threading.Thread(
+                    target=BluetoothManager.refresh_connected, name="bt-status", daemon=True
+                ).start()
+            return BluetoothManager._connected
+
+    @staticmethod
+    @metrics.timed("bt_is_connected")
+    def refresh_connected():
+        """Ask bluetoothctl whether any device is connected and cache the answer."""
+        try:
+            success, out = BluetoothManager._run_cmd("bluetoothctl info")
+            BluetoothManager._set_connected("Connected: yes" in out if success else False)
+        finally:
+            BluetoothManager._refreshing = False
+        return BluetoothManager._connected
+
+    @staticmethod
+    def _set_connected(connected):
+        with BluetoothManager._status_lock:
+            BluetoothManager._connected = connected
+            BluetoothManager._checked_at = time.monotonic()
+
+
+# Output routing between connected devices; commands go through _run_cmd so fakes apply
+router = AudioRouter(BluetoothManager._run_cmd)
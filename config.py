@@ -24,25 +24,12 @@
 # THE SOFTWARE.
 #
 from gpiozero.output_devices import PWMOutputDevice
-from gpiozero.input_devices import DigitalInputDevice
 
 import spidev  # ty:ignore[unresolved-import]
 import time
 import logging
-import numpy as np
 from gpiozero import DigitalOutputDevice
 
-# GPIO define
-KEY_UP_PIN = 6
-KEY_DOWN_PIN = 19
-KEY_LEFT_PIN = 5
-KEY_RIGHT_PIN = 26
-KEY_PRESS_PIN = 13
-
-KEY1_PIN = 21
-KEY2_PIN = 20
-KEY3_PIN = 16
-
 
 class RaspberryPi:
     def __init__(
@@ -56,7 +43,6 @@ class RaspberryPi:
         i2c=None,
         i2c_freq=100000,
     ):
-        self.np = np
         self.INPUT = False
         self.OUTPUT = True
 
@@ -65,23 +51,11 @@ class RaspberryPi:
 
         self.GPIO_RST_PIN = self.gpio_mode(rst, self.OUTPUT)
         self.GPIO_DC_PIN = self.gpio_mode(dc, self.OUTPUT)
-        self.GPIO_BL_PIN = self.gpio_mode(bl, self.OUTPUT)
+        self.GPIO_BL_PIN = self.gpio_pwm(bl)
         self.bl_DutyCycle(0)
 
-        # init GPIO
-        # for P4:
-        # sudo vi /boot/config.txt
-        # gpio=6,19,5,26,13,21,20,16=pu
-
-        self.GPIO_KEY_UP_PIN = self.gpio_mode(KEY_UP_PIN, self.INPUT, True, None)
-        self.GPIO_KEY_DOWN_PIN = self.gpio_mode(KEY_DOWN_PIN, self.INPUT, True, None)
-        self.GPIO_KEY_LEFT_PIN = self.gpio_mode(KEY_LEFT_PIN, self.INPUT, True, None)
-        self.GPIO_KEY_RIGHT_PIN = self.gpio_mode(KEY_RIGHT_PIN, self.INPUT, True, None)
-        self.GPIO_KEY_PRESS_PIN = self.gpio_mode(KEY_PRESS_PIN, self.INPUT, True, None)
-
-        self.GPIO_KEY1_PIN = self.gpio_mode(KEY1_PIN, self.INPUT, True, None)
-        self.GPIO_KEY2_PIN = self.gpio_mode(KEY2_PIN, self.INPUT, True, None)
-        self.GPIO_KEY3_PIN = self.gpio_mode(KEY3_PIN, self.INPUT, True, None)
+        # The joystick and key pins are owned by input.InputManager so that
+        # only one GPIO library ever claims them.
 
         # Initialize SPI
         self.SPI = spi
@@ -89,11 +63,15 @@ class RaspberryPi:
             self.SPI.max_speed_hz = spi_freq
             self.SPI.mode = 0b00
 
-    def gpio_mode(self, Pin, Mode, pull_up=None, active_state=True):
-        if Mode:
-            return DigitalOutputDevice(Pin, active_high=True, initial_value=False)
-        else:
-            return DigitalInputDevice(Pin, pull_up=pull_up, active_state=active_state)
+    @property
+    def np(self):
+        # Imported on first use so splash.py loads the driver without numpy
+        import numpy
+
+        return numpy
+
+    def gpio_mode(self, Pin, Mode):
+        return DigitalOutputDevice(Pin, active_high=True, initial_value=False)
 
     def digital_write(self, Pin, value):
         if value:
@@ -114,11 +92,14 @@ class RaspberryPi:
         if self.SPI is not None:
             self.SPI.writebytes(data)
 
-    def bl_DutyCycle(self, duty):
-        if duty > 0:
-            self.GPIO_BL_PIN.on()
-        else:
-            self.GPIO_BL_PIN.off()
+    def spi_writebytes2(self, data):
+        # Any bytes-like object of any length; spidev splits it into
+        # transfers in C, with no per-byte Python list
+        if self.SPI is not None:
+            self.SPI.writebytes2(data)
+
+    def bl_DutyCycle(self, duty):  # percent
+        self.GPIO_BL_PIN.value = max(0, min(100, duty)) / 100.0
 
     def bl_Frequency(self, freq):  # Hz
         self.GPIO_BL_PIN.frequency = freq
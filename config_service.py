@@ -0,0 +1,328 @@
+"""Settings reloaded while the player runs.
+
+.env and settings.json (written by the web API; its values win) are
+watched with inotify, or by polling their modification times where
+inotify is not available. A change is read and validated as a whole; if
+any value is invalid nothing is applied. Valid changes wait for the main
+loop, which applies them between two ticks. So a frame never sees half
+of an update, and the audio player is never touched. Only what a changed
+setting feeds is rebuilt: the Jellyfin or ABS client, the network
+estimate, the menu, or one feature's background service.
+
+Settings missing from both files keep their current value. Both files
+are also applied once at startup, so saved changes survive a restart.
+"""
+import ctypes
+import json
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from urllib.parse import urlparse
+
+import metrics
+from app_config import ABS, ENV_FILE, FEATURES, JELLYFIN, POWER, SETTINGS_FILE, STREAMING
+
+logger = logging.getLogger(__name__)
+
+# Wait this long after a change for an editor to finish writing
+DEBOUNCE_S = 0.2
+# Modification-time polling interval when inotify is unavailable
+POLL_S = 2.0
+
+# inotify event bits: written and closed, renamed into place, created, deleted
+_IN_EVENTS = 0x008 | 0x080 | 0x100 | 0x200
+_IN_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _url(value):
+    value = str(value).strip().rstrip("/")
+    parsed = urlparse(value)
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        raise ValueError("must be an http(s) URL")
+    return value
+
+
+def _text(value):
+    return str(value).strip()
+
+
+def _count(value):
+    number = int(str(value).strip())
+    if number < 0:
+        raise ValueError("must not be negative")
+    return number
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes", "on"):
+        return True
+    if text in ("0", "false", "no", "off"):
+        return False
+    raise ValueError("must be true or false")
+
+
+# Reloadable settings: name -> (parser, config dict it lives in, key in that dict)
+SETTINGS = {
+    "JELLYFIN_URL": (_url, JELLYFIN, "url"),
+    "JELLYFIN_API_KEY": (_text, JELLYFIN, "api"),
+    "JELLYFIN_USER_ID": (_text, JELLYFIN, "user_id"),
+    "ABS_URL": (_url, ABS, "url"),
+    "ABS_API_KEY": (_text, ABS, "api"),
+    "ABS_LIB_ID": (_text, ABS, "lib_id"),
+    "STREAM_MAX_BITRATE": (_count, STREAMING, "max_bitrate_kbps"),
+    "DIM_AFTER_S": (_count, POWER, "dim_after_s"),
+    "BLANK_AFTER_S": (_count, POWER, "blank_after_s"),
+    **{f"FEATURE_{name}": (_flag, FEATURES, name) for name in FEATURES},
+}
+SECRETS = ("JELLYFIN_API_KEY", "ABS_API_KEY")
+
+
+def mask(value):
+    """A secret as shown by the web API: only its last four characters."""
+    return f"****{value[-4:]}" if value else ""
+
+
+class Inotify:
+    """Names of files changed in one directory, from a Linux inotify descriptor."""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), _IN_EVENTS) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+
+    def changed(self, timeout):
+        """Names changed within timeout seconds (empty if none)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return set()
+        names, offset = set(), 0
+        while offset + _IN_EVENT_HEADER.size <= len(data):
+            _, _, _, length = _IN_EVENT_HEADER.unpack_from(data, offset)
+            offset += _IN_EVENT_HEADER.size
+            names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ConfigService:
+    """Watches the settings files and hands validated changes to the main loop.
+
+    on_change is called from the watcher thread when changes are waiting,
+    e.g. InputManager.wake so the main loop applies them straight away.
+    """
+
+    def __init__(self, env_file=ENV_FILE, settings_file=SETTINGS_FILE, on_change=None):
+        self.env_file = env_file
+        self.settings_file = settings_file
+        self.on_change = on_change
+        # What is in effect now, per setting
+        self.values = {name: table[key] for name, (_, table, key) in SETTINGS.items()}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.mode = None
+
+    # --- Reading and validating ---
+    def read(self):
+        """Raw values from .env, then settings.json on top."""
+        from dotenv import dotenv_values
+
+        raw = {}
+        if os.path.exists(self.env_file):
+            raw.update(dotenv_values(self.env_file))
+        try:
+            with open(self.settings_file) as f:
+                raw.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            raise ValueError(f"{self.settings_file}: {e}")
+        return {name: value for name, value in raw.items() if name in SETTINGS and value is not None}
+
+    @staticmethod
+    def validate(raw):
+        """(parsed values, {name: error}) for the known settings in raw."""
+        values, errors = {}, {}
+        for name, value in raw.items():
+            if name not in SETTINGS:
+                errors[name] = "unknown setting"
+                continue
+            try:
+                values[name] = SETTINGS[name][0](value)
+            except (TypeError, ValueError) as e:
+                errors[name] = str(e)
+        return values, errors
+
+    def reload(self):
+        """Read both files and queue whatever changed; {name: error} if invalid."""
+        try:
+            values, errors = self.validate(self.read())
+        except ValueError as e:
+            values, errors = {}, {"settings": str(e)}
+        if errors:
+            metrics.count("config_rejected")
+            logger.warning(f"Settings not applied: {errors}")
+            return errors
+        with self._lock:
+            changes = {name: value for name, value in values.items() if self.values[name] != value}
+            self._pending = changes
+        if changes:
+            logger.info(f"Settings changed: {sorted(changes)}")
+            if self.on_change is not None:
+                self.on_change()
+        return {}
+
+    def load(self):
+        """Apply both files now, at startup; {name: error} if invalid.
+
+        Settings saved through the web API and FEATURE_* values in .env
+        take effect before anything has read the config.
+        """
+        errors = self.reload()
+        if not errors:
+            self.apply_pending()
+        return errors
+
+    # --- Applying (main loop) ---
+    @property
+    def pending(self):
+        return bool(self._pending)
+
+    def apply_pending(self):
+        """Apply queued changes in one step; returns the names that changed."""
+        with self._lock:
+            changes, self._pending = self._pending, {}
+        for name, value in changes.items():
+            _, table, key = SETTINGS[name]
+            table[key] = value
+            self.values[name] = value
+        if changes:
+            self._rebuild(changes)
+            metrics.count("config_reloads")
+        return set(changes)
+
+    @staticmethod
+    def _rebuild(changes):
+        """Point the server clients at new settings; only if they are loaded yet."""
+        clients = sys.modules.get("api_clients")
+        if any(name.startswith("JELLYFIN_") for name in changes):
+            if clients is not None:
+                clients.JellyfinClient.configure()
+            if "JELLYFIN_URL" in changes:
+                import streaming
+
+                # RTT and throughput were measured against the old server
+                streaming.monitor = streaming.NetworkMonitor()
+        if clients is not None and any(name.startswith("ABS_") for name in changes):
+            clients.AudiobookshelfClient.configure()
+
+    # --- Web API ---
+    def settings(self):
+        """Current settings for display, secrets masked."""
+        return {
+            name: mask(value) if name in SECRETS else value
+            for name, value in self.values.items()
+        }
+
+    def update(self, changes):
+        """Validate and save changes to settings.json; {name: error} if rejected.
+
+        A masked secret sent back unchanged is left as it is.
+        """
+        changes = {
+            name: value for name, value in changes.items()
+            if not (name in SECRETS and value == mask(self.values.get(name, "")))
+        }
+        _, errors = self.validate(changes)
+        if errors:
+            return errors
+        try:
+            with open(self.settings_file) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+        saved.update(changes)
+        tmp = f"{self.settings_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(saved, f, indent=2)
+        os.replace(tmp, self.settings_file)
+        return self.reload()
+
+    # --- Watching ---
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="config-watch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _files(self):
+        return {os.path.abspath(self.env_file), os.path.abspath(self.settings_file)}
+
+    def _run(self):
+        watchers = {}
+        try:
+            for path in self._files():
+                directory = os.path.dirname(path)
+                if directory not in watchers:
+                    watchers[directory] = Inotify(directory)
+            self.mode = "inotify"
+        except (OSError, AttributeError) as e:
+            for watcher in watchers.values():
+                watcher.close()
+            logger.info(f"inotify unavailable ({e}); polling settings files")
+            self.mode = "poll"
+            return self._poll()
+
+        names = {os.path.basename(path) for path in self._files()}
+        try:
+            while not self._stop.is_set():
+                changed = set()
+                for watcher in watchers.values():
+                    changed |= watcher.changed(1.0 / len(watchers))
+                if not changed & names:
+                    continue
+                # Let the writer finish (editors save in several steps)
+                while any(watcher.changed(DEBOUNCE_S) & names for watcher in watchers.values()):
+                    pass
+                self.reload()
+        finally:
+            for watcher in watchers.values():
+                watcher.close()
+
+    def _poll(self):
+        def stamps():
+            result = {}
+            for path in self._files():
+                try:
+                    result[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    result[path] = None
+            return result
+
+        seen = stamps()
+        while not self._stop.wait(POLL_S):
+            current = stamps()
+            if current != seen:
+                seen = current
+                self.reload()
@@ -1,40 +1,312 @@
 """Display rendering for LCD screen."""
+import logging
+import threading
+import time
+
 from PIL import Image, ImageDraw, ImageFont
+
+import assets
+import metrics
 from app_config import DISPLAY_WIDTH, DISPLAY_HEIGHT
 
+logger = logging.getLogger(__name__)
+
+
+def to_rgb565(image):
+    """Convert a PIL RGB image to the LCD's big-endian RGB565 bytes."""
+    import numpy as np
+
+    rgb = np.asarray(image, dtype=np.uint16)
+    pixels = ((rgb[..., 0] & 0xF8) << 8) | ((rgb[..., 1] & 0xFC) << 3) | (rgb[..., 2] >> 3)
+    return pixels.astype(">u2").tobytes()
+
+
+def clamp_box(box, width=DISPLAY_WIDTH, height=DISPLAY_HEIGHT):
+    """A (x1, y1, x2, y2) box limited to the screen; None if nothing is left."""
+    x1, y1 = max(0, box[0]), max(0, box[1])
+    x2, y2 = min(width, box[2]), min(height, box[3])
+    return (x1, y1, x2, y2) if x2 > x1 and y2 > y1 else None
+
+
+class FrameWriter:
+    """Converts and sends frames to the LCD on its own thread.
+
+    The main loop submits a finished framebuffer and carries on drawing
+    into the other one. Only one frame waits at a time: a newer frame
+    replaces it (counted in frames_dropped), keeping any regions the stale
+    one still had to send. Small pre-converted windows (marquee steps) ride
+    along with whatever is waiting. frame_latency is submit-to-sent time.
+    """
+
+    def __init__(self, disp):
+        self.disp = disp
+        self._cond = threading.Condition()
+        self._pending = None
+        self._converting = None
+        self._sending = False
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="lcd-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, image, boxes=None, frame=None):
+        """Queue a frame.
+
+        boxes None sends all of image; otherwise only those regions of it,
+        on top of frame (a full-screen assets.Frame) if given.
+        """
+        job = {
+            "image": image, "boxes": boxes, "frame": frame, "blits": [],
+            "submitted": time.perf_counter(),
+        }
+        with self._cond:
+            stale = self._pending
+            if stale is not None:
+                metrics.count("frames_dropped")
+                if frame is None and boxes is not None:
+                    # A regions-only frame still owes the stale frame's writes
+                    job["frame"] = stale["frame"]
+                    job["blits"] = stale["blits"]
+                    if stale["boxes"] is None:
+                        job["boxes"] = None
+                    else:
+                        job["boxes"] = list(dict.fromkeys((*stale["boxes"], *boxes)))
+            self._pending = job
+            self._cond.notify_all()
+
+    def blit(self, frame):
+        """Queue an RGB565 assets.Frame to send after anything already waiting.
+
+        A waiting blit to the same place is replaced rather than sent twice.
+        """
+        with self._cond:
+            job = self._pending
+            if job is None:
+                job = self._pending = {
+                    "image": None, "boxes": [], "frame": None, "blits": [],
+                    "submitted": time.perf_counter(),
+                }
+            job["blits"] = [
+                b for b in job["blits"] if (b.x, b.y, b.width, b.height)
+                != (frame.x, frame.y, frame.width, frame.height)
+            ]
+            job["blits"].append(frame)
+            self._cond.notify_all()
+
+    def wait_free(self, image):
+        """Block while the writer is still reading image."""
+        with self._cond:
+            while self._converting is image:
+                self._cond.wait()
+
+    def flush(self, timeout=5.0):
+        """Wait until every submitted frame has been sent."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending is not None or self._sending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self):
+        """Send what is pending, then end the thread."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stop:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                job, self._pending = self._pending, None
+                self._converting, self._sending = job["image"], True
+            try:
+                self._write(job)
+            except Exception as e:
+                logger.error(f"LCD write failed: {e}")
+            finally:
+                with self._cond:
+                    self._converting, self._sending = None, False
+                    self._cond.notify_all()
+
+    def _write(self, job):
+        image = job["image"]
+        # Convert first so the framebuffer can be handed back before the SPI transfer
+        if image is None:
+            blits = []
+        elif job["boxes"] is None:
+            blits = [((0, 0, image.width, image.height), to_rgb565(image))]
+        else:
+            blits = [
+                (box, to_rgb565(image.crop(box)))
+                for box in filter(None, map(clamp_box, job["boxes"]))
+            ]
+        with self._cond:
+            self._converting = None
+            self._cond.notify_all()
+
+        frame = job["frame"]
+        if frame is not None:
+            assets.blit(self.disp, frame.data, frame.x, frame.y, frame.width, frame.height)
+        for (x1, y1, x2, y2), data in blits:
+            assets.blit(self.disp, data, x1, y1, x2 - x1, y2 - y1)
+        for window in job["blits"]:
+            assets.blit(self.disp, window.data, window.x, window.y, window.width, window.height)
+        metrics.observe("frame_latency", time.perf_counter() - job["submitted"])
+        metrics.count("frames_written")
+
 
 class Display:
     """Manages LCD display rendering."""
 
-    def __init__(self, use_hardware=True):
-        """Initialize display."""
+    def __init__(self, use_hardware=True, bundle=None, threaded=True):
+        """Initialize display.
+
+        bundle is an assets.AssetBundle; by default assets.bin is loaded if
+        it exists and is up to date. With threaded, frames are drawn into
+        one of two framebuffers and sent by a FrameWriter thread.
+        """
         self.use_hardware = use_hardware
         self.width = DISPLAY_WIDTH
         self.height = DISPLAY_HEIGHT
+        self.assets = bundle if bundle is not None else assets.load()
+        # Pre-rendered frame currently on the LCD, and regions drawn over it
+        self._static = None
+        self._dirty = []
+        self._restore = []
+        self.writer = None
 
         if use_hardware:
             import LCD_1in44
 
             self.disp = LCD_1in44.LCD()
             self.disp.LCD_Init(LCD_1in44.SCAN_DIR_DFT)
-            self.disp.LCD_Clear()
+            if not self.show_frame("splash"):
+                self.disp.LCD_Clear()
+            if threaded:
+                self.writer = FrameWriter(self.disp)
         else:
             self.disp = None
 
-        self.image = Image.new("RGB", (self.width, self.height), "BLACK")
-        self.draw = ImageDraw.Draw(self.image)
+        # Back buffer (self.image) is drawn on while the writer reads the other
+        self._buffers = [Image.new("RGB", (self.width, self.height), "BLACK") for _ in range(2)]
+        self._draws = [ImageDraw.Draw(buf) for buf in self._buffers]
+        self._back = 0
+        self.image, self.draw = self._buffers[0], self._draws[0]
         self.font = ImageFont.load_default()
 
+    def _swap(self):
+        """Hand the back buffer to the writer and draw into the other one.
+
+        The new back buffer holds an older frame; every screen starts with
+        clear() or draw_static(), which overwrite all of it.
+        """
+        self._back = 1 - self._back
+        buf = self._buffers[self._back]
+        self.writer.wait_free(buf)
+        self.image, self.draw = buf, self._draws[self._back]
+
     def clear(self):
         """Clear the display."""
         self.draw.rectangle((0, 0, self.width, self.height), fill="BLACK")
 
+    @metrics.timed("show_image")
     def show_image(self, image=None):
         """Display an image."""
         img = image if image is not None else self.image
-        if self.use_hardware and self.disp:
+        self._static, self._dirty, self._restore = None, [], []
+        if self.writer is not None:
+            if image is not None:
+                self.writer.submit(image.copy())
+            else:
+                self.writer.submit(self.image)
+                self._swap()
+        elif self.use_hardware and self.disp:
             self.disp.LCD_ShowImage(img, 0, 0)
 
+    def show_window(self, frame):
+        """Send an RGB565 assets.Frame (e.g. a marquee step) to its place on the LCD.
+
+        The drawing buffer is not touched; the next full frame redraws it.
+        """
+        if self.writer is not None:
+            self.writer.blit(frame)
+        elif self.use_hardware and self.disp:
+            assets.blit(self.disp, frame.data, frame.x, frame.y, frame.width, frame.height)
+        metrics.count("window_blits")
+
+    def show_frame(self, name):
+        """Send a pre-rendered frame straight to the LCD; False if not bundled."""
+        frame = self.assets.get(name) if self.assets else None
+        if frame is None:
+            return False
+        if self.writer is not None:
+            self.writer.submit(None, [], frame)
+        elif self.use_hardware and self.disp:
+            assets.blit(self.disp, frame.data, frame.x, frame.y, frame.width, frame.height)
+        metrics.count("asset_blits")
+        return True
+
+    def draw_static(self, name):
+        """Start a frame from a static screen in assets.SCREENS.
+
+        With a bundle, the screen goes to the LCD as stored RGB565 (only
+        when it is not already showing) and is pasted into the drawing
+        buffer; finish the frame with show_regions(). Without one the
+        screen is drawn from code and show_regions() sends a full frame.
+        """
+        frame = self.assets.get(name) if self.assets else None
+        if frame is None:
+            self.clear()
+            assets.SCREENS[name][0](self)
+            self._static = None
+            return False
+        self.image.paste(frame.image(), (frame.x, frame.y))
+        if self._static != name:
+            self.show_frame(name)
+            self._static, self._dirty = name, []
+        # Whatever was drawn over the frame last time must be put back
+        self._restore, self._dirty = self._dirty, []
+        return True
+
+    @metrics.timed("show_regions")
+    def show_regions(self, *boxes):
+        """Send only the given (x1, y1, x2, y2) regions drawn since draw_static()."""
+        if self._static is None:
+            self.show_image()
+            return
+        regions = list(dict.fromkeys((*self._restore, *boxes)))
+        self._dirty, self._restore = list(boxes), []
+        if self.writer is not None:
+            self.writer.submit(self.image, regions)
+            self._swap()
+            return
+        for box in regions:
+            self.show_region(box)
+
+    def show_region(self, box):
+        """Convert and send one region of the drawing buffer."""
+        box = clamp_box(box, self.width, self.height)
+        if self.use_hardware and self.disp and box is not None:
+            x1, y1, x2, y2 = box
+            data = to_rgb565(self.image.crop(box))
+            assets.blit(self.disp, data, x1, y1, x2 - x1, y2 - y1)
+
+    def flush(self):
+        """Wait until queued frames are on the LCD."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def set_backlight(self, percent):
+        """Set backlight brightness (0 turns it off)."""
+        if self.use_hardware and self.disp:
+            self.disp.bl_DutyCycle(percent)
+
     def draw_text(self, x, y, text, fill="WHITE"):
         """Draw text on the display."""
         self.draw.text((x, y), text, fill=fill, font=self.font)
@@ -43,7 +315,13 @@ class Display:
         """Draw a rectangle on the display."""
         self.draw.rectangle((x1, y1, x2, y2), fill=fill, outline=outline)
 
+    def draw_frame(self, frame, x, y):
+        """Paste an RGB565 assets.Frame (e.g. a cover tile) at x, y."""
+        self.image.paste(frame.image(), (x, y))
+
     def cleanup(self):
         """Clean up display resources."""
+        if self.writer is not None:
+            self.writer.stop()
         if self.use_hardware and self.disp:
             self.disp.module_exit()
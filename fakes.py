@@ -0,0 +1,646 @@
+"""Simulated hardware, VLC, bluetoothctl/pactl and media servers.
+
+These stand in for everything MP3Player touches outside Python so the app
+can be driven and benchmarked on a dev box. Harness wires them together.
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from app_config import FEATURES
+from utils import Source
+
+
+# --- LCD / SPI / GPIO ---
+class FakeSpiDev:
+    """Records SPI traffic instead of sending it."""
+
+    def __init__(self, bus=0, device=0):
+        self.max_speed_hz = 0
+        self.mode = 0
+        # Python-level calls, and kernel transfers (writebytes2 splits at BUFSIZ)
+        self.calls = 0
+        self.transfers = 0
+        self.bytes_written = 0
+        # Seconds per byte on the wire; 0 = instant (8 / 40e6 is a 40 MHz bus)
+        self.byte_time = 0.0
+
+    BUFSIZ = 4096
+
+    def writebytes(self, data):
+        if len(data) > self.BUFSIZ:
+            raise OverflowError("spidev.writebytes is limited to 4096 bytes")
+        self._write(data)
+
+    def writebytes2(self, data):
+        self._write(data, max(1, -(-len(data) // self.BUFSIZ)))
+
+    def _write(self, data, transfers=1):
+        self.calls += 1
+        self.transfers += transfers
+        self.bytes_written += len(data)
+        if self.byte_time:
+            time.sleep(len(data) * self.byte_time)
+
+    def close(self):
+        pass
+
+
+def install_fake_hardware():
+    """Let LCD_1in44 run unmodified: fake spidev plus gpiozero's mock pins."""
+    from gpiozero import Device
+    from gpiozero.pins.mock import MockFactory, MockPWMPin
+
+    if "spidev" not in sys.modules:
+        try:
+            import spidev  # noqa: F401  # ty:ignore[unresolved-import]
+        except ImportError:
+            sys.modules["spidev"] = types.SimpleNamespace(SpiDev=FakeSpiDev)
+    # The backlight is a PWMOutputDevice
+    Device.pin_factory = MockFactory(pin_class=MockPWMPin)
+
+
+# --- VLC ---
+class FakeAudioPlayer:
+    """AudioPlayer stand-in whose clock runs while "playing".
+
+    load_delay simulates the time VLC takes to open a stream.
+    """
+
+    def __init__(self, duration=180000, load_delay=0.0, seek_delay=0.0):
+        self.default_duration = duration
+        self.load_delay = load_delay
+        self.seek_delay = seek_delay
+        self.uri = None
+        self.caching_ms = None
+        self.profile = None
+        self.loads = 0
+        self.seeks = 0
+        self._duration = -1
+        self._position = 0
+        self._started = None
+        self._end_reported = False
+
+    def load_uri(self, uri, start_time=0, caching_ms=None, profile="local"):
+        time.sleep(self.load_delay)
+        self.uri, self.caching_ms, self.profile = uri, caching_ms, profile
+        self.loads += 1
+        self._duration = self.default_duration
+        self._position = min(start_time, self._duration)
+        self._started = time.monotonic()
+        self._end_reported = False
+
+    def play(self):
+        if self.uri and self._started is None:
+            self._started = time.monotonic()
+
+    def pause(self):
+        self._position = self.get_time()
+        self._started = None
+
+    def get_time(self):
+        if self._started is None:
+            return self._position
+        elapsed = int((time.monotonic() - self._started) * 1000)
+        return min(self._duration, self._position + elapsed)
+
+    def set_time(self, position):
+        time.sleep(self.seek_delay)
+        self.seeks += 1
+        self._position = max(0, min(self._duration, position))
+        if self._started is not None:
+            self._started = time.monotonic()
+
+    def get_duration(self):
+        return self._duration
+
+    def is_playing(self):
+        return self._started is not None and self.get_time() < self._duration
+
+    def is_buffering(self):
+        return False
+
+    def consume_end(self):
+        if self.uri is None or self._end_reported or self.get_time() < self._duration:
+            return False
+        self._end_reported = True
+        return True
+
+    def consume_error(self):
+        return False
+
+
+# --- bluetoothctl / pactl ---
+class FakeShell:
+    """Answers the bluetoothctl and pactl commands BluetoothManager runs.
+
+    Install with BluetoothManager.command_runner = FakeShell(...).
+    """
+
+    # Devices in range for a scan: (seconds until found, mac, name, rssi, icon)
+    NEARBY = (
+        (0.3, "AA:BB:CC:DD:EE:01", "Fake Headphones", -52, "audio-headset"),
+        (0.5, "AA:BB:CC:DD:EE:03", "Fake Phone", -48, "phone"),
+        (0.8, "AA:BB:CC:DD:EE:06", None, -40, None),
+        (1.2, "AA:BB:CC:DD:EE:02", "Fake Speaker", -68, "audio-card"),
+        (1.8, "AA:BB:CC:DD:EE:04", "Distant Speaker", -93, "audio-card"),
+    )
+
+    def __init__(self, devices=None, nearby=None, connect_delay=0.0, sink_delay=0.0):
+        # Devices bluez has cached: the paired ones plus one long out of range
+        self.devices = devices or {
+            "AA:BB:CC:DD:EE:01": "Fake Headphones",
+            "AA:BB:CC:DD:EE:02": "Fake Speaker",
+            "AA:BB:CC:DD:EE:05": "Old Car Kit",
+        }
+        self.nearby = self.NEARBY if nearby is None else nearby
+        self.icons = {"AA:BB:CC:DD:EE:05": "audio-card"}
+        # RSSI of devices the current scan has heard
+        self.rssi = {}
+        # How long `bluetoothctl connect` takes, and then PulseAudio to add the sink
+        self.connect_delay = connect_delay
+        self.sink_delay = sink_delay
+        # mac -> monotonic time its sink appears
+        self.connected = {}
+        self._sink_index = {}
+        self.default_sink = None
+        self.volumes = {}
+        # VLC's playback stream: sink-input id -> sink index it plays to
+        self.streams = {"17": "0"}
+        self.moves = 0
+        self.commands = []
+
+    def _sink(self, mac):
+        return f"bluez_sink.{mac.replace(':', '_')}.a2dp_sink"
+
+    def _sinks(self):
+        """{sink name: index} for connected devices whose sink is up."""
+        now = time.monotonic()
+        return {
+            self._sink(mac): self._sink_index.setdefault(mac, str(len(self._sink_index) + 1))
+            for mac, ready in self.connected.items()
+            if ready <= now
+        }
+
+    def __call__(self, cmd):
+        self.commands.append(cmd)
+        args = cmd.split()
+        if args[:2] == ["bluetoothctl", "devices"]:
+            return True, "\n".join(f"Device {m} {n}" for m, n in self.devices.items())
+        if args[:2] == ["bluetoothctl", "connect"]:
+            if args[2] in self.devices:
+                time.sleep(self.connect_delay)
+                self.connected.setdefault(args[2], time.monotonic() + self.sink_delay)
+                return True, "Connection successful"
+            return False, ""
+        if args[:2] == ["bluetoothctl", "info"] and len(args) > 2:
+            if args[2] not in self.devices:
+                return False, f"Device {args[2]} not available"
+            lines = [f"Device {args[2]} (public)", f"\tName: {self.devices[args[2]]}"]
+            if args[2] in self.icons:
+                lines.append(f"\tIcon: {self.icons[args[2]]}")
+            if args[2] in self.rssi:
+                lines.append(f"\tRSSI: {self.rssi[args[2]]}")
+            return True, "\n".join(lines)
+        if args[:2] == ["bluetoothctl", "info"]:
+            return bool(self.connected), "Connected: yes" if self.connected else ""
+        if "scan" in args and "on" in args:
+            # The old blocking scan: returns when discovery times out
+            time.sleep(float(args[args.index("--timeout") + 1]) if "--timeout" in args else 0)
+            return True, ""
+        if args[0] == "bluetoothctl":
+            return True, ""
+        if args[:4] == ["pactl", "list", "short", "sinks"]:
+            sinks = [f"{i}\t{name}\tmodule-bluez5-device.c\ts16le 2ch 44100Hz\tRUNNING"
+                     for name, i in self._sinks().items()]
+            return True, "\n".join(sinks)
+        if args[:4] == ["pactl", "list", "short", "sink-inputs"]:
+            inputs = [f"{stream}\t{sink}\t8\tprotocol-native.c\ts16le 2ch 44100Hz"
+                      for stream, sink in self.streams.items()]
+            return True, "\n".join(inputs)
+        if args[:2] == ["pactl", "move-sink-input"]:
+            sinks = self._sinks()
+            if args[2] not in self.streams or args[3] not in sinks:
+                return False, ""
+            self.streams[args[2]] = sinks[args[3]]
+            self.moves += 1
+            return True, ""
+        if args[:2] == ["pactl", "set-default-sink"]:
+            self.default_sink = args[2]
+            return True, ""
+        if args[:2] == ["pactl", "set-sink-volume"]:
+            self.volumes[args[2]] = args[3]
+            return True, ""
+        if args[:2] == ["pactl", "get-sink-volume"]:
+            if args[2] not in self._sinks():
+                return False, ""
+            volume = self.volumes.get(args[2], "100%")
+            return True, (f"Volume: front-left: 52428 /  {volume} / -5.81 dB,   "
+                          f"front-right: 52428 /  {volume} / -5.81 dB\n        balance 0.00")
+        return False, ""
+
+    def sink_of_stream(self, stream="17"):
+        """Name of the sink a stream plays to, or None."""
+        for name, index in self._sinks().items():
+            if index == self.streams.get(stream):
+                return name
+        return None
+
+    def stream(self, cmd):
+        """A running `bluetoothctl --timeout N scan on` printing devices as they are found."""
+        self.commands.append(cmd)
+        args = cmd.split()
+        return FakeScan(self, float(args[args.index("--timeout") + 1]))
+
+
+class FakeScan:
+    """Output of a bluetoothctl scan, one line as each nearby device is found."""
+
+    def __init__(self, shell, timeout):
+        self.shell = shell
+        self.timeout = timeout
+        self._stop = threading.Event()
+        self.stdout = self._lines()
+
+    def _lines(self):
+        start = time.monotonic()
+        yield "Discovery started\n"
+        for after, mac, name, rssi, icon in sorted(self.shell.nearby, key=lambda d: d[0]):
+            if self._stop.wait(max(0.0, start + after - time.monotonic())):
+                return
+            if after > self.timeout:
+                break
+            # bluez caches what it finds, so it can be connected and looked up
+            if name is not None:
+                self.shell.rssi[mac] = rssi
+                if icon is not None:
+                    self.shell.icons[mac] = icon
+                if mac in self.shell.devices:
+                    yield f"\x1b[0;93m[CHG]\x1b[0m Device {mac} RSSI: 0x{rssi & 0xFFFFFFFF:08x} ({rssi})\n"
+                    continue
+                self.shell.devices[mac] = name
+            yield f"\x1b[0;92m[NEW]\x1b[0m Device {mac} {name or mac.replace(':', '-')}\n"
+            yield f"\x1b[0;93m[CHG]\x1b[0m Device {mac} RSSI: {rssi}\n"
+        self._stop.wait(max(0.0, start + self.timeout - time.monotonic()))
+
+    def terminate(self):
+        self._stop.set()
+
+    def wait(self, timeout=None):
+        return 0
+
+    def kill(self):
+        self._stop.set()
+
+
+# --- Audio ---
+class FakePcmSource:
+    """Visualizer tap that feeds a tone sweep plus noise in real time.
+
+    It writes one audio period at a time, like a sound card callback with a
+    deadline. A period started more than one period late counts as an
+    underrun: the device would have played silence.
+    """
+
+    def __init__(self, rate=44100, period=1024):
+        self.rate = rate
+        self.period = period
+        self.underruns = 0
+        self.max_late = 0.0
+        self.periods = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, ring):
+        import numpy as np
+
+        self._stop.clear()
+        rng = np.random.default_rng(1)
+
+        def run():
+            t0 = time.monotonic()
+            n = 0
+            while not self._stop.is_set():
+                due = t0 + n * self.period / self.rate
+                late = time.monotonic() - due
+                self.max_late = max(self.max_late, late)
+                if late > self.period / self.rate:
+                    self.underruns += 1
+                t = (n * self.period + np.arange(self.period)) / self.rate
+                freq = 100 * 2 ** ((n % 400) / 60)
+                tone = np.sin(2 * np.pi * freq * t) * 12000 + rng.normal(0, 500, self.period)
+                ring.write(tone.astype(np.int16))
+                n += 1
+                self.periods += 1
+                self._stop.wait(max(0.0, t0 + n * self.period / self.rate - time.monotonic()))
+
+        self._thread = threading.Thread(target=run, name="fake-pcm", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+
+# --- Jellyfin / Audiobookshelf ---
+# Mix of formats so every stream profile gets exercised
+# Off by default in app_config; the harness turns them on (the visualizer stays off)
+OPT_IN_FEATURES = ("PROGRESS_SYNC", "OFFLINE_SYNC", "RESUME_SESSION", "ARTWORK")
+
+CONTAINERS = ("mp3", "flac", "m4a", "wma", None)
+# Bitrate (bps) Jellyfin reports for each container's files
+BITRATES = {"mp3": 320_000, "flac": 900_000, "m4a": 256_000, "wma": 192_000}
+# Largest cover the fake server sends (what a full-size request gets)
+COVER_SIZE = 600
+
+
+class FakeMediaServer:
+    """Local HTTP stand-in for both Jellyfin and Audiobookshelf.
+
+    Serves just the endpoints api_clients uses, counts requests per path
+    and answers audio requests with `audio_bytes` of filler. latency (s)
+    and bandwidth_kbps (0 = unlimited) emulate a slow link.
+    """
+
+    def __init__(self, jellyfin_items=50, abs_items=20, audio_bytes=64 * 1024,
+                 latency=0.0, bandwidth_kbps=0):
+        self.audio = b"\xff\xfb" * (audio_bytes // 2)
+        self.latency = latency
+        self.bandwidth_kbps = bandwidth_kbps
+        self.requests = Counter()
+        self.jellyfin = [
+            {
+                "Name": f"Song {i:04d}",
+                "AlbumArtist": f"Artist {i % 10}",
+                "Id": f"{i:032x}",
+                "Type": "Audio",
+                "RunTimeTicks": (120 + i % 180) * 10_000_000,
+                "Container": CONTAINERS[i % len(CONTAINERS)],
+                "MediaSources": [{"Bitrate": BITRATES.get(CONTAINERS[i % len(CONTAINERS)])}],
+                # Every tenth song was part-played elsewhere an hour ago
+                "UserData": {
+                    "PlaybackPositionTicks": 60_000 * 10_000 if i % 10 == 0 else 0,
+                    "LastPlayedDate": time.strftime(
+                        "%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - 3600)
+                    ),
+                },
+            }
+            for i in range(jellyfin_items)
+        ]
+        # Books are three 60 s files with six 30 s chapters
+        self.abs = [
+            {
+                "id": f"li_{i:04d}",
+                "mediaType": "book",
+                "media": {
+                    "metadata": {"title": f"Book {i:04d}", "authorName": f"Author {i % 7}"},
+                    "tracks": [
+                        {"index": n + 1, "startOffset": n * 60.0, "duration": 60.0,
+                         "contentUrl": f"/api/items/li_{i:04d}/file/{1000 + n}",
+                         "metadata": {"ext": ".mp3"}}
+                        for n in range(3)
+                    ],
+                    "chapters": [
+                        {"id": n, "start": n * 30.0, "end": (n + 1) * 30.0,
+                         "title": f"Chapter {n + 1}"}
+                        for n in range(6)
+                    ],
+                },
+            }
+            for i in range(abs_items)
+        ]
+        self.abs_progress = {
+            x["id"]: {"libraryItemId": x["id"], "currentTime": 300.0,
+                      "lastUpdate": int((time.time() - 3600) * 1000)}
+            for x in self.abs[::5]
+        }
+        # Progress bodies received, in arrival order
+        self.progress_updates = []
+        # Encoded cover art by edge length
+        self._covers = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+
+            def do_POST(self):
+                server._handle_progress(self)
+
+            do_PATCH = do_POST
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handle(self, handler):
+        url = urlparse(handler.path)
+        path = url.path
+        self.requests[path] += 1
+        if path == "/Items":
+            query = parse_qs(url.query)
+            limit = int(query.get("limit", [len(self.jellyfin)])[0])
+            # Any playlist/album holds the first ten songs
+            items = self.jellyfin[:10] if "parentId" in query else self.jellyfin[:limit]
+            body = {"Items": items, "TotalRecordCount": len(self.jellyfin), "StartIndex": 0}
+            return self._send(handler, body)
+        if path.startswith("/api/libraries/") and path.endswith("/items"):
+            # Any series holds the first three books
+            books = self.abs[:3] if "filter=series." in url.query else self.abs
+            return self._send(handler, {"results": books, "total": len(books)})
+        if path == "/api/me":
+            return self._send(handler, {"mediaProgress": list(self.abs_progress.values())})
+        if path == "/System/Ping":
+            return self._send(handler, "Jellyfin Server")
+        if (path.startswith("/Audio/") or path.lower().endswith("/download")
+                or "/file/" in path):
+            return self._send(handler, self.audio, "audio/mpeg")
+        if path.endswith("/Images/Primary") or path.endswith("/cover"):
+            query = parse_qs(url.query)
+            size = int((query.get("maxWidth") or query.get("width") or [COVER_SIZE])[0])
+            return self._send(handler, self.cover(min(size, COVER_SIZE)), "image/jpeg")
+        if path.startswith("/api/items/"):
+            item_id = path.split("/")[3]
+            item = next((x for x in self.abs if x["id"] == item_id), None)
+            if item is not None:
+                return self._send(handler, item)
+        self._send(handler, {"error": "not found"}, status=404)
+
+    def cover(self, size):
+        """A JPEG cover of size x size, encoded once per size."""
+        if size not in self._covers:
+            from PIL import Image, ImageDraw
+
+            image = Image.new("RGB", (size, size), (40, 60, 120))
+            draw = ImageDraw.Draw(image)
+            for i in range(0, size, max(1, size // 8)):
+                draw.line((0, i, size, size - i), fill=(200, 160, 40), width=max(1, size // 32))
+            buf = io.BytesIO()
+            image.save(buf, "JPEG", quality=85)
+            self._covers[size] = buf.getvalue()
+        return self._covers[size]
+
+    def _handle_progress(self, handler):
+        path = urlparse(handler.path).path
+        self.requests[path] += 1
+        length = int(handler.headers.get("Content-Length", 0))
+        body = json.loads(handler.rfile.read(length) or b"null")
+        if path == "/api/me/progress/batch/update":
+            for entry in body:
+                self.abs_progress[entry["libraryItemId"]] = {
+                    **entry, "lastUpdate": int(time.time() * 1000)
+                }
+        elif path != "/Sessions/Playing/Progress":
+            return self._send(handler, {"error": "not found"}, status=404)
+        self.progress_updates.append(body)
+        handler.send_response(204)
+        handler.end_headers()
+
+    def _send(self, handler, body, content_type="application/json", status=200):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        time.sleep(self.latency)
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        if not self.bandwidth_kbps:
+            handler.wfile.write(data)
+            return
+        chunk = 8192
+        for i in range(0, len(data), chunk):
+            handler.wfile.write(data[i:i + chunk])
+            time.sleep(chunk * 8 / 1000 / self.bandwidth_kbps)
+
+
+# --- Everything together ---
+class Harness:
+    """A headless MP3Player wired to fake hardware, VLC, shell and servers.
+
+    Use as a context manager; it runs in a scratch directory so bookmarks
+    and downloads never touch the real ones.
+    """
+
+    def __init__(self, jellyfin_items=50, abs_items=20, local_files=10, load_delay=0.0,
+                 latency=0.0, bandwidth_kbps=0, threaded_display=False):
+        self.jellyfin_items = jellyfin_items
+        self.abs_items = abs_items
+        self.local_files = local_files
+        self.load_delay = load_delay
+        self.latency = latency
+        self.bandwidth_kbps = bandwidth_kbps
+        # Off by default so SPI counters are final as soon as render() returns
+        self.threaded_display = threaded_display
+        self.player = None
+
+    def __enter__(self):
+        # Modules imported later (LCD_1in44, ...) must still resolve after chdir
+        source_dir = os.path.dirname(os.path.abspath(__file__))
+        if source_dir not in sys.path:
+            sys.path.insert(0, source_dir)
+
+        import api_clients
+        import bluetooth
+        import local_library
+        import streaming
+        from bluetooth import BluetoothManager
+        from display import Display
+        from input import InputManager
+        from player import MP3Player
+
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+        install_fake_hardware()
+
+        self.server = FakeMediaServer(
+            self.jellyfin_items, self.abs_items,
+            latency=self.latency, bandwidth_kbps=self.bandwidth_kbps,
+        ).start()
+        self.shell = FakeShell()
+
+        # Opt-in features are all on, so every benchmark exercises them
+        self._features = dict(FEATURES)
+        FEATURES.update({name: True for name in OPT_IN_FEATURES})
+
+        jellyfin, abs_ = api_clients.JellyfinClient, api_clients.AudiobookshelfClient
+        self._saved = [
+            (jellyfin, "server_url", jellyfin.server_url),
+            (jellyfin, "api_key", jellyfin.api_key),
+            (jellyfin, "_api", None),
+            (abs_, "server_url", abs_.server_url),
+            (abs_, "DOWNLOAD_DIR", abs_.DOWNLOAD_DIR),
+            (local_library, "LOCAL_PATH", local_library.LOCAL_PATH),
+            (BluetoothManager, "command_runner", BluetoothManager.command_runner),
+            (BluetoothManager, "stream_runner", BluetoothManager.stream_runner),
+            (BluetoothManager, "_connected", BluetoothManager._connected),
+            (BluetoothManager, "_checked_at", BluetoothManager._checked_at),
+            (bluetooth.router, "active", bluetooth.router.active),
+            (bluetooth.router, "_volumes", bluetooth.router._volumes),
+            (streaming, "monitor", streaming.monitor),
+        ]
+        streaming.monitor = streaming.NetworkMonitor()
+        jellyfin.server_url, jellyfin.api_key, jellyfin._api = self.server.url, "fake", None
+        abs_.server_url, abs_.DOWNLOAD_DIR = self.server.url, Path("abs").absolute()
+        BluetoothManager.command_runner = self.shell
+        bluetooth.router.active, bluetooth.router._volumes = None, None
+        BluetoothManager.stream_runner = self.shell.stream
+        BluetoothManager._connected, BluetoothManager._checked_at = False, None
+
+        local_library.LOCAL_PATH = os.path.abspath("music")
+        os.makedirs(local_library.LOCAL_PATH)
+        for i in range(self.local_files):
+            with open(os.path.join(local_library.LOCAL_PATH, f"Local {i:03d}.mp3"), "wb") as f:
+                f.write(self.server.audio)
+
+        self.audio = FakeAudioPlayer(load_delay=self.load_delay)
+        self.player = MP3Player(
+            use_hardware=True,
+            auto_connect_bt=False,
+            display=Display(use_hardware=True, threaded=self.threaded_display),
+            input_manager=InputManager(use_hardware=False),
+            audio=self.audio,
+            start_server=False,
+        )
+        self.gpio = self.player.input.backend
+        self.spi = self.player.display.disp.SPI
+        return self
+
+    def __exit__(self, *exc):
+        self.player.shutdown()
+        self.server.stop()
+        for owner, name, value in self._saved:
+            setattr(owner, name, value)
+        FEATURES.update(self._features)
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def browser(self, total):
+        """Park the player in BROWSER on a synthetic list of total items."""
+        self.player.playlist = [
+            {"name": f"{chr(65 + i * 26 // total)} Track {i:05d}", "source": Source.LOCAL.value,
+             "path": os.path.abspath(f"music/Local {i % max(1, self.local_files):03d}.mp3")}
+            for i in range(total)
+        ]
+        self.player.view_state, self.player.scroll_index = "BROWSER", 0
+        return self.player
@@ -0,0 +1,168 @@
+"""Render scheduling and backlight power management.
+
+The main loop used to redraw at a fixed 20 fps whatever was on screen.
+RenderGovernor decides when a frame is actually due: on a state change,
+at a per-view rate (a few fps for the progress bar, none for static
+lists), and at full rate for a short burst after input so scrolling stays
+smooth. After inactivity the backlight dims, then blanks and rendering
+stops. CPU use, loop wakeups and frames are reported once a minute as
+metrics gauges.
+"""
+import logging
+import time
+
+import metrics
+from app_config import POWER
+
+logger = logging.getLogger(__name__)
+
+
+class RenderGovernor:
+    """Decides when to render and how long the main loop may sleep.
+
+    display is anything with set_backlight(percent); None skips the
+    backlight. clock is replaceable for simulated time.
+    """
+
+    def __init__(self, display=None, config=None, clock=time.monotonic):
+        self.display = display
+        self.config = config or POWER
+        self.clock = clock
+        now = clock()
+        self.last_activity = now
+        self.last_frame = None
+        self.backlight = None
+        self._dirty = True
+        self._due = []
+        self._report_start = now
+        self._report_cpu = time.process_time()
+        self._wakeups = 0
+        self._frames = 0
+        self.update_backlight(now)
+
+    # --- Events ---
+    def activity(self):
+        """A button was used; returns False if it only woke a blank screen."""
+        now = self.clock()
+        self.last_activity = now
+        self._dirty = True
+        was_blank = self.blank
+        self.update_backlight(now)
+        return not was_blank
+
+    def invalidate(self):
+        """Something on screen changed; render on the next tick."""
+        self._dirty = True
+
+    def schedule(self, delay):
+        """Render again after delay seconds (e.g. when a notice expires)."""
+        self._due.append(self.clock() + delay)
+
+    # --- Scheduling ---
+    @property
+    def blank(self):
+        return self.backlight == 0
+
+    def fps(self, view, animating=True):
+        """Target frame rate for a view; PLAYING only animates while playing."""
+        now = self.clock()
+        if now - self.last_activity < self.config["burst_s"]:
+            return self.config["burst_fps"]
+        if not animating:
+            return 0
+        return self.config["view_fps"].get(view, 0)
+
+    def should_render(self, fps):
+        """True if a frame is due now; call frame() after rendering it."""
+        if self.blank:
+            return False
+        now = self.clock()
+        if self._dirty or (self._due and min(self._due) <= now):
+            return True
+        if self.last_frame is None:
+            return True
+        if fps and now - self.last_frame >= 1 / fps:
+            return True
+        return now - self.last_frame >= self.config["refresh_s"]
+
+    def frame(self):
+        """Record that a frame was rendered."""
+        now = self.clock()
+        self.last_frame = now
+        self._dirty = False
+        self._due = [t for t in self._due if t > now]
+        self._frames += 1
+
+    def timeout(self, fps):
+        """Seconds the main loop can sleep before anything needs doing."""
+        now = self.clock()
+        deadlines = [now + self.config["idle_wakeup_s"]]
+        if not self.blank:
+            if self._dirty:
+                return 0
+            if fps and self.last_frame is not None:
+                deadlines.append(self.last_frame + 1 / fps)
+            if self.last_frame is not None:
+                deadlines.append(self.last_frame + self.config["refresh_s"])
+            deadlines.extend(self._due)
+        deadlines.extend(self._backlight_deadlines())
+        return max(0.0, min(deadlines) - now)
+
+    # --- Backlight ---
+    def _backlight_deadlines(self):
+        deadlines = []
+        for key in ("dim_after_s", "blank_after_s"):
+            if self.config[key]:
+                deadline = self.last_activity + self.config[key]
+                if deadline > self.clock():
+                    deadlines.append(deadline)
+        return deadlines
+
+    def backlight_level(self, now):
+        """Backlight percent for the time since the last activity."""
+        idle = now - self.last_activity
+        if self.config["blank_after_s"] and idle >= self.config["blank_after_s"]:
+            return 0
+        if self.config["dim_after_s"] and idle >= self.config["dim_after_s"]:
+            return self.config["dim_backlight"]
+        return self.config["backlight"]
+
+    def update_backlight(self, now=None):
+        level = self.backlight_level(self.clock() if now is None else now)
+        if level == self.backlight:
+            return
+        logger.debug(f"Backlight {self.backlight} -> {level}%")
+        if self.backlight == 0:
+            # The LCD kept its contents, but they may be stale
+            self._dirty = True
+        self.backlight = level
+        metrics.gauge("backlight", level)
+        if self.display is not None:
+            self.display.set_backlight(level)
+
+    # --- Reporting ---
+    def wakeup(self):
+        """Count one main-loop iteration; updates the backlight and reports."""
+        now = self.clock()
+        self._wakeups += 1
+        metrics.count("wakeups")
+        self.update_backlight(now)
+        elapsed = now - self._report_start
+        if elapsed >= self.config["report_interval_s"]:
+            self.report(now, elapsed)
+
+    def report(self, now, elapsed):
+        """Publish per-minute wakeups and frames and CPU percent."""
+        cpu = time.process_time()
+        per_min = 60 / elapsed
+        stats = {
+            "cpu_percent": round((cpu - self._report_cpu) / elapsed * 100, 1),
+            "wakeups_per_min": round(self._wakeups * per_min, 1),
+            "frames_per_min": round(self._frames * per_min, 1),
+        }
+        for name, value in stats.items():
+            metrics.gauge(name, value)
+        logger.debug(f"Power: {stats}")
+        self._report_start, self._report_cpu = now, cpu
+        self._wakeups = self._frames = 0
+        return stats
@@ -1,44 +1,202 @@
 """GPIO button input handling."""
+import threading
+import time
+from collections import deque
+from functools import partial
+from typing import NamedTuple
+
+from app_config import INPUT
+
+# BCM pin numbers for the Waveshare 1.44" LCD HAT joystick and keys
+PINS = {
+    "UP": 6,
+    "DOWN": 19,
+    "LEFT": 5,
+    "RIGHT": 26,
+    "PRESS": 13,
+    "KEY1": 21,
+    "KEY2": 20,
+    "KEY3": 16,
+}
+
+# Buttons that generate auto-repeat events while held
+REPEATABLE = ("UP", "DOWN", "LEFT", "RIGHT")
+
+
+class InputEvent(NamedTuple):
+    """A debounced button transition or auto-repeat tick.
+
+    kind is "press", "repeat" or "release"; timestamp is time.monotonic()
+    at the edge (or at the scheduled repeat), and repeat counts the repeats
+    emitted since the button went down.
+    """
+
+    button: str
+    kind: str
+    timestamp: float
+    repeat: int = 0
+
+
+class GpioBackend:
+    """Edge-interrupt backend built on gpiozero.
+
+    gpiozero already drives the LCD's SPI control pins, so the buttons are
+    claimed through the same library instead of a second one (RPi.GPIO).
+    """
+
+    def __init__(self, pins, on_edge):
+        from gpiozero import DigitalInputDevice
+
+        self.devices = {}
+        for name, pin in pins.items():
+            device = DigitalInputDevice(pin, pull_up=True)
+            device.when_activated = partial(on_edge, name, True)
+            device.when_deactivated = partial(on_edge, name, False)
+            self.devices[name] = device
+
+    def read(self, name):
+        """Return the raw level of a button (True when held down)."""
+        return bool(self.devices[name].value)
+
+    def close(self):
+        for device in self.devices.values():
+            device.close()
+
+
+class FakeGPIO:
+    """In-memory backend for running off the Pi and for latency tests.
+
+    Call press()/release() (optionally with an explicit monotonic timestamp)
+    to drive edges exactly as the interrupt callbacks would.
+    """
+
+    def __init__(self, pins, on_edge):
+        self.levels = {name: False for name in pins}
+        self._on_edge = on_edge
+
+    def press(self, name, timestamp=None):
+        self.levels[name] = True
+        self._on_edge(name, True, timestamp)
+
+    def release(self, name, timestamp=None):
+        self.levels[name] = False
+        self._on_edge(name, False, timestamp)
+
+    def tap(self, name, timestamp=None):
+        """Press and release a button in one go."""
+        self.press(name, timestamp)
+        self.release(name, timestamp)
+
+    def read(self, name):
+        return self.levels[name]
+
+    def close(self):
+        pass
+
 
 class InputManager:
-    """Manages GPIO button inputs."""
+    """Turns button edges into a timestamped event queue.
+
+    Edges arrive on the backend's interrupt thread and are debounced by
+    timestamp, so nothing ever sleeps. Held UP/DOWN/LEFT/RIGHT buttons emit
+    "repeat" events that speed up the longer they are held.
+    """
 
-    def __init__(self, use_hardware=True):
+    def __init__(self, use_hardware=True, backend=None):
         """Initialize input manager."""
         self.use_hardware = use_hardware
-        self.pins = {
-            "UP": 6,
-            "DOWN": 19,
-            "LEFT": 5,
-            "RIGHT": 26,
-            "PRESS": 13,
-            "KEY1": 21,
-            "KEY2": 20,
-            "KEY3": 16,
-        }
-
-        if use_hardware:
-            import RPi.GPIO as GPIO  # ty:ignore[unresolved-import]
-
-            self.GPIO = GPIO
-            GPIO.setmode(GPIO.BCM)
-            for pin in self.pins.values():
-                GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        else:
-            self.GPIO = None
+        self.pins = dict(PINS)
 
-    def is_pressed(self, pin_name):
-        """Check if a button is pressed."""
-        if not self.use_hardware:
-            return False
+        self.debounce = INPUT["debounce_ms"] / 1000
+        self.repeat_delay = INPUT["repeat_delay_ms"] / 1000
+        self.repeat_interval = INPUT["repeat_interval_ms"] / 1000
+        self.repeat_min_interval = INPUT["repeat_min_interval_ms"] / 1000
+        self.repeat_accel = INPUT["repeat_accel"]
+
+        self._cond = threading.Condition()
+        self._events = deque()
+        self._state = {name: False for name in self.pins}
+        self._last_edge = {name: float("-inf") for name in self.pins}
+        # Held buttons: name -> [next repeat deadline, interval, repeat count]
+        self._held = {}
+        # Set by wake() so a wait() that starts afterwards returns at once
+        self._woken = False
+
+        if backend is None:
+            backend = GpioBackend if use_hardware else FakeGPIO
+        self.backend = backend(self.pins, self._on_edge)
+
+    def _on_edge(self, name, pressed, timestamp=None):
+        """Record a raw edge; called from the backend's interrupt thread."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._cond:
+            if timestamp - self._last_edge[name] < self.debounce:
+                return  # contact bounce
+            if self._state[name] == pressed:
+                return
+            self._state[name] = pressed
+            self._last_edge[name] = timestamp
+            if pressed:
+                self._events.append(InputEvent(name, "press", timestamp))
+                delay = self.repeat_delay if name in REPEATABLE else float("inf")
+                self._held[name] = [timestamp + delay, self.repeat_interval, 0]
+            else:
+                self._events.append(InputEvent(name, "release", timestamp))
+                self._held.pop(name, None)
+            self._cond.notify()
 
-        pin = self.pins.get(pin_name)
-        if pin is None:
-            return False
+    def _poll_held(self, now):
+        """Queue due auto-repeats; caller holds the lock."""
+        for name, held in list(self._held.items()):
+            if now - self._last_edge[name] >= self.debounce and not self.backend.read(name):
+                # A release edge was swallowed by the debounce window
+                self._state[name] = False
+                self._last_edge[name] = now
+                del self._held[name]
+                self._events.append(InputEvent(name, "release", now))
+                continue
+            if held[0] <= now:
+                # One repeat per poll: repeats missed while the main loop was
+                # busy are dropped, not replayed as a burst of scroll steps
+                held[2] += 1
+                self._events.append(InputEvent(name, "repeat", now, held[2]))
+                held[1] = max(self.repeat_min_interval, held[1] * self.repeat_accel)
+                held[0] = now + held[1]
 
-        return self.GPIO.input(pin) == 0  # ty:ignore[unresolved-attribute]
+    def get_events(self, now=None):
+        """Drain and return all pending events in timestamp order."""
+        if now is None:
+            now = time.monotonic()
+        with self._cond:
+            self._poll_held(now)
+            events = list(self._events)
+            self._events.clear()
+        events.sort(key=lambda e: e.timestamp)
+        return events
+
+    def wait(self, timeout):
+        """Block until an event is pending, a repeat is due, or timeout expires."""
+        with self._cond:
+            if self._events or self._woken:
+                self._woken = False
+                return
+            if self._held:
+                next_repeat = min(held[0] for held in self._held.values())
+                timeout = min(timeout, max(0, next_repeat - time.monotonic()))
+            self._cond.wait(timeout)
+            self._woken = False
+
+    def wake(self):
+        """End the current (or next) wait() early, e.g. when a background scan finds something."""
+        with self._cond:
+            self._woken = True
+            self._cond.notify()
+
+    def is_pressed(self, pin_name):
+        """Check if a button is currently held (debounced)."""
+        return self._state.get(pin_name, False)
 
     def cleanup(self):
         """Clean up GPIO resources."""
-        if self.use_hardware and self.GPIO:
-            self.GPIO.cleanup()
+        self.backend.close()
@@ -54,6 +54,9 @@ UV_PATH="$REAL_HOME/.local/bin/uv"
 if [ -f "$PROJECT_DIR/pyproject.toml" ]; then
     echo "📦 Syncing Python dependencies..."
     sudo -u "$REAL_USER" bash -c "cd '$PROJECT_DIR' && export PATH=\"$REAL_HOME/.local/bin:\$PATH\" && $UV_PATH sync"
+
+    echo "🖼️  Building pre-rendered screen assets..."
+    sudo -u "$REAL_USER" bash -c "cd '$PROJECT_DIR' && $UV_PATH run assets.py build"
 fi
 
 # --- 7. Bluetooth Configuration ---
@@ -82,6 +85,8 @@ Requires=bluetooth.target
 User=$REAL_USER
 Group=$REAL_USER
 WorkingDirectory=$PROJECT_DIR
+# Splash first (best effort), then the app
+ExecStartPre=-$UV_PATH run splash.py
 ExecStart=$UV_PATH run player.py
 Restart=on-failure
 RestartSec=10
@@ -0,0 +1,283 @@
+"""One library over every source, with a merged and deduplicated index.
+
+Each source (local files, Jellyfin, Audiobookshelf) implements
+SourceAdapter: list its items, resolve one to playable tracks, and
+describe it for deduplication. Library fetches a source the first time
+it is needed and keeps the result, so switching between sources (or
+opening the merged view) does not refetch until the cache ages out.
+Fetched catalogs are also written to disk, so a resumed session can find
+its playlist again before the network is up.
+"""
+import importlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import metrics
+from app_config import FEATURES, LIBRARY
+from utils import Source
+
+logger = logging.getLogger(__name__)
+
+# Source -> (module, class) implementing SourceAdapter, imported on first
+# use so the Jellyfin SDK stays out of startup. Order is preference: a
+# song found in several sources plays from the first one.
+ADAPTERS = {
+    Source.LOCAL: ("local_library", "LocalLibrary"),
+    Source.JELLYFIN: ("api_clients", "JellyfinClient"),
+    Source.ABS: ("api_clients", "AudiobookshelfClient"),
+}
+
+# Copies whose lengths differ by more than this are different recordings (ms)
+DURATION_TOLERANCE = 3000
+
+
+class SourceAdapter:
+    """What Library needs from a source; implemented as classmethods."""
+
+    source = None
+
+    @classmethod
+    def list_items(cls):
+        """Every playable item, as playlist dicts with at least name and source."""
+        raise NotImplementedError
+
+    @classmethod
+    def resolve(cls, item):
+        """(tracks as [(uri, duration_ms)], chapters, Timeline.load options) for item."""
+        raise NotImplementedError
+
+    @classmethod
+    def artwork_request(cls, item, size):
+        """(cache key, url, headers) for size x size cover art, or None without art."""
+        return None
+
+    @classmethod
+    def metadata(cls, item):
+        """Title, artist, album and duration (ms or None) describing item."""
+        return {
+            "title": item["name"],
+            "artist": item.get("artist", ""),
+            "album": item.get("album", ""),
+            "duration": item.get("duration"),
+        }
+
+
+def enabled_sources():
+    """Sources switched on in FEATURES, in preference order."""
+    return [source for source in ADAPTERS if FEATURES.get(source.name)]
+
+
+def adapter(source):
+    """The SourceAdapter class for a Source or its value string."""
+    module, name = ADAPTERS[Source(source)]
+    return getattr(importlib.import_module(module), name)
+
+
+def _normalize(text):
+    return re.sub(r"[^a-z0-9]+", " ", (text or "").casefold()).strip()
+
+
+def dedupe_key(meta):
+    """Items with the same key are candidates for being one recording."""
+    return _normalize(meta["title"]), _normalize(meta["artist"])
+
+
+class Library:
+    """Per-source item caches plus the merged index built from them."""
+
+    def __init__(self, sources=None, config=None):
+        self.config = config or LIBRARY
+        self.sources = enabled_sources() if sources is None else list(sources)
+        # Source -> (items, monotonic time fetched, None if read from disk)
+        self._cache = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._merged = None
+        # Bumped whenever a source's items change, so views can refresh
+        self.version = 0
+
+    # --- Per-source caches ---
+    def _fresh(self, source):
+        entry = self._cache.get(source)
+        if entry is None or entry[1] is None:
+            return False
+        max_age = self.config["max_age_s"].get(source.value, 0)
+        return not max_age or time.monotonic() - entry[1] < max_age
+
+    def cached(self, source):
+        """Items already fetched for source (possibly stale), or None."""
+        entry = self._cache.get(Source(source))
+        return None if entry is None else entry[0]
+
+    def items(self, source):
+        """A source's items, fetching them only if not cached or too old.
+
+        The list is shared; copy it before reordering.
+        """
+        source = Source(source)
+        if self._fresh(source):
+            metrics.count("library_cache_hits")
+            return self._cache[source][0]
+        with metrics.timer(f"library_load_{source.value}"):
+            items = adapter(source).list_items()
+        if not items:
+            # Often a swallowed network error; try again next time
+            return items
+        with self._lock:
+            self._cache[source] = (items, time.monotonic())
+            self._merged = None
+            self.version += 1
+        self._save_catalog(source, items)
+        return items
+
+    # --- On-disk catalogs ---
+    def _catalog_path(self, source):
+        return os.path.join(self.config["catalog_dir"], f"{source.value}.json")
+
+    def _save_catalog(self, source, items):
+        path = self._catalog_path(source)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(items, f, default=str)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Library: could not save {source.value} catalog: {e}")
+
+    def load_saved(self, sources=None):
+        """Fill in sources not fetched yet from their last saved catalog.
+
+        Saved catalogs count as stale: they are listed and played from,
+        but the next items() call fetches the source again.
+        """
+        for source in self.sources if sources is None else sources:
+            source = Source(source)
+            if source in self._cache:
+                continue
+            try:
+                with open(self._catalog_path(source)) as f:
+                    items = json.load(f)
+            except (OSError, ValueError):
+                continue
+            with self._lock:
+                self._cache.setdefault(source, (items, None))
+                self._merged = None
+                self.version += 1
+
+    def load_async(self, sources=None):
+        """Fetch sources that are not cached yet on background threads."""
+        for source in self.sources if sources is None else sources:
+            if self._fresh(source):
+                continue
+            with self._lock:
+                thread = self._loading.get(source)
+                if thread is not None and thread.is_alive():
+                    continue
+                thread = self._loading[source] = threading.Thread(
+                    target=self._load_quietly, args=(source,),
+                    name=f"library-{source.value}", daemon=True,
+                )
+            thread.start()
+
+    def _load_quietly(self, source):
+        try:
+            self.items(source)
+        except Exception as e:
+            logger.warning(f"Library: {source.value} failed to load: {e}")
+
+    @property
+    def loading(self):
+        """True while a background fetch is running."""
+        return any(thread.is_alive() for thread in self._loading.values())
+
+    def set_sources(self, sources):
+        """Change which sources are merged (features toggled at runtime); caches are kept."""
+        with self._lock:
+            self.sources = list(sources)
+            self._merged = None
+            self.version += 1
+
+    def refresh(self, source=None):
+        """Forget cached items so the next access refetches."""
+        with self._lock:
+            if source is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(Source(source), None)
+            self._merged = None
+            self.version += 1
+
+    # --- Merged index ---
+    def merged(self):
+        """One sorted list over every cached source, duplicates folded together.
+
+        Each duplicate is kept on the preferred copy's "alternates" so it
+        can still be played if the preferred copy fails.
+        """
+        with self._lock:
+            if self._merged is not None:
+                return self._merged
+            snapshot = [(s, self._cache[s][0]) for s in self.sources if s in self._cache]
+            version = self.version
+
+        groups = {}
+        # Offline copies by the "<source>_<id>" of the item they were made from
+        origins = {}
+        merged = []
+        for source, items in snapshot:
+            describe = adapter(source).metadata
+            for item in items:
+                copy = origins.get(f"{item['source']}_{item.get('id')}")
+                if copy is not None:
+                    copy["alternates"].append(item)
+                    continue
+                meta = describe(item)
+                candidates = groups.setdefault(dedupe_key(meta), [])
+                primary = next(
+                    (entry for entry, duration in candidates
+                     if not (duration and meta["duration"]
+                             and abs(duration - meta["duration"]) > DURATION_TOLERANCE)),
+                    None,
+                )
+                if primary is None:
+                    entry = {**item, "alternates": []}
+                    candidates.append((entry, meta["duration"]))
+                    merged.append(entry)
+                    if item.get("origin"):
+                        origins[item["origin"]] = entry
+                else:
+                    primary["alternates"].append(item)
+        merged.sort(key=lambda entry: entry["name"].casefold())
+        metrics.gauge("library_items", len(merged))
+
+        with self._lock:
+            # A source that loaded meanwhile is missing here; leave it to the next call
+            if self.version == version:
+                self._merged = merged
+        return merged
+
+    # --- Playback ---
+    def resolve(self, item):
+        """(tracks, chapters, load options) for item, trying alternates in turn.
+
+        Jellyfin and ABS items with an offline copy play from disk.
+        """
+        from local_library import LocalLibrary
+
+        last_error = None
+        for candidate in [item, *item.get("alternates", [])]:
+            if candidate["source"] != Source.LOCAL.value:
+                offline = LocalLibrary.offline_copy(candidate)
+                if offline is not None:
+                    return (*offline, {"profile": "offline"})
+            try:
+                return adapter(candidate["source"]).resolve(candidate)
+            except Exception as e:
+                logger.warning(f"Could not resolve {candidate['name']} on {candidate['source']}: {e}")
+                last_error = e
+        raise last_error
@@ -1,18 +1,24 @@
 """Local file library management."""
 from utils import Source
+import json
 import os
-import random
 from app_config import LOCAL_PATH
+from library import SourceAdapter
 
+# Offline copies made by offline_sync live under LOCAL_PATH/<OFFLINE_DIR>
+OFFLINE_DIR = "offline"
+MANIFEST_FILE = "manifest.json"
 
-class LocalLibrary:
+
+class LocalLibrary(SourceAdapter):
     """Manages local music files."""
 
-    SUPPORTED_FORMATS = (".mp3", ".m4a", ".wav")
+    source = Source.LOCAL
+    SUPPORTED_FORMATS = (".mp3", ".m4a", ".wav", ".flac", ".ogg", ".opus")
 
     @staticmethod
-    def get_items(shuffle=False):
-        """Get list of local music files."""
+    def get_items():
+        """Get list of local music files, including offline copies."""
         if not os.path.exists(LOCAL_PATH):
             os.makedirs(LOCAL_PATH)
 
@@ -22,20 +28,97 @@ class LocalLibrary:
             if f.lower().endswith(LocalLibrary.SUPPORTED_FORMATS)
         ]
 
-        if not files:
-            return []
-
         items = [
             {"name": f, "path": os.path.join(LOCAL_PATH, f), "source": Source.LOCAL.value}
-            for f in sorted(files)
+            for f in files
         ]
+        items.extend(LocalLibrary.offline_items())
+        if not items:
+            return []
+        items.sort(key=lambda item: item["name"])
+        return items
 
-        if shuffle:
-            random.shuffle(items)
+    # --- SourceAdapter ---
+    @classmethod
+    def list_items(cls):
+        return cls.get_items()
 
-        return items
+    @classmethod
+    def resolve(cls, item):
+        tracks, chapters = cls.get_tracks(item)
+        return tracks, chapters, {"profile": Source.LOCAL.value}
+
+    @classmethod
+    def metadata(cls, item):
+        """Files named "Artist - Title.ext" give an artist; offline copies know their length."""
+        # Offline copies are named by their server title, which has no extension to strip
+        stem = item["name"] if item.get("origin") else os.path.splitext(item["name"])[0]
+        artist, _, title = stem.rpartition(" - ")
+        tracks = item.get("tracks")
+        duration = sum(d for _, d in tracks) if tracks and all(d > 0 for _, d in tracks) else None
+        return {"title": title, "artist": artist, "album": "", "duration": duration}
 
     @staticmethod
     def get_stream_uri(item):
         """Get stream URI for a local file."""
         return item.get("path", "")
+
+    @staticmethod
+    def get_tracks(item):
+        """(uri, duration_ms) tracks and chapters for a local item."""
+        return item.get("tracks") or [(LocalLibrary.get_stream_uri(item), -1)], item.get(
+            "chapters", []
+        )
+
+    # --- Offline copies ---
+    @staticmethod
+    def offline_path():
+        return os.path.join(LOCAL_PATH, OFFLINE_DIR)
+
+    @staticmethod
+    def load_manifest():
+        """Synced items by key ("<source>_<id>"), as written by offline_sync."""
+        path = os.path.join(LocalLibrary.offline_path(), MANIFEST_FILE)
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    return json.load(f)
+            except Exception:
+                return {}
+        return {}
+
+    @staticmethod
+    def _offline_item(key, entry):
+        folder = os.path.join(LocalLibrary.offline_path(), key)
+        tracks = [(os.path.join(folder, t["file"]), t["duration"]) for t in entry["tracks"]]
+        if not all(os.path.exists(uri) for uri, _ in tracks):
+            return None
+        return {
+            "name": entry["name"],
+            "path": tracks[0][0],
+            "source": Source.LOCAL.value,
+            "tracks": tracks,
+            "chapters": entry.get("chapters", []),
+            # Manifest key, "<source>_<id>" of the Jellyfin/ABS item it copies
+            "origin": key,
+        }
+
+    @staticmethod
+    def offline_items():
+        """Playlist items for every complete offline copy."""
+        items = []
+        for key, entry in LocalLibrary.load_manifest().items():
+            item = LocalLibrary._offline_item(key, entry)
+            if item is not None:
+                items.append(item)
+        return items
+
+    @staticmethod
+    def offline_copy(item):
+        """Local tracks and chapters for a Jellyfin/ABS item, or None if not synced."""
+        key = f"{item['source']}_{item['id']}"
+        entry = LocalLibrary.load_manifest().get(key)
+        if entry is None:
+            return None
+        local = LocalLibrary._offline_item(key, entry)
+        return None if local is None else (local["tracks"], local["chapters"])
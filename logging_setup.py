@@ -0,0 +1,155 @@
+"""Logging that stays off the main loop.
+
+Loggers hand records to a bounded in-memory queue. A listener thread
+writes them out: JSON lines to a log file that rotates by size and age,
+and plain text to stderr. A log call on the main loop only formats its
+message and enqueues it, so a slow SD card write never stalls a frame.
+When the queue is full (the card has stalled for a long time) records are
+dropped and counted rather than blocking. Levels are set per module in
+LOGGING in app_config.py.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+import metrics
+import startup
+from app_config import LOGGING
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+_STANDARD = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener = None
+
+# Wall-clock time the process started, for uptime_s
+_BOOT = time.time() - startup.elapsed()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with timing fields and any extra={...} fields.
+
+    ts is when the record was made, uptime_s is since the process started,
+    and queue_ms is how long the record waited before being written.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+            "uptime_s": round(record.created - _BOOT, 3),
+            "queue_ms": round((time.time() - record.created) * 1000, 2),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RotatingHandler(logging.handlers.RotatingFileHandler):
+    """Rotates when the file reaches max_bytes or has been open for max_age_s."""
+
+    def __init__(self, filename, max_bytes, backups, max_age_s):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        self.max_age_s = max_age_s
+        self.opened = time.time()
+
+    def shouldRollover(self, record):
+        if self.max_age_s and time.time() - self.opened >= self.max_age_s:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.opened = time.time()
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Enqueues without ever blocking; a full queue drops the record."""
+
+    def prepare(self, record):
+        # Resolve what may not survive the thread hop (args, exc_info), and nothing more
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.count("log_dropped")
+
+
+class QueueListener(logging.handlers.QueueListener):
+    """Writes queued records on its own thread; stop() waits for a full queue to drain."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def file_handler(config=None):
+    """The rotating JSON file handler described by config."""
+    config = config or LOGGING
+    handler = RotatingHandler(
+        config["file"], config["max_bytes"], config["backups"], config["max_age_s"]
+    )
+    handler.setFormatter(JsonFormatter() if config["json"] else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def configure(config=None):
+    """Route all logging through the queue; safe to call more than once."""
+    global _listener
+    config = config or LOGGING
+    stop()
+
+    handlers = []
+    if config["file"]:
+        directory = os.path.dirname(config["file"])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handlers.append(file_handler(config))
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(TEXT_FORMAT))
+    console.setLevel(config["console_level"])
+    handlers.append(console)
+
+    records = queue.Queue(config["queue_size"])
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(records))
+    for name, level in config["levels"].items():
+        logging.getLogger(name or None).setLevel(level)
+    return _listener
+
+
+def stop():
+    """Write out whatever is queued and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop)
@@ -0,0 +1,108 @@
+"""Scrolling text for titles wider than their row.
+
+A Marquee draws its text once, twice over with a gap, into a strip image
+and keeps the strip's RGB565 pixels. Each step of the scroll is then a
+slice of that array sent straight to the LCD as one small window: no
+text drawing, no colour conversion and no full-frame transfer. It scrolls
+a few passes, then rests at the start until restarted, so an idle player
+is not woken every frame.
+"""
+import time
+
+from PIL import Image, ImageDraw
+
+from app_config import MARQUEE
+from assets import Frame
+
+# Row height in pixels for the default font, descenders included
+ROW_HEIGHT = 12
+
+
+class Marquee:
+    """One row of text scrolling through a window at (x, y)."""
+
+    def __init__(self, text, x, y, width, font, fill="WHITE", background="BLACK",
+                 config=None, clock=time.monotonic):
+        self.text, self.x, self.y, self.width = text, x, y, width
+        # What the strip was drawn from; a row with the same key can reuse it
+        self.key = (text, x, y, width, fill)
+        self.config = config or MARQUEE
+        self.clock = clock
+        text_width = int(font.getlength(text))
+        self.scrolls = text_width > width
+        # One pass moves the text and the gap out of the window
+        self.travel = text_width + self.config["gap_px"] if self.scrolls else 0
+
+        self.image = Image.new("RGB", (self.travel + width, ROW_HEIGHT), background)
+        draw = ImageDraw.Draw(self.image)
+        draw.text((0, 0), text, fill=fill, font=font)
+        if self.scrolls:
+            draw.text((self.travel, 0), text, fill=fill, font=font)
+        self._pixels = None
+        # Offset currently on the LCD
+        self.shown = None
+        self.started = clock()
+
+    @property
+    def pixels(self):
+        """The strip as a (height, width) array of big-endian RGB565."""
+        if self._pixels is None:
+            import numpy as np
+
+            from display import to_rgb565
+
+            self._pixels = np.frombuffer(to_rgb565(self.image), dtype=">u2").reshape(
+                ROW_HEIGHT, self.image.width
+            )
+        return self._pixels
+
+    def _elapsed(self, now):
+        """Seconds into the current pass, or None once the last pass is over."""
+        if not self.scrolls:
+            return None
+        elapsed = now - self.started
+        pass_s = self.config["pause_s"] + self.travel / self.config["speed_px_s"]
+        passes = self.config["passes"]
+        if passes and elapsed >= passes * pass_s:
+            return None
+        return elapsed % pass_s
+
+    def restart(self):
+        """Scroll again from the start, unless it is still scrolling."""
+        now = self.clock()
+        if self._elapsed(now) is None:
+            self.started = now
+
+    def offset(self, now=None):
+        """Pixels the text has moved left at now."""
+        elapsed = self._elapsed(self.clock() if now is None else now)
+        if elapsed is None or elapsed < self.config["pause_s"]:
+            return 0
+        moved = int((elapsed - self.config["pause_s"]) * self.config["speed_px_s"])
+        return min(moved, self.travel) % self.travel
+
+    def timeout(self, now=None):
+        """Seconds until the next step, or None while resting."""
+        now = self.clock() if now is None else now
+        elapsed = self._elapsed(now)
+        if elapsed is None:
+            return None
+        if elapsed < self.config["pause_s"]:
+            return self.config["pause_s"] - elapsed
+        return 1 / self.config["fps"]
+
+    def draw(self, display, now=None):
+        """Paste the window at its current offset into the display's frame."""
+        offset = self.offset(now)
+        window = self.image.crop((offset, 0, offset + self.width, ROW_HEIGHT))
+        display.image.paste(window, (self.x, self.y))
+        self.shown = offset
+
+    def window(self, now=None):
+        """The window as an RGB565 assets.Frame, or None if it has not moved since last shown."""
+        offset = self.offset(now)
+        if offset == self.shown:
+            return None
+        self.shown = offset
+        data = self.pixels[:, offset:offset + self.width].tobytes()
+        return Frame("marquee", self.x, self.y, self.width, ROW_HEIGHT, data)
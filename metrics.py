@@ -0,0 +1,233 @@
+"""Low-overhead hot-path timers, counters and a sampling profiler.
+
+Stages are timed into fixed-bucket histograms so p50/p99 can be estimated
+without keeping samples. When disabled, timed() wrappers cost a single
+global lookup and branch per call.
+"""
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from functools import wraps
+
+from app_config import METRICS
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (
+    0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02,
+    0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0,
+)
+
+enabled = METRICS["enabled"]
+_lock = threading.Lock()
+_histograms = {}
+_counters = Counter()
+_gauges = {}
+
+
+class Histogram:
+    """Cumulative-friendly bucket counts for one stage."""
+
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+def set_enabled(value):
+    """Turn collection on or off at runtime."""
+    global enabled
+    enabled = bool(value)
+
+
+def observe(stage, seconds):
+    """Record a duration for a stage."""
+    if not enabled:
+        return
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = Histogram()
+        hist.observe(seconds)
+
+
+def count(name, n=1):
+    """Increment an event counter."""
+    if enabled:
+        with _lock:
+            _counters[name] += n
+
+
+def gauge(name, value):
+    """Set a point-in-time value."""
+    if enabled:
+        _gauges[name] = value
+
+
+def timed(stage):
+    """Decorator recording each call's duration under stage."""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+class timer:
+    """Context manager form of timed() for blocks inside a function."""
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter() if enabled else None
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            observe(self.stage, time.perf_counter() - self.start)
+
+
+def summary():
+    """Per-stage count and p50/p99 in milliseconds, plus counters and gauges."""
+    with _lock:
+        stages = {
+            stage: {
+                "count": hist.count,
+                "p50_ms": round(hist.quantile(0.5) * 1000, 3),
+                "p99_ms": round(hist.quantile(0.99) * 1000, 3),
+            }
+            for stage, hist in _histograms.items()
+        }
+        return {"stages": stages, "counters": dict(_counters), "gauges": dict(_gauges)}
+
+
+def reset():
+    """Discard everything collected so far."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
+
+
+def prometheus():
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP mediapi_stage_seconds Time spent in instrumented hot paths.",
+        "# TYPE mediapi_stage_seconds histogram",
+    ]
+    with _lock:
+        hists = {k: (list(h.buckets), h.sum, h.count, h) for k, h in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    quantiles = []
+    for stage, (buckets, total, n, hist) in sorted(hists.items()):
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS, buckets):
+            cumulative += bucket
+            lines.append(f'mediapi_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'mediapi_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {n}')
+        lines.append(f'mediapi_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+        lines.append(f'mediapi_stage_seconds_count{{stage="{stage}"}} {n}')
+        for q in (0.5, 0.99):
+            quantiles.append(
+                f'mediapi_stage_quantile_seconds{{stage="{stage}",quantile="{q}"}} '
+                f"{hist.quantile(q):.6f}"
+            )
+
+    lines.append("# HELP mediapi_stage_quantile_seconds Estimated p50/p99 per stage.")
+    lines.append("# TYPE mediapi_stage_quantile_seconds gauge")
+    lines.extend(quantiles)
+    lines.append("# HELP mediapi_events_total Hot-path event counters.")
+    lines.append("# TYPE mediapi_events_total counter")
+    for name, value in sorted(counters.items()):
+        lines.append(f'mediapi_events_total{{event="{name}"}} {value}')
+    for name, value in sorted(gauges.items()):
+        lines.append(f"# TYPE mediapi_{name} gauge")
+        lines.append(f"mediapi_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval.
+
+    Output is in collapsed-stack format ("a;b;c count" per line), which
+    flamegraph tools read directly.
+    """
+
+    def __init__(self, thread_id=None, interval=None):
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.interval = interval or METRICS["profile_interval_ms"] / 1000
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Sampled stacks, most frequent first."""
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,51 @@
+"""List navigation helpers for the scrolling views."""
+
+# Rows drawn by the MENU, BROWSER and BT_SCAN list views
+VISIBLE_ROWS = 5
+
+# Auto-repeats at single-row speed before scrolling starts to accelerate
+ACCEL_AFTER = 10
+# Repeats between each doubling of the scroll step
+ACCEL_EVERY = 8
+# Largest step as a fraction of the list length
+MAX_STEP_FRACTION = 0.05
+# Step for LEFT/RIGHT held in the browser, in percent of the list
+PERCENT_STEP = 10
+
+
+def visible_window(selected, total, rows=VISIBLE_ROWS):
+    """Return the range of list indices to draw around the selection.
+
+    Only these rows are ever touched by the renderer, so drawing cost is
+    independent of the list length.
+    """
+    start = max(0, min(selected - rows // 2, total - rows))
+    return range(start, min(total, start + rows))
+
+
+def scroll_step(repeat, total):
+    """Rows to move for a press (repeat=0) or the Nth auto-repeat."""
+    if repeat < ACCEL_AFTER:
+        return 1
+    step = 2 ** ((repeat - ACCEL_AFTER) // ACCEL_EVERY + 1)
+    return max(1, min(step, int(total * MAX_STEP_FRACTION)))
+
+
+def clamp(index, total):
+    """Clamp an index into a list of the given length."""
+    return max(0, min(total - 1, index)) if total > 0 else 0
+
+
+def page(index, direction, total, rows=VISIBLE_ROWS):
+    """Move a full window of rows up (-1) or down (1)."""
+    return clamp(index + direction * rows, total)
+
+
+def percent_index(percent, total):
+    """Index sitting at the given percentage of the list."""
+    return clamp(round(percent / 100 * (total - 1)), total)
+
+
+def index_percent(index, total):
+    """Position of an index in the list as a percentage."""
+    return 100 * index / (total - 1) if total > 1 else 0
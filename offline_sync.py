@@ -0,0 +1,267 @@
+"""Offline sync: keep chosen playlists, albums and series on the Pi.
+
+The configured Jellyfin playlists/albums and ABS series are diffed
+against what is already under LOCAL_PATH/offline, and only the missing
+files are downloaded, a few at a time and within a bandwidth budget.
+Syncing waits for home Wi-Fi and external power. Synced items are listed
+in a manifest that LocalLibrary reads, so they play with no network.
+"""
+import glob
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from app_config import OFFLINE
+from local_library import MANIFEST_FILE, LocalLibrary
+from utils import Source
+
+logger = logging.getLogger(__name__)
+
+POWER_SUPPLY_DIR = "/sys/class/power_supply"
+# Wait this long after boot before the first scheduled sync (seconds)
+FIRST_SYNC_DELAY = 60
+
+
+class TokenBucket:
+    """Bandwidth limit shared by all download threads.
+
+    Call with a byte count before writing it; sleeps as needed to keep the
+    average rate at or below rate_kbps, allowing one second of burst.
+    """
+
+    def __init__(self, rate_kbps):
+        self.rate = rate_kbps * 1000 / 8
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __call__(self, nbytes):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= nbytes
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class OfflineSync:
+    """Diffs configured collections against the offline folder and fills the gaps."""
+
+    # Replace with a callable(cmd) -> (ok, output) to fake shell commands
+    command_runner = None
+
+    def __init__(self, config=None, path=None):
+        self.config = config or OFFLINE
+        self.path = path or LocalLibrary.offline_path()
+        self.status = {"state": "idle", "last_run": None, "downloaded": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def configured(self):
+        return bool(self.config["jellyfin_collections"] or self.config["abs_series"])
+
+    # --- Conditions ---
+    @classmethod
+    def _run_cmd(cls, cmd):
+        if cls.command_runner is not None:
+            return cls.command_runner(cmd)
+        try:
+            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=5)
+            return result.returncode == 0, result.stdout.strip()
+        except Exception as e:
+            return False, str(e)
+
+    def on_home_wifi(self):
+        """True when connected to one of the home SSIDs (any network if none set)."""
+        ssids = self.config["home_ssids"]
+        if not ssids:
+            return True
+        ok, ssid = self._run_cmd("iwgetid -r")
+        return ok and ssid.strip() in ssids
+
+    def on_charge(self):
+        """True on external power.
+
+        A Pi without any power_supply entries is mains powered; otherwise an
+        online mains/USB supply or a charging/full battery counts.
+        """
+        if not self.config["require_charging"]:
+            return True
+        supplies = glob.glob(os.path.join(POWER_SUPPLY_DIR, "*"))
+        if not supplies:
+            return True
+        for supply in supplies:
+            kind, online, status = (
+                self._read(os.path.join(supply, name)) for name in ("type", "online", "status")
+            )
+            if kind in ("Mains", "USB") and online == "1":
+                return True
+            if kind == "Battery" and status in ("Charging", "Full"):
+                return True
+        return False
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, "r") as f:
+                return f.read().strip()
+        except OSError:
+            return ""
+
+    # --- Planning ---
+    def wanted(self):
+        """Every item the configured collections should have offline.
+
+        Each unit is {"key", "name", "source", "id", "files": [{"url",
+        "file", "duration"}], "chapters"}.
+        """
+        from api_clients import AudiobookshelfClient, JellyfinClient
+
+        units = {}
+        for collection in self.config["jellyfin_collections"]:
+            for item in JellyfinClient.get_items(limit=10000, parent_id=collection):
+                item_id = str(item["id"])
+                ext = item.get("container") or "mp3"
+                units[f"{Source.JELLYFIN.value}_{item_id}"] = {
+                    "name": item["name"],
+                    "source": Source.JELLYFIN.value,
+                    "id": item_id,
+                    "files": [{
+                        "url": JellyfinClient.get_download_uri(item_id),
+                        "file": f"001.{ext}",
+                        "duration": item.get("duration", -1),
+                    }],
+                    "chapters": [],
+                }
+        for series in self.config["abs_series"]:
+            for item in AudiobookshelfClient.get_series_items(series):
+                book = AudiobookshelfClient.get_book(item)
+                units[f"{Source.ABS.value}_{item['id']}"] = {
+                    "name": item["name"],
+                    "source": Source.ABS.value,
+                    "id": item["id"],
+                    "files": [
+                        {
+                            "url": AudiobookshelfClient.get_track_download_uri(track),
+                            "file": f"{track['index']:03d}.{track['ext']}",
+                            "duration": track["duration"],
+                        }
+                        for track in book["tracks"]
+                    ],
+                    "chapters": book["chapters"],
+                }
+        return units
+
+    def plan(self, units):
+        """(missing files as (key, file), stale keys) against the offline folder."""
+        missing = [
+            (key, f)
+            for key, unit in units.items()
+            for f in unit["files"]
+            if not os.path.exists(os.path.join(self.path, key, f["file"]))
+        ]
+        stale = [key for key in LocalLibrary.load_manifest() if key not in units]
+        return missing, stale
+
+    # --- Syncing ---
+    def sync(self, force=False):
+        """Run one sync pass; returns the status dict.
+
+        Without force, the pass is skipped unless on home Wi-Fi and on charge.
+        """
+        if not self._lock.acquire(blocking=False):
+            return self.status
+        try:
+            if not force and not (self.on_home_wifi() and self.on_charge()):
+                self.status.update(state="waiting", message="not on home Wi-Fi and power")
+                return self.status
+            self.status.update(state="running", message="")
+            with metrics.timer("offline_sync"):
+                self._sync()
+            self.status.update(state="idle", last_run=time.time())
+        except Exception as e:
+            logger.error(f"Offline sync failed: {e}")
+            self.status.update(state="error", message=str(e))
+        finally:
+            self._lock.release()
+        return self.status
+
+    def _sync(self):
+        from api_clients import download_file
+
+        units = self.wanted()
+        missing, stale = self.plan(units)
+        logger.info(f"Offline sync: {len(missing)} files to fetch, {len(stale)} items to remove")
+
+        for key in stale:
+            shutil.rmtree(os.path.join(self.path, key), ignore_errors=True)
+
+        limit = self.config["bandwidth_kbps"]
+        limiter = TokenBucket(limit) if limit else None
+
+        def fetch(job):
+            key, f = job
+            folder = os.path.join(self.path, key)
+            os.makedirs(folder, exist_ok=True)
+            try:
+                size = download_file(f["url"], os.path.join(folder, f["file"]), limiter)
+                metrics.count("offline_bytes", size)
+                return True
+            except Exception as e:
+                logger.warning(f"Offline download failed for {key}/{f['file']}: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=self.config["concurrency"]) as pool:
+            results = list(pool.map(fetch, missing))
+        self.status.update(downloaded=results.count(True), failed=results.count(False))
+
+        self._write_manifest(units)
+
+    def _write_manifest(self, units):
+        """Record every unit whose files are all present."""
+        manifest = {}
+        for key, unit in units.items():
+            if all(os.path.exists(os.path.join(self.path, key, f["file"])) for f in unit["files"]):
+                manifest[key] = {
+                    "name": unit["name"],
+                    "source": unit["source"],
+                    "id": unit["id"],
+                    "tracks": [{"file": f["file"], "duration": f["duration"]} for f in unit["files"]],
+                    "chapters": unit["chapters"],
+                }
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, MANIFEST_FILE)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.tmp", path)
+        metrics.gauge("offline_items", len(manifest))
+
+    # --- Scheduling ---
+    def start(self):
+        """Sync on a timer in the background."""
+        if self._thread is None and self.configured:
+            self._thread = threading.Thread(target=self._run, name="offline-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def sync_async(self, force=True):
+        """Start a sync pass without waiting for it."""
+        threading.Thread(target=self.sync, args=(force,), name="offline-sync-now", daemon=True).start()
+
+    def _run(self):
+        delay = FIRST_SYNC_DELAY
+        while not self._stop.wait(delay):
+            self.sync()
+            delay = self.config["interval_s"]
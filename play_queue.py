@@ -0,0 +1,224 @@
+"""Play order over a playlist: shuffle, up-next, history and repeat.
+
+The playlist itself is never copied or reordered. Shuffle is a seeded
+permutation computed one position at a time (a small Feistel network),
+so turning it on, moving to the next track or finding where a track sits
+in the order are all O(1) however big the library is. The same seed
+always gives the same order, so a queue can be saved and restored.
+"""
+import random
+from collections import deque
+
+REPEAT_OFF = "off"
+REPEAT_ALL = "all"
+REPEAT_ONE = "one"
+REPEAT_MODES = (REPEAT_OFF, REPEAT_ALL, REPEAT_ONE)
+
+# Tracks remembered for "previous"
+HISTORY_SIZE = 200
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix(value, key):
+    """64-bit integer hash (splitmix64 finalizer); stable across runs, unlike hash()."""
+    z = (value + key + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+class Permutation:
+    """A seeded shuffle of range(n), evaluated per index.
+
+    A balanced Feistel network permutes the smallest even-bit domain
+    covering n; values outside range(n) are walked forward until they land
+    inside (under four steps on average).
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, n, seed):
+        self.n = n
+        self.seed = seed
+        self.half_bits = max(1, ((n - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+        self.keys = [_mix(seed, r) for r in range(self.ROUNDS)]
+
+    def _encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.half_mask
+        for key in self.keys:
+            left, right = right, left ^ (_mix(right, key) & self.half_mask)
+        return (left << self.half_bits) | right
+
+    def _decrypt(self, value):
+        left, right = value >> self.half_bits, value & self.half_mask
+        for key in reversed(self.keys):
+            left, right = right ^ (_mix(left, key) & self.half_mask), left
+        return (left << self.half_bits) | right
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, position):
+        """Playlist index at a position in the shuffled order."""
+        value = self._encrypt(position)
+        while value >= self.n:
+            value = self._encrypt(value)
+        return value
+
+    def index(self, item):
+        """Position of a playlist index in the shuffled order."""
+        value = self._decrypt(item)
+        while value >= self.n:
+            value = self._decrypt(value)
+        return value
+
+
+class PlayQueue:
+    """Which playlist index plays now and next.
+
+    Positions count through the play order (the playlist order, or its
+    shuffle); up-next indices play before the order continues, and
+    history lets previous() retrace what actually played.
+    """
+
+    def __init__(self, length=0, shuffle=False, seed=None, repeat=REPEAT_ALL):
+        self.repeat = repeat
+        self.reset(length, shuffle, seed)
+
+    def reset(self, length, shuffle=False, seed=None, start=None):
+        """Start a new order over a playlist of length items.
+
+        start is the playlist index to begin with (the first in order if None).
+        """
+        self.length = length
+        self.shuffle = shuffle
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.order = Permutation(length, self.seed) if shuffle and length else None
+        self.up_next = deque()
+        self.history = deque(maxlen=HISTORY_SIZE)
+        # Tracks stepped back over with previous(), replayed by next()
+        self.forward = []
+        self.position = 0 if start is None else self.position_of(start)
+        self.current = self.at(self.position) if length else None
+
+    # --- Order ---
+    def at(self, position):
+        """Playlist index at a position in the play order."""
+        return self.order[position] if self.order is not None else position
+
+    def position_of(self, index):
+        """Position of a playlist index in the play order."""
+        return self.order.index(index) if self.order is not None else index
+
+    def upcoming(self, count=5):
+        """The next count playlist indices, without moving."""
+        result = list(self.forward[::-1][:count])
+        result.extend(list(self.up_next)[:count - len(result)])
+        position = self.position
+        while len(result) < count and self.length:
+            position += 1
+            if position >= self.length:
+                if self.repeat == REPEAT_OFF:
+                    break
+                position = 0
+            result.append(self.at(position))
+        return result
+
+    # --- Moving ---
+    def _go(self, index):
+        if self.current is not None:
+            self.history.append(self.current)
+        self.current = index
+        return index
+
+    def play(self, index):
+        """The user picked an index: play it and continue the order from there."""
+        self.forward.clear()
+        self.position = self.position_of(index)
+        return self._go(index)
+
+    def next(self, auto=False):
+        """Move to and return the next index; None at the end with repeat off.
+
+        auto is a track ending by itself, which REPEAT_ONE replays.
+        """
+        if not self.length:
+            return None
+        if auto and self.repeat == REPEAT_ONE:
+            return self.current
+        if self.forward:
+            return self._go(self.forward.pop())
+        if self.up_next:
+            return self._go(self.up_next.popleft())
+        position = self.position + 1
+        if position >= self.length:
+            if self.repeat == REPEAT_OFF and auto:
+                return None
+            position = 0
+            if self.order is not None:
+                # A fresh shuffle for every pass
+                self.seed = (self.seed + 1) & 0xFFFFFFFF
+                self.order = Permutation(self.length, self.seed)
+        self.position = position
+        return self._go(self.at(position))
+
+    def previous(self):
+        """Move back to the track played before this one."""
+        if not self.length:
+            return None
+        if self.history:
+            self.forward.append(self.current)
+            self.current = self.history.pop()
+            return self.current
+        self.position = (self.position - 1) % self.length
+        self.current = self.at(self.position)
+        return self.current
+
+    # --- Editing ---
+    def play_next(self, index):
+        """Play index right after the current track."""
+        self.up_next.appendleft(index)
+
+    def enqueue(self, index):
+        """Play index after everything already queued."""
+        self.up_next.append(index)
+
+    def set_shuffle(self, shuffle):
+        """Turn shuffle on or off without interrupting the current track."""
+        if shuffle == self.shuffle or not self.length:
+            self.shuffle = shuffle
+            return
+        self.shuffle = shuffle
+        self.seed = random.getrandbits(32)
+        self.order = Permutation(self.length, self.seed) if shuffle else None
+        if self.current is not None:
+            self.position = self.position_of(self.current)
+
+    def cycle_repeat(self):
+        """off -> all -> one -> off; returns the new mode."""
+        self.repeat = REPEAT_MODES[(REPEAT_MODES.index(self.repeat) + 1) % len(REPEAT_MODES)]
+        return self.repeat
+
+    # --- Persistence ---
+    def to_dict(self):
+        return {
+            "length": self.length,
+            "shuffle": self.shuffle,
+            "seed": self.seed,
+            "repeat": self.repeat,
+            "position": self.position,
+            "current": self.current,
+            "up_next": list(self.up_next),
+            "history": list(self.history),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        queue = cls(data["length"], data["shuffle"], data["seed"], data.get("repeat", REPEAT_ALL))
+        queue.position = data["position"]
+        queue.current = data["current"]
+        queue.up_next.extend(data.get("up_next", []))
+        queue.history.extend(data.get("history", []))
+        return queue
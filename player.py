@@ -1,114 +1,296 @@
 """Main MP3 player application."""
 
+import startup
+
 from utils import Source
 
 import logging
 import threading
 import time
-import random
 
-from app_config import FEATURES
-from api_clients import JellyfinClient, AudiobookshelfClient
-from local_library import LocalLibrary
-from audio import AudioPlayer
-from bluetooth import BluetoothManager
+import assets
+import logging_setup
+import metrics
+import streaming
+from app_config import ARTWORK, FEATURES
+from artwork import Artwork
+from audio import AudioPlayer, AudioUnavailable
+from bluetooth import BluetoothManager, Discovery, signal_level
+from config_service import ConfigService
 from display import Display
+from governor import RenderGovernor
 from input import InputManager
-from server import run_server
+from library import Library, enabled_sources
+from marquee import Marquee
+from navigation import (
+    PERCENT_STEP,
+    VISIBLE_ROWS,
+    clamp,
+    index_percent,
+    page,
+    percent_index,
+    scroll_step,
+    visible_window,
+)
+from offline_sync import OfflineSync
+from play_queue import PlayQueue
+from progress_sync import ProgressSync, remote_progress
+from seek import SeekController
+from session import LIBRARY_VIEW, Session
 from storage import Storage
+from timeline import Timeline
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("mediapi.log"),
-        logging.StreamHandler(),
-    ],
-)
+# Log through a background writer (see logging_setup.py)
+logging_setup.configure()
 logger = logging.getLogger(__name__)
+startup.mark("imports")
 
 
 class MP3Player:
     """Main music player application."""
 
-    def __init__(self, use_hardware=True, auto_connect_bt=True):
-        """Initialize the MP3 player."""
+    def __init__(
+        self,
+        use_hardware=True,
+        auto_connect_bt=True,
+        display=None,
+        input_manager=None,
+        audio=None,
+        start_server=True,
+    ):
+        """Initialize the MP3 player.
+
+        Only what the menu needs is set up here; the first frame is drawn
+        before VLC, the web server and Bluetooth start in the background.
+        display, input_manager and audio replace the default components
+        (see fakes.py).
+        """
         logger.info("Initializing MP3 Player...")
+        # .env and settings.json: applied now, then again whenever they change
+        self.settings = ConfigService()
+        self.settings.load()
 
         # Initialize components
-        self.display = Display(use_hardware=use_hardware)
-        self.input = InputManager(use_hardware=use_hardware)
-        self.audio = AudioPlayer()
+        self.display = display or Display(use_hardware=use_hardware)
+        # Decides when frames are due and dims/blanks the backlight
+        self.governor = RenderGovernor(self.display)
+        startup.mark("display_ready")
+        self.input = input_manager or InputManager(use_hardware=use_hardware)
+        self.audio = audio or AudioPlayer(background=True)
+        # Book-wide positions over one or more files; seeks go through it
+        self.timeline = Timeline(self.audio)
+        self.seek = SeekController(self.timeline)
         self.storage = Storage()
-
-        # Start the web server in a background thread
-        server_thread = threading.Thread(target=run_server, args=(self,), daemon=True)
-        server_thread.start()
+        self.session = Session()
+        # Cached catalogs for every source, fetched on first use
+        self.library = Library()
+        self.progress = ProgressSync() if FEATURES["PROGRESS_SYNC"] else None
+        self.offline = OfflineSync() if FEATURES["OFFLINE_SYNC"] else None
+        # Cover tiles for PLAYING, fetched and cached in the background
+        self.artwork = Artwork() if FEATURES["ARTWORK"] else None
+        # Spectrum bars take the cover's place while audio plays
+        self.visualizer = self.create_visualizer() if FEATURES["VISUALIZER"] else None
+        # Changed settings are applied between ticks
+        self.settings.on_change = self.input.wake
 
         # App state
         self.playlist = []
+        # Where self.playlist came from (a Source value or LIBRARY_VIEW), for the session snapshot
+        self.playlist_source = None
+        # (tracks, chapters, options) the current item resolved to
+        self.resolved = None
         self.bt_devices = []
+        # Scan filling BT_SCAN while it runs, and the version listed
+        self.discovery = None
+        self.discovery_version = 0
         self.current_index = 0
+        # Play order over self.playlist (shuffle, up next, history, repeat)
+        self.queue = PlayQueue()
+        self.queue_playlist = None
         self.scroll_index = 0
         self.view_state = "MENU"
-        self.menu_options = []
-        self.is_user_paused = False
+        # BROWSER shows the merged library; refreshed when library.version moves on
+        self.browsing_library = False
+        self.library_version = 0
+        # Built from FEATURES; the pre-rendered menu frame uses the same list
+        self.menu_options = assets.menu_options()
         self.track_start_time = 0
-
-        # Build menu based on features
-        if FEATURES["JELLYFIN"]:
-            self.menu_options.extend(["Jellyfin", "Jellyfin Shuffle"])
-        if FEATURES["ABS"]:
-            self.menu_options.append("Audiobookshelf")
-        if FEATURES["LOCAL"]:
-            self.menu_options.extend(["Local Files", "Local Shuffle"])
-        if FEATURES["BT_PAIR"]:
-            self.menu_options.append("Bluetooth Pair")
+        # Transient status line: (text, color, expiry time)
+        self.notice = None
+        # screen_state() when the last frame was drawn
+        self.rendered_state = None
+        # Scrolling title on screen, stepped between full frames
+        self.marquee = None
+        # Visualizer.version of the bars on the LCD
+        self.visualizer_shown = 0
 
         # Load bookmarks
         self.bookmarks = self.storage.load_bookmarks()
         self.last_save_time = time.time()
 
-        # Auto-connect to last Bluetooth device
-        if auto_connect_bt:
-            logger.info("Attempting auto-connect to last Bluetooth device...")
-            if BluetoothManager.auto_connect_last_device():
-                self.draw_message("BLUETOOTH", "Connected!", color="GREEN")
-                time.sleep(1)
-            else:
-                logger.debug("Auto-connect skipped or failed")
+        # Show the menu before anything slow happens
+        self.render()
+        startup.mark("first_frame")
 
+        self.start_background_services(auto_connect_bt, start_server)
+        if FEATURES["RESUME_SESSION"]:
+            self.restore_session()
         logger.info("MP3 Player initialized successfully")
 
+    # --- Background Startup ---
+    def start_background_services(self, auto_connect_bt=True, start_server=True):
+        """Start the web server and Bluetooth auto-connect off the main thread."""
+        if start_server:
+            threading.Thread(target=self._run_server, name="web", daemon=True).start()
+        if self.offline is not None:
+            self.offline.start()
+        self.settings.start()
+        if auto_connect_bt:
+            threading.Thread(
+                target=self._auto_connect_bluetooth, name="bt-autoconnect", daemon=True
+            ).start()
+
+    @staticmethod
+    def create_visualizer():
+        # Imported here so numpy stays out of startup unless it is wanted
+        from visualizer import Visualizer
+
+        return Visualizer(32, 4, 64)
+
+    # --- Settings ---
+    def apply_config(self, changed):
+        """Bring running parts in line with changed settings; playback carries on untouched."""
+        features = {name[len("FEATURE_"):] for name in changed if name.startswith("FEATURE_")}
+        if features & {"JELLYFIN", "ABS", "LOCAL", "BT_PAIR"}:
+            self.library.set_sources(enabled_sources())
+            # A menu background in assets.bin drawn for other entries is no longer used
+            self.menu_options = assets.menu_options()
+            if self.view_state == "MENU":
+                self.scroll_index = clamp(self.scroll_index, len(self.menu_options))
+        if "PROGRESS_SYNC" in features:
+            if FEATURES["PROGRESS_SYNC"] and self.progress is None:
+                self.progress = ProgressSync()
+            elif not FEATURES["PROGRESS_SYNC"] and self.progress is not None:
+                # Its final flush goes over the network, so not on the main loop
+                threading.Thread(target=self.progress.stop, name="progress-stop", daemon=True).start()
+                self.progress = None
+        if "OFFLINE_SYNC" in features:
+            if FEATURES["OFFLINE_SYNC"] and self.offline is None:
+                self.offline = OfflineSync()
+                self.offline.start()
+            elif not FEATURES["OFFLINE_SYNC"] and self.offline is not None:
+                self.offline.stop()
+                self.offline = None
+        if "ARTWORK" in features:
+            self.artwork = Artwork() if FEATURES["ARTWORK"] else None
+        if "VISUALIZER" in features:
+            if FEATURES["VISUALIZER"] and self.visualizer is None:
+                self.visualizer = self.create_visualizer()
+            elif not FEATURES["VISUALIZER"] and self.visualizer is not None:
+                self.visualizer.stop()
+                self.visualizer = None
+        # Catalogs from a server whose address or account changed are fetched again
+        for prefix, source in (("JELLYFIN_", Source.JELLYFIN), ("ABS_", Source.ABS)):
+            if any(name.startswith(prefix) for name in changed):
+                self.library.refresh(source)
+        self.show_notice("Settings updated")
+
+    def _run_server(self):
+        """Import Flask lazily and serve the web interface."""
+        try:
+            server = startup.timed_import("server")
+            startup.mark("server_started")
+            server.run_server(self)
+        except Exception as e:
+            logger.error(f"Web server failed: {e}")
+
+    def _auto_connect_bluetooth(self):
+        """Reconnect the last Bluetooth device without blocking the UI."""
+        logger.info("Attempting auto-connect to last Bluetooth device...")
+        if BluetoothManager.auto_connect_last_device():
+            startup.mark("bluetooth_connected")
+            self.show_notice("BT Connected!", color="GREEN")
+        else:
+            logger.debug("Auto-connect skipped or failed")
+
+    def show_notice(self, text, color="WHITE", seconds=2):
+        """Show a one-line status message at the bottom of the screen."""
+        self.notice = (text, color, time.time() + seconds)
+        self.governor.schedule(seconds)
+
     def play(self):
         """Play the current track."""
         if self.view_state == "PLAYING":
-            self.audio.play()
+            try:
+                self.audio.play()
+            except AudioUnavailable:
+                self.draw_error("Audio unavailable")
 
     def pause(self):
         """Pause the current track."""
         if self.view_state == "PLAYING":
-            self.audio.pause()
+            try:
+                self.audio.pause()
+            except AudioUnavailable:
+                self.draw_error("Audio unavailable")
 
     def next(self):
-        """Go to the next track."""
+        """Go to the next track in the queue."""
         if self.view_state == "PLAYING":
-            self.play_selection((self.current_index + 1) % len(self.playlist))
+            self.play_index(self.queue.next())
 
     def previous(self):
-        """Go to the previous track."""
+        """Go back to the track that played before this one."""
         if self.view_state == "PLAYING":
-            self.play_selection((self.current_index - 1) % len(self.playlist))
+            self.play_index(self.queue.previous())
+
+    # --- Play Queue ---
+    def sync_queue(self, shuffle=False):
+        """Start a new queue if the playlist has been replaced since it was built."""
+        if self.queue_playlist is not self.playlist:
+            self.queue.reset(len(self.playlist), shuffle=shuffle)
+            self.queue_playlist = self.playlist
+
+    def start_shuffle(self):
+        """Play the loaded playlist in a fresh random order."""
+        self.queue.reset(len(self.playlist), shuffle=True)
+        self.queue_playlist = self.playlist
+        self.play_index(self.queue.current)
+
+    def queue_item(self, index, play_next=True):
+        """Queue a playlist index to play next, or after everything already queued."""
+        self.sync_queue()
+        if play_next:
+            self.queue.play_next(index)
+        else:
+            self.queue.enqueue(index)
+
+    def toggle_shuffle(self):
+        self.sync_queue()
+        self.queue.set_shuffle(not self.queue.shuffle)
+        self.show_notice(f"Shuffle {'on' if self.queue.shuffle else 'off'}")
+
+    def cycle_repeat(self):
+        self.show_notice(f"Repeat {self.queue.cycle_repeat()}")
 
     # --- Content Loading ---
     def load_jellyfin(self, shuffle=False):
         """Load playlist from Jellyfin."""
         try:
-            self.playlist = JellyfinClient.get_items()
+            from api_clients import JellyfinClient
+
+            self.playlist = self.library.items(Source.JELLYFIN)
+            self.playlist_source = Source.JELLYFIN.value
+            self.browsing_library = False
+            self.merge_remote_progress()
+            if self.playlist:
+                # Measure the server while browsing, before anything streams
+                streaming.monitor.maybe_probe(
+                    JellyfinClient.ping_url(),
+                    JellyfinClient.get_stream_uri(self.playlist[0]["id"], streaming.DIRECT),
+                )
             if shuffle:
-                random.shuffle(self.playlist)
-                self.play_selection(0)
+                self.start_shuffle()
             else:
                 self.view_state, self.scroll_index = "BROWSER", 0
         except Exception as e:
@@ -117,62 +299,245 @@ class MP3Player:
     def load_abs(self):
         """Load playlist from Audiobookshelf."""
         try:
-            self.playlist = AudiobookshelfClient.get_items()
+            self.playlist = self.library.items(Source.ABS)
+            self.playlist_source = Source.ABS.value
+            self.browsing_library = False
+            self.merge_remote_progress()
             self.view_state, self.scroll_index = "BROWSER", 0
         except Exception as e:
             self.draw_error(f"ABS Fail: {str(e)[:15]}")
 
+    def merge_remote_progress(self):
+        """Pull server-side positions for the loaded catalog into the bookmarks."""
+        if self.progress is None:
+            return
+        try:
+            remote = remote_progress(self.playlist)
+            self.bookmarks = self.storage.merge_remote(self.bookmarks, remote)
+        except Exception as e:
+            logger.warning(f"Progress pull failed: {e}")
+
     def load_local(self, shuffle=False):
         """Load local files."""
-        items = LocalLibrary.get_items(shuffle=shuffle)
+        items = self.library.items(Source.LOCAL)
         if not items:
             self.draw_error("No Local Files")
             return
 
         self.playlist = items
+        self.playlist_source = Source.LOCAL.value
+        self.browsing_library = False
 
         if shuffle:
-            self.play_selection(0)
+            self.start_shuffle()
         else:
             self.view_state, self.scroll_index = "BROWSER", 0
 
+    def load_library(self):
+        """Browse every source in one list.
+
+        Local files are listed at once; sources not cached yet load in the
+        background and appear as they arrive.
+        """
+        if Source.LOCAL in self.library.sources:
+            self.library.items(Source.LOCAL)
+        self.library.load_async()
+        self.playlist = self.library.merged()
+        self.library_version = self.library.version
+        if not self.playlist and not self.library.loading:
+            self.draw_error("Library Empty")
+            return
+        self.playlist_source = LIBRARY_VIEW
+        self.browsing_library = True
+        self.view_state, self.scroll_index = "BROWSER", 0
+
+    def refresh_library_view(self):
+        """Pick up sources that finished loading, keeping the selection."""
+        selected = self.playlist[self.scroll_index]["name"] if self.playlist else None
+        self.playlist = self.library.merged()
+        self.library_version = self.library.version
+        names = [item["name"] for item in self.playlist]
+        self.scroll_index = names.index(selected) if selected in names else 0
+
     # --- Playback Control ---
     def play_selection(self, index):
-        """Play a selected item."""
+        """Play a selected item; the queue carries on from it."""
+        self.sync_queue()
+        self.play_index(self.queue.play(index))
+
+    def play_index(self, index, resume=True):
+        """Load and play a playlist index; None means the queue has ended."""
         self.save_bookmark()
+        self.seek.cancel()
+        if index is None:
+            try:
+                self.audio.pause()
+            except AudioUnavailable:
+                pass
+            self.show_notice("End of queue")
+            self.save_session(playing=False)
+            return
         self.current_index = index
-        self.is_user_paused = False
         item = self.playlist[index]
 
-        # Get stream URI
-        if item["source"] == Source.LOCAL.value:
-            uri = LocalLibrary.get_stream_uri(item)
-        elif item["source"] == Source.JELLYFIN.value:
-            uri = JellyfinClient.get_stream_uri(item["id"])
-        elif item["source"] == Source.ABS.value:
-            uri = AudiobookshelfClient.get_stream_uri(item)
-        else:
+        # Tracks plus the profile/caching to play them with; offline copies
+        # and other sources holding the same song are tried by the library
+        try:
+            self.resolved = tracks, chapters, options = self.library.resolve(item)
+        except Exception as e:
+            self.draw_error(f"Play Fail: {str(e)[:15]}")
             return
 
-        # Load and play
-        self.audio.load_uri(uri)
-
-        # Restore bookmark if exists
-        bookmark = self.storage.get_bookmark(self.bookmarks, item["name"])
-        if bookmark is not None:
-            self.audio.set_time(bookmark)
+        # Load and play, resuming from the bookmark if one exists
+        bookmark = self.storage.get_bookmark(self.bookmarks, item["name"]) if resume else None
+        try:
+            self.timeline.load(tracks, start_time=bookmark or 0, chapters=chapters, **options)
+        except AudioUnavailable:
+            self.draw_error("Audio unavailable")
+            return
 
         self.view_state = "PLAYING"
         self.track_start_time = time.time()
+        self.save_session(playing=True)
+        self.prefetch_artwork()
 
     def save_bookmark(self):
         """Save current playback position."""
         if self.playlist and self.view_state == "PLAYING":
             item = self.playlist[self.current_index]
-            pos = self.audio.get_time()
+            pos = self.seek.position()
             self.bookmarks = self.storage.save_bookmark(
                 self.bookmarks, item["name"], pos
             )
+            if self.progress is not None and pos > 0:
+                self.progress.record(item, pos, self.timeline.get_duration())
+
+    def prefetch_artwork(self):
+        """Start fetching art for the current track, then the next few in the queue."""
+        if self.artwork is None:
+            return
+        self.artwork.get(self.playlist[self.current_index])
+        if self.queue_playlist is self.playlist:
+            upcoming = self.queue.upcoming(ARTWORK["prefetch"])
+            self.artwork.prefetch([self.playlist[i] for i in upcoming])
+
+    # --- Session Snapshot ---
+    def save_session(self, playing=None):
+        """Snapshot what is playing for restore_session(); playing defaults to the audio state."""
+        if self.resolved is None or not self.playlist:
+            return
+        tracks, chapters, options = self.resolved
+        state = {
+            "view": self.view_state,
+            "playing": self.audio.is_playing() if playing is None else playing,
+            "playlist": {"source": self.playlist_source, "length": len(self.playlist)},
+            "index": self.current_index,
+            "item": self.playlist[self.current_index],
+            "position": self.seek.position(),
+            "tracks": tracks,
+            "chapters": chapters,
+            "options": options,
+            "queue": self.queue.to_dict() if self.queue_playlist is self.playlist else None,
+        }
+        try:
+            self.session.save(state)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Session snapshot failed: {e}")
+
+    def restore_session(self):
+        """Pick up the last snapshot: playing again if it was playing, else selected in the browser.
+
+        Uses only what is on disk (saved catalogs, resolved tracks, offline
+        copies); the catalog is refetched the next time the source is opened.
+        """
+        state = self.session.load()
+        if state is None:
+            return False
+        try:
+            self._restore(state)
+        except AudioUnavailable as e:
+            # The snapshot is fine; keep it for when audio works again
+            logger.warning(f"Could not restore session: {e}")
+            self.draw_error("Audio unavailable")
+            self.view_state, self.playlist, self.resolved = "MENU", [], None
+            return False
+        except Exception as e:
+            logger.warning(f"Could not restore session: {e}")
+            self.session.clear()
+            self.view_state, self.playlist, self.resolved = "MENU", [], None
+            return False
+        startup.mark("session_restored")
+        return True
+
+    def _restore(self, state):
+        from local_library import LocalLibrary
+
+        item, index = state["item"], state["index"]
+        source = state["playlist"]["source"]
+        if source == LIBRARY_VIEW:
+            self.library.load_saved()
+            playlist = self.library.merged()
+        elif source is not None:
+            self.library.load_saved([source])
+            playlist = self.library.cached(source) or []
+        else:
+            playlist = []
+        # The catalog may have changed since the snapshot; find the item by name
+        if not (index < len(playlist) and playlist[index]["name"] == item["name"]):
+            names = [entry["name"] for entry in playlist]
+            if item["name"] in names:
+                index = names.index(item["name"])
+            else:
+                playlist, index = [item], 0
+
+        self.playlist, self.playlist_source = playlist, source
+        self.browsing_library = source == LIBRARY_VIEW
+        self.library_version = self.library.version
+        saved = state.get("queue")
+        if saved and saved["length"] == len(playlist) and saved["current"] == index:
+            self.queue = PlayQueue.from_dict(saved)
+        else:
+            self.queue.reset(len(playlist), shuffle=bool(saved and saved["shuffle"]), start=index)
+        self.queue_playlist = playlist
+        self.current_index = self.scroll_index = index
+
+        if not state["playing"]:
+            # Paused: wait in the browser with the track selected
+            self.view_state = "BROWSER"
+            return
+        tracks, chapters, options = state["tracks"], state["chapters"], state["options"]
+        if item["source"] != Source.LOCAL.value:
+            offline = LocalLibrary.offline_copy(item)
+            if offline is not None:
+                tracks, chapters, options = (*offline, {"profile": "offline"})
+        self.resolved = tracks, chapters, options
+        self.timeline.load(tracks, start_time=state["position"], chapters=chapters, **options)
+        self.view_state = "PLAYING"
+        self.track_start_time = time.time()
+        self.prefetch_artwork()
+        logger.info(f"Resumed {item['name']} at {state['position'] // 1000}s")
+
+    def list_length(self):
+        """Number of rows in the current list view."""
+        if self.view_state == "MENU":
+            return len(self.menu_options)
+        if self.view_state == "BROWSER":
+            return len(self.playlist)
+        if self.view_state == "BT_SCAN":
+            return len(self.bt_devices)
+        return 0
+
+    def scroll(self, delta):
+        """Move the selection by delta rows, clamped to the list."""
+        self.scroll_index = clamp(self.scroll_index + delta, self.list_length())
+
+    def page(self, direction):
+        """Move the selection one screen up (-1) or down (1)."""
+        self.scroll_index = page(self.scroll_index, direction, self.list_length())
+
+    def jump_to_percent(self, percent):
+        """Move the selection to a percentage of the way through the list."""
+        self.scroll_index = percent_index(percent, self.list_length())
 
     def jump_to_letter(self, direction):
         """Jump to next/previous letter in playlist."""
@@ -199,30 +564,46 @@ class MP3Player:
 
     # --- Bluetooth ---
     def scan_bluetooth(self):
-        """Scan for Bluetooth devices."""
-        self.draw_message("BLUETOOTH", "Scanning (5s)...")
-        try:
-            self.bt_devices = BluetoothManager.scan_devices()
-            if not self.bt_devices:
-                self.draw_error("No BT Devices")
-                self.view_state = "MENU"
-            else:
-                self.view_state, self.scroll_index = "BT_SCAN", 0
-        except Exception as e:
-            self.draw_error(f"BT Fail: {str(e)[:15]}")
+        """Open BT_SCAN and list devices as a background scan finds them."""
+        self.stop_bluetooth_scan()
+        self.bt_devices, self.discovery_version = [], 0
+        self.discovery = Discovery(on_change=self.input.wake)
+        self.discovery.start()
+        self.view_state, self.scroll_index = "BT_SCAN", 0
+
+    def update_bluetooth_scan(self):
+        """Pick up devices found since the last tick; leave BT_SCAN if the scan found none."""
+        discovery = self.discovery
+        if discovery.version != self.discovery_version:
+            self.discovery_version = discovery.version
+            self.bt_devices = discovery.devices
+        if not discovery.running:
+            self.discovery = None
+            if not self.bt_devices and self.view_state == "BT_SCAN":
+                self.view_state, self.scroll_index = "MENU", 0
+                self.show_notice("No BT Devices", color="RED")
+
+    def stop_bluetooth_scan(self):
+        if self.discovery is not None:
+            self.discovery.stop()
+            self.discovery = None
 
     def connect_bluetooth(self, index):
-        """Connect to a Bluetooth device."""
+        """Connect to a Bluetooth device (stopping the scan if it is still running)."""
         if index >= len(self.bt_devices):
             return
 
+        # Discovery slows down paging, so the connection is made without it
+        self.stop_bluetooth_scan()
         device = self.bt_devices[index]
         self.draw_message("CONNECTING", device["name"][:15])
 
         try:
-            BluetoothManager.connect(device["mac"], device["name"])
-            self.draw_message("SUCCESS", "Audio Routed!", color="GREEN")
-            time.sleep(2)
+            # A device that is still connected switches over without reconnecting
+            if BluetoothManager.connect(device["mac"], device["name"]):
+                self.show_notice("Audio Routed!", color="GREEN")
+            else:
+                self.show_notice("BT Connect Failed", color="RED")
         except Exception as e:
             self.draw_error(f"BT Error: {str(e)[:15]}")
 
@@ -231,106 +612,192 @@ class MP3Player:
     # --- UI Rendering ---
     def draw_message(self, title, msg, color="BLUE"):
         """Draw a message on the display."""
-        self.display.clear()
-        self.display.draw_rectangle(0, 0, 128, 128, fill=color)
+        if f"banner_{color}" in assets.SCREENS:
+            self.display.draw_static(f"banner_{color}")
+        else:
+            self.display.clear()
+            self.display.draw_rectangle(0, 0, 128, 128, fill=color)
         self.display.draw_text(10, 45, title, fill="WHITE")
         self.display.draw_text(10, 65, msg[:18], fill="WHITE")
-        self.display.show_image()
+        self.display.show_regions((0, 44, 128, 78))
 
     def draw_error(self, msg):
         """Draw an error message."""
-        self.display.clear()
-        self.display.draw_rectangle(0, 0, 128, 128, fill="RED")
-        self.display.draw_text(10, 50, "ERROR:", fill="WHITE")
+        self.display.draw_static("error")
         self.display.draw_text(10, 70, msg, fill="WHITE")
-        self.display.show_image()
+        self.display.show_regions((0, 69, 128, 82))
         time.sleep(2)
 
+    def draw_scrollbar(self, total):
+        """Draw a position thumb on the right edge for lists longer than a screen."""
+        if total <= VISIBLE_ROWS:
+            return
+        top, height = 25, VISIBLE_ROWS * 18
+        thumb = max(3, height * VISIBLE_ROWS // total)
+        y = top + (height - thumb) * self.scroll_index // (total - 1)
+        self.display.draw_rectangle(124, y, 126, y + thumb, fill="GRAY")
+
+    @metrics.timed("render")
     def render(self):
         """Render the current view."""
+        previous, self.marquee = self.marquee, None
+        if self.view_state == "MENU":
+            self.render_menu()
+            return
         self.display.clear()
         
         # Draw Bluetooth indicator in top-right if connected
         if BluetoothManager.is_connected():
             self.display.draw_text(105, 5, "BT", fill="CYAN")
 
-        if self.view_state == "MENU":
-            self.display.draw_text(5, 5, "-- SOURCES --", fill="YELLOW")
-            for i, opt in enumerate(self.menu_options):
-                color = "WHITE" if self.scroll_index == i else "GRAY"
-                self.display.draw_text(10, 25 + (i * 18), opt, fill=color)
-
-        elif self.view_state == "BROWSER":
-            src = self.playlist[0]["source"] if self.playlist else ""
+        if self.view_state == "BROWSER":
+            if self.browsing_library:
+                src = "ALL..." if self.library.loading else "ALL"
+            else:
+                src = self.playlist[0]["source"] if self.playlist else ""
             self.display.draw_text(5, 5, f"-- {src} --", fill="CYAN")
-            start = max(0, self.scroll_index - 2)
-            for i in range(5):
-                idx = start + i
-                if idx < len(self.playlist):
-                    is_bk = "*" if self.playlist[idx]["name"] in self.bookmarks else ""
-                    color = "WHITE" if idx == self.scroll_index else "GRAY"
-                    self.display.draw_text(
-                        10,
-                        25 + (i * 18),
-                        f"{is_bk}{self.playlist[idx]['name'][:14]}",
-                        fill=color,
-                    )
+            total = len(self.playlist)
+            for i, idx in enumerate(visible_window(self.scroll_index, total)):
+                is_bk = "*" if self.playlist[idx]["name"] in self.bookmarks else ""
+                text = f"{is_bk}{self.playlist[idx]['name']}"
+                if idx == self.scroll_index:
+                    # The selected row scrolls to show the whole name
+                    self.show_marquee(previous, text, 10, 25 + (i * 18), 112, "WHITE")
+                else:
+                    self.display.draw_text(10, 25 + (i * 18), text[:15], fill="GRAY")
+            self.draw_scrollbar(total)
 
         elif self.view_state == "BT_SCAN":
-            self.display.draw_text(5, 5, "-- DEVICES --", fill="MAGENTA")
-            start = max(0, self.scroll_index - 2)
-            for i in range(5):
-                idx = start + i
-                if idx < len(self.bt_devices):
-                    color = "WHITE" if idx == self.scroll_index else "GRAY"
-                    self.display.draw_text(
-                        10,
-                        25 + (i * 18),
-                        self.bt_devices[idx]["name"][:14],
-                        fill=color,
+            scanning = self.discovery is not None
+            self.display.draw_text(
+                5, 5, "-- SCANNING --" if scanning else "-- DEVICES --", fill="MAGENTA"
+            )
+            if not self.bt_devices and scanning:
+                self.display.draw_text(10, 25, "Searching...", fill="GRAY")
+            for i, idx in enumerate(visible_window(self.scroll_index, len(self.bt_devices))):
+                color = "WHITE" if idx == self.scroll_index else "GRAY"
+                y = 25 + (i * 18)
+                device = self.bt_devices[idx]
+                self.display.draw_text(10, y, device["name"][:14], fill=color)
+                # Signal strength as up to three rising bars
+                for bar in range(signal_level(device["rssi"])):
+                    self.display.draw_rectangle(
+                        110 + bar * 4, y + 9 - bar * 3, 112 + bar * 4, y + 11, fill=color
                     )
 
         elif self.view_state == "PLAYING":
             song = self.playlist[self.current_index]
-            self.display.draw_text(5, 10, "NOW PLAYING", fill="GREEN")
-            self.display.draw_text(5, 40, song["name"][:18], fill="WHITE")
+            if self.artwork is not None or self.visualizer is not None:
+                # Cover or bars on top (outlined until there is a tile), text below
+                name_y, chapter_y, bar_y, mode_y = 70, 81, 94, 101
+                if self.visualizer is not None and self.visualizer.active:
+                    tile = self.visualizer.frame
+                    self.visualizer_shown = self.visualizer.version
+                else:
+                    tile = self.artwork.get(song) if self.artwork is not None else None
+                if tile is not None:
+                    self.display.draw_frame(tile, 32, 4)
+                else:
+                    self.display.draw_rectangle(32, 4, 95, 67, outline="GRAY")
+            else:
+                name_y, chapter_y, bar_y, mode_y = 40, 55, 75, 92
+                self.display.draw_text(5, 10, "NOW PLAYING", fill="GREEN")
+            self.show_marquee(previous, song["name"], 5, name_y, 118, "WHITE")
             # Use duration from item metadata if available, otherwise use audio player duration
-            length = song.get("duration") or self.audio.get_duration()
-            cur = self.audio.get_time()
+            length = song.get("duration") or self.timeline.get_duration()
+            cur = self.seek.position()
+            chapter = self.timeline.chapter_title(cur)
+            if chapter:
+                self.display.draw_text(5, chapter_y, chapter[:18], fill="GRAY")
             if length > 0 and cur >= 0:
                 bar = int((cur / length) * 110)
-                self.display.draw_rectangle(10, 75, 120, 80, outline="WHITE")
-                self.display.draw_rectangle(10, 75, 10 + bar, 80, fill="BLUE")
+                self.display.draw_rectangle(10, bar_y, 120, bar_y + 5, outline="WHITE")
+                self.display.draw_rectangle(10, bar_y, 10 + bar, bar_y + 5, fill="BLUE")
+            mode = f"{'SHUF ' if self.queue.shuffle else ''}RPT {self.queue.repeat.upper()}"
+            self.display.draw_text(5, mode_y, mode, fill="GRAY")
+
+        if self.notice:
+            text, color, expiry = self.notice
+            if time.time() < expiry:
+                self.display.draw_text(5, 115, text, fill=color)
+            else:
+                self.notice = None
 
         self.display.show_image()
+        metrics.count("frames")
+
+    def show_marquee(self, previous, text, x, y, width, fill):
+        """Draw a title that scrolls if too wide, reusing the previous frame's strip."""
+        if previous is not None and previous.key == (text, x, y, width, fill):
+            marquee = previous
+        else:
+            marquee = Marquee(text, x, y, width, self.display.font, fill=fill)
+        marquee.draw(self.display)
+        self.marquee = marquee
+
+    def render_menu(self):
+        """Render the menu over its pre-rendered background.
+
+        Only the highlighted row, the BT indicator and the notice line are
+        drawn per frame; with an asset bundle only those regions are sent.
+        """
+        self.display.draw_static("menu")
+        regions = []
+        y = assets.MENU_TOP + self.scroll_index * assets.MENU_ROW
+        self.display.draw_text(10, y, self.menu_options[self.scroll_index], fill="WHITE")
+        regions.append((0, y, 124, y + 14))
+        if BluetoothManager.is_connected():
+            self.display.draw_text(105, 5, "BT", fill="CYAN")
+            regions.append(assets.SCREENS["icon_bt"][1])
+        if self.notice:
+            text, color, expiry = self.notice
+            if time.time() < expiry:
+                self.display.draw_rectangle(0, 113, 128, 128, fill="BLACK")
+                self.display.draw_text(5, 115, text, fill=color)
+                regions.append((0, 113, 128, 128))
+            else:
+                self.notice = None
+        self.display.show_regions(*regions)
+        metrics.count("frames")
 
     # --- Input Handling ---
+    @metrics.timed("handle_input")
     def handle_input(self):
-        """Handle button inputs."""
-        # UP/DOWN Navigation
-        if self.input.is_pressed("UP"):
-            self.scroll_index = max(0, self.scroll_index - 1)
-            time.sleep(0.15)
-
-        if self.input.is_pressed("DOWN"):
-            limit = (
-                len(self.menu_options)
-                if self.view_state == "MENU"
-                else (
-                    len(self.playlist)
-                    if self.view_state == "BROWSER"
-                    else len(self.bt_devices)
-                )
-            )
-            if limit > 0:
-                self.scroll_index = min(limit - 1, self.scroll_index + 1)
-            time.sleep(0.15)
+        """Dispatch queued button events."""
+        for event in self.input.get_events():
+            metrics.count("input_events")
+            # The first press on a blank screen only turns it back on
+            if not self.governor.activity() and event.kind == "press":
+                continue
+            if self.marquee is not None:
+                self.marquee.restart()
+            if event.kind != "release":
+                self.handle_event(event)
+
+    def handle_event(self, event):
+        """Handle a single button press or auto-repeat."""
+        button = event.button
+
+        # While playing: UP cycles repeat, DOWN toggles shuffle
+        if button in ("UP", "DOWN") and self.view_state == "PLAYING":
+            if event.kind == "press":
+                if button == "UP":
+                    self.cycle_repeat()
+                else:
+                    self.toggle_shuffle()
+
+        # UP/DOWN Navigation (accelerates while held)
+        elif button in ("UP", "DOWN"):
+            step = scroll_step(event.repeat, self.list_length())
+            self.scroll(step if button == "DOWN" else -step)
 
         # SELECTION (PRESS)
-        if self.input.is_pressed("PRESS"):
+        elif button == "PRESS":
             if self.view_state == "MENU":
                 choice = self.menu_options[self.scroll_index]
-                if choice == "Jellyfin":
+                if choice == "Library":
+                    self.load_library()
+                elif choice == "Jellyfin":
                     self.load_jellyfin(shuffle=False)
                 elif choice == "Jellyfin Shuffle":
                     self.load_jellyfin(shuffle=True)
@@ -347,90 +814,192 @@ class MP3Player:
             elif self.view_state == "BT_SCAN":
                 self.connect_bluetooth(self.scroll_index)
             elif self.view_state == "PLAYING":
-                if self.audio.is_playing():
-                    self.audio.pause()
-                    self.is_user_paused = True
-                else:
-                    self.audio.play()
-                    self.is_user_paused = False
+                playing = not self.audio.is_playing()
+                try:
+                    if playing:
+                        self.audio.play()
+                    else:
+                        self.audio.pause()
+                except AudioUnavailable:
+                    self.draw_error("Audio unavailable")
+                    return
                 self.save_bookmark()
-            time.sleep(0.3)
+                self.save_session(playing)
 
         # BACK (KEY1)
-        if self.input.is_pressed("KEY1"):
+        elif button == "KEY1":
+            self.stop_bluetooth_scan()
             self.save_bookmark()
             self.view_state, self.scroll_index = "MENU", 0
-            time.sleep(0.3)
 
-        if self.input.is_pressed("KEY2"):
+        elif button == "KEY2":
             if self.view_state == "PLAYING":
-                self.next()
+                # Next chapter in books, next track otherwise or after the last
+                target = self.timeline.chapter_target(self.seek.position(), 1)
+                if target is not None:
+                    self.seek.seek_to(target)
+                else:
+                    self.next()
             elif self.view_state == "BROWSER":
-                self.play_selection(self.scroll_index)
-            time.sleep(0.3)
+                self.page(1)
 
-        if self.input.is_pressed("KEY3"):
+        elif button == "KEY3":
             if self.view_state == "PLAYING":
+                # In books: restart or go back a chapter
+                target = self.timeline.chapter_target(self.seek.position(), -1)
+                if target is not None:
+                    self.seek.seek_to(target)
+                    return
                 # If track started recently (within 3 seconds), go to previous track
                 # Otherwise, restart the current track
                 elapsed = time.time() - self.track_start_time
                 if elapsed < 3:
                     self.previous()
                 else:
-                    self.audio.set_time(0)
+                    self.seek.seek_to(0)
             elif self.view_state == "BROWSER":
-                self.play_selection(self.scroll_index)
-            time.sleep(0.3)
+                self.page(-1)
 
-        # LEFT/RIGHT (Skip/Letter Jump)
-        if self.input.is_pressed("LEFT"):
+        # LEFT/RIGHT (Skip/Letter Jump, held: 10% jumps)
+        elif button == "LEFT":
             if self.view_state == "BROWSER":
-                self.jump_to_letter(-1)
+                if event.kind == "repeat":
+                    total = len(self.playlist)
+                    pct = index_percent(self.scroll_index, total)
+                    self.jump_to_percent(max(0, pct - PERCENT_STEP))
+                else:
+                    self.jump_to_letter(-1)
             elif self.view_state == "PLAYING":
-                pos = self.audio.get_time()
-                self.audio.set_time(max(0, pos - 15000))
-            time.sleep(0.2)
+                self.seek.skip(-15000)
 
-        if self.input.is_pressed("RIGHT"):
+        elif button == "RIGHT":
             if self.view_state == "BROWSER":
-                self.jump_to_letter(1)
+                if event.kind == "repeat":
+                    total = len(self.playlist)
+                    pct = index_percent(self.scroll_index, total)
+                    self.jump_to_percent(min(100, pct + PERCENT_STEP))
+                else:
+                    self.jump_to_letter(1)
             elif self.view_state == "PLAYING":
-                pos = self.audio.get_time()
-                new_pos = pos + 30000
-                # Only cap to duration if duration is valid (positive)
-                duration = self.audio.get_duration()
-                logger.info(f"RIGHT seek: current pos={pos}, new pos={new_pos}, duration={duration}")
-                if duration > 0:
-                    new_pos = min(duration - 100, new_pos)
-                self.audio.set_time(new_pos)
-            time.sleep(0.2)
+                self.seek.skip(30000, self.timeline.get_duration())
+
+    def screen_state(self):
+        """What the current frame depends on, apart from playback position."""
+        return (
+            self.view_state,
+            self.scroll_index,
+            self.current_index,
+            id(self.playlist),
+            self.discovery_version,
+            self.discovery is not None,
+            self.notice,
+            self.audio.is_playing(),
+            self.browsing_library and self.library.loading,
+            self.queue.shuffle,
+            self.queue.repeat,
+            self.artwork.version if self.artwork is not None else 0,
+        )
+
+    def target_fps(self):
+        """Frame rate the current view needs (the progress bar moves only while playing)."""
+        animating = self.view_state != "PLAYING" or self.audio.is_playing()
+        return self.governor.fps(self.view_state, animating)
+
+    def tick(self):
+        """Run one iteration of the main loop."""
+        self.governor.wakeup()
+        self.handle_input()
+        if (
+            self.view_state == "PLAYING"
+            and time.time() - self.last_save_time > 15
+        ):
+            self.save_bookmark()
+            self.save_session()
+            self.last_save_time = time.time()
+        # Auto-play next track when VLC reports the current one finished
+        ended = self.timeline.consume_end()
+        if self.audio.consume_error():
+            self.show_notice("Playback error", color="RED")
+        elif ended and self.view_state == "PLAYING":
+            # Repeat-one (or a one-item queue) starts the same track over
+            index = self.queue.next(auto=True)
+            self.play_index(index, resume=index != self.current_index)
+        if (
+            self.browsing_library
+            and self.view_state == "BROWSER"
+            and self.library.version != self.library_version
+        ):
+            self.refresh_library_view()
+        if self.settings.pending:
+            self.apply_config(self.settings.apply_pending())
+        if self.discovery is not None:
+            self.update_bluetooth_scan()
+        if self.visualizer is not None:
+            self.visualizer.set_active(
+                self.view_state == "PLAYING" and self.audio.is_playing() and not self.governor.blank
+            )
+        # Changes made off the input path (web API, track ends, notices)
+        state = self.screen_state()
+        if state != self.rendered_state:
+            self.governor.invalidate()
+        if self.governor.should_render(self.target_fps()):
+            self.render()
+            self.governor.frame()
+            self.rendered_state = state
+        elif not self.governor.blank:
+            self.show_windows()
+
+    def show_windows(self):
+        """Between full frames, send just the title row and the bars if they moved."""
+        if self.marquee is not None:
+            window = self.marquee.window()
+            if window is not None:
+                self.display.show_window(window)
+        if (
+            self.visualizer is not None
+            and self.visualizer.active
+            and self.view_state == "PLAYING"
+            and self.visualizer.version != self.visualizer_shown
+            and self.visualizer.frame is not None
+        ):
+            self.visualizer_shown = self.visualizer.version
+            self.display.show_window(self.visualizer.frame)
+
+    def sleep_time(self):
+        """Seconds the main loop can sleep: the governor's timeout, or the next marquee/bars step."""
+        timeout = self.governor.timeout(self.target_fps())
+        if self.governor.blank:
+            return timeout
+        if self.marquee is not None:
+            step = self.marquee.timeout()
+            if step is not None:
+                timeout = min(timeout, step)
+        if self.visualizer is not None and self.visualizer.active:
+            timeout = min(timeout, self.visualizer.interval)
+        return timeout
 
     def run(self):
         """Main application loop."""
         try:
             while True:
-                self.handle_input()
-                if (
-                    self.view_state == "PLAYING"
-                    and time.time() - self.last_save_time > 15
-                ):
-                    self.save_bookmark()
-                    self.last_save_time = time.time()
-                # Auto-play next track when current finishes
-                if self.view_state == "PLAYING" and not self.audio.is_playing() and not self.is_user_paused:
-                    if self.current_index < len(self.playlist) - 1:
-                        self.next()
-                    else:
-                        # Loop back to start of playlist
-                        self.play_selection(0)
-                self.render()
-                time.sleep(0.05)
+                self.tick()
+                # Sleep until a frame is due, waking early on button events
+                self.input.wait(self.sleep_time())
         except KeyboardInterrupt:
             self.shutdown()
 
     def shutdown(self):
         """Clean up resources."""
         self.save_bookmark()
+        self.save_session()
+        self.stop_bluetooth_scan()
+        self.settings.stop()
+        if self.progress is not None:
+            self.progress.stop()
+        if self.offline is not None:
+            self.offline.stop()
+        if self.visualizer is not None:
+            self.visualizer.stop()
         self.input.cleanup()
         self.display.cleanup()
 
@@ -0,0 +1,165 @@
+"""Batched playback progress sync with Jellyfin and Audiobookshelf.
+
+save_bookmark runs every few seconds while playing; sending each position
+straight to the servers would mean a request every time. Positions are
+coalesced per item instead and flushed on an interval: one ABS batch
+request plus one Jellyfin report per item that changed. Updates that
+cannot be sent are kept in a queue file and retried on the next flush.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+import metrics
+from app_config import PROGRESS, PROGRESS_QUEUE_FILE
+from utils import Source
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressSync:
+    """Coalesces position updates and pushes them to the servers."""
+
+    def __init__(self, interval=None, queue_file=PROGRESS_QUEUE_FILE, start=True):
+        self.interval = PROGRESS["flush_interval_s"] if interval is None else interval
+        self.queue_file = queue_file
+        # "source:id" -> latest update for that item
+        self.pending = self._load_queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if start:
+            self._thread = threading.Thread(target=self._run, name="progress-sync", daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def key(item):
+        """Pending-queue key for a playlist item, or None if it has no server."""
+        if item.get("source") in (Source.JELLYFIN.value, Source.ABS.value):
+            return f"{item['source']}:{item['id']}"
+        return None
+
+    def record(self, item, position_ms, duration_ms=0):
+        """Queue an item's position, replacing any unsent one."""
+        key = self.key(item)
+        if key is None:
+            return
+        update = {
+            "source": item["source"],
+            # Jellyfin ids arrive as UUIDs from the SDK
+            "id": str(item["id"]),
+            "position_ms": int(position_ms),
+            "duration_ms": int(duration_ms or 0),
+            "updated": time.time(),
+        }
+        if item["source"] == Source.ABS.value:
+            update["library_item_id"] = item.get("parent_id", update["id"])
+            if update["library_item_id"] != update["id"]:
+                update["episode_id"] = update["id"]
+        with self._lock:
+            if key in self.pending:
+                metrics.count("progress_coalesced")
+            self.pending[key] = update
+
+    def flush(self):
+        """Send everything pending; failed updates stay queued."""
+        with self._lock:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return 0
+
+        failed = {}
+        abs_updates = {k: u for k, u in batch.items() if u["source"] == Source.ABS.value}
+        if abs_updates:
+            try:
+                from api_clients import AudiobookshelfClient
+
+                AudiobookshelfClient.update_progress(list(abs_updates.values()))
+                metrics.count("progress_requests")
+            except Exception as e:
+                logger.warning(f"ABS progress sync failed: {e}")
+                failed.update(abs_updates)
+
+        for key, update in batch.items():
+            if update["source"] != Source.JELLYFIN.value:
+                continue
+            try:
+                from api_clients import JellyfinClient
+
+                JellyfinClient.report_progress(update["id"], update["position_ms"])
+                metrics.count("progress_requests")
+            except Exception as e:
+                logger.warning(f"Jellyfin progress sync failed: {e}")
+                failed[key] = update
+
+        with self._lock:
+            # Anything recorded during the flush is newer than what failed
+            for key, update in failed.items():
+                self.pending.setdefault(key, update)
+            self._save_queue()
+        return len(batch) - len(failed)
+
+    def stop(self):
+        """Stop the flush thread after a final flush."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def _load_queue(self):
+        if os.path.exists(self.queue_file):
+            try:
+                with open(self.queue_file, "r") as f:
+                    return json.load(f)
+            except Exception:
+                return {}
+        return {}
+
+    def _save_queue(self):
+        """Persist unsent updates so they survive a restart; caller holds the lock."""
+        try:
+            if self.pending:
+                # Write-then-rename so a crash never leaves a truncated queue
+                tmp = f"{self.queue_file}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump(self.pending, f)
+                os.replace(tmp, self.queue_file)
+            elif os.path.exists(self.queue_file):
+                os.remove(self.queue_file)
+        except Exception as e:
+            logger.error(f"Could not save progress queue: {e}")
+
+
+def remote_progress(playlist):
+    """Server-side positions for a freshly loaded catalog.
+
+    Returns {item name: (position_ms, updated)} for Storage.merge_remote.
+    Jellyfin positions come with the items themselves; ABS needs one
+    request for the user's progress.
+    """
+    remote = {}
+    abs_items = []
+    for item in playlist:
+        if item.get("source") == Source.JELLYFIN.value and item.get("resume_ms"):
+            remote[item["name"]] = (item["resume_ms"], item.get("last_played", 0))
+        elif item.get("source") == Source.ABS.value:
+            abs_items.append(item)
+
+    if abs_items:
+        from api_clients import AudiobookshelfClient
+
+        progress = AudiobookshelfClient.get_progress()
+        for item in abs_items:
+            parent = item.get("parent_id", item["id"])
+            episode = item["id"] if parent != item["id"] else None
+            entry = progress.get((parent, episode))
+            if entry and entry[0] > 0:
+                remote[item["name"]] = entry
+    return remote
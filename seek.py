@@ -0,0 +1,107 @@
+"""Coalesced, asynchronous seeking."""
+import logging
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Quiet period after the last skip press before the seek is sent to VLC
+SEEK_SETTLE = 0.25
+
+
+class SeekController:
+    """Turns bursts of skip presses into a single seek.
+
+    Each skip moves a pending target relative to the previous target, so
+    four quick RIGHT presses become one +120 s seek and one HTTP range
+    request. The target is shown immediately via position(), and the
+    seek itself is applied on a worker thread once presses stop.
+    """
+
+    def __init__(self, audio, settle=SEEK_SETTLE):
+        self.audio = audio
+        self.settle = settle
+        self.target = None
+        self._deadline = 0.0
+        self._first_press = 0.0
+        # Bumped by cancel(); a seek from an older generation is dropped
+        self._generation = 0
+        self._cond = threading.Condition()
+        # Held while a seek is applied, so cancel() can wait one out
+        self._applying = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="seek", daemon=True)
+        self._thread.start()
+
+    def position(self):
+        """Position to display: the pending target, else the player's position."""
+        target = self.target
+        return target if target is not None else self.audio.get_time()
+
+    def skip(self, delta, duration=0):
+        """Queue a relative seek of delta ms, capped to the track duration."""
+        now = time.monotonic()
+        with self._cond:
+            if self.target is None:
+                base = self.audio.get_time()
+                self._first_press = now
+            else:
+                base = self.target
+            target = max(0, base + delta)
+            # Only cap to duration if duration is valid (positive)
+            if duration > 0:
+                target = min(duration - 100, target)
+            self.target = target
+            self._deadline = now + self.settle
+            self._cond.notify()
+
+    def seek_to(self, position):
+        """Seek to an absolute position without waiting for more presses."""
+        with self._cond:
+            if self.target is None:
+                self._first_press = time.monotonic()
+            self.target = position
+            self._deadline = 0.0
+            self._cond.notify()
+
+    def cancel(self):
+        """Drop any pending seek, e.g. when the track changes.
+
+        Returns once no seek can reach the player any more, so a new track
+        loaded after this never receives the old track's position.
+        """
+        with self._cond:
+            self.target = None
+            self._generation += 1
+        with self._applying:
+            pass
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self.target is None:
+                    self._cond.wait()
+                delay = self._deadline - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                target = self.target
+                first_press = self._first_press
+                generation = self._generation
+            with self._applying:
+                with self._cond:
+                    stale = generation != self._generation
+                if stale:
+                    logger.debug(f"Seek to {target} ms dropped (track changed)")
+                    continue
+                try:
+                    self.audio.set_time(target)
+                    logger.debug(f"Seek to {target} ms")
+                except Exception as e:
+                    logger.error(f"Seek failed: {e}")
+            with self._cond:
+                # Keep the target if another press arrived while seeking
+                if self.target == target:
+                    self.target = None
+            metrics.observe("seek_apply", time.monotonic() - first_press)
@@ -1,4 +1,8 @@
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
+
+import metrics
+from bluetooth import router
+from play_queue import PlayQueue
 
 app = Flask(__name__)
 
@@ -44,7 +48,9 @@ def get_sources():
 def select_source():
     source = request.json.get('source')
     if player_control and source:
-        if "Jellyfin" in source:
+        if source == "Library":
+            player_control.load_library()
+        elif "Jellyfin" in source:
             player_control.load_jellyfin()
         elif "Audiobook" in source:
             player_control.load_abs()
@@ -63,6 +69,13 @@ def get_playlist():
         return jsonify([item['name'] for item in player_control.playlist])
     return jsonify([])
 
+@app.route('/api/browser/jump/<int:percent>', methods=['POST'])
+def jump_to_percent(percent):
+    if player_control:
+        player_control.jump_to_percent(percent)
+        return jsonify({'status': 'jumped', 'index': player_control.scroll_index})
+    return jsonify({'status': 'error', 'message': 'player not ready'}), 400
+
 @app.route('/api/play_item/<int:index>', methods=['POST'])
 def play_item(index):
     if player_control:
@@ -70,6 +83,49 @@ def play_item(index):
         return jsonify({'status': 'playing_item', 'index': index})
     return jsonify({'status': 'error', 'message': 'player not ready'}), 400
 
+@app.route('/api/queue', methods=['GET'])
+def get_queue():
+    if player_control and player_control.queue_playlist is player_control.playlist:
+        queue, playlist = player_control.queue, player_control.playlist
+        return jsonify({
+            'current': queue.current,
+            'up_next': [{'index': i, 'name': playlist[i]['name']} for i in queue.upcoming(10)],
+            'history': [{'index': i, 'name': playlist[i]['name']} for i in list(queue.history)[-10:]],
+            'shuffle': queue.shuffle,
+            'repeat': queue.repeat,
+        })
+    # Nothing queued from the list on screen; the modes still apply to the next one
+    queue = player_control.queue if player_control else PlayQueue()
+    return jsonify({'current': None, 'up_next': [], 'history': [], 'shuffle': queue.shuffle, 'repeat': queue.repeat})
+
+@app.route('/api/queue/next/<int:index>', methods=['POST'])
+def queue_next(index):
+    if player_control and 0 <= index < len(player_control.playlist):
+        player_control.queue_item(index, play_next=True)
+        return jsonify({'status': 'queued_next', 'index': index})
+    return jsonify({'status': 'error', 'message': 'player not ready or bad index'}), 400
+
+@app.route('/api/queue/add/<int:index>', methods=['POST'])
+def queue_add(index):
+    if player_control and 0 <= index < len(player_control.playlist):
+        player_control.queue_item(index, play_next=False)
+        return jsonify({'status': 'queued', 'index': index})
+    return jsonify({'status': 'error', 'message': 'player not ready or bad index'}), 400
+
+@app.route('/api/queue/shuffle', methods=['POST'])
+def queue_shuffle():
+    if player_control:
+        player_control.toggle_shuffle()
+        return jsonify({'status': 'ok', 'shuffle': player_control.queue.shuffle})
+    return jsonify({'status': 'error', 'message': 'player not ready'}), 400
+
+@app.route('/api/queue/repeat', methods=['POST'])
+def queue_repeat():
+    if player_control:
+        player_control.cycle_repeat()
+        return jsonify({'status': 'ok', 'repeat': player_control.queue.repeat})
+    return jsonify({'status': 'error', 'message': 'player not ready'}), 400
+
 @app.route('/api/bt/scan', methods=['POST'])
 def scan_bluetooth():
     if player_control:
@@ -90,6 +146,37 @@ def connect_bluetooth(index):
         return jsonify({'status': 'connecting_bt', 'index': index})
     return jsonify({'status': 'error', 'message': 'player not ready'}), 400
 
+@app.route('/api/audio', methods=['GET'])
+def get_audio_routing():
+    return jsonify(router.status())
+
+@app.route('/api/audio/switch/<mac>', methods=['POST'])
+def switch_audio(mac):
+    if router.switch(mac.upper()):
+        return jsonify({'status': 'switched', 'active': router.active})
+    return jsonify({'status': 'error', 'message': 'device not connected'}), 400
+
+@app.route('/api/audio/volume', methods=['POST'])
+def set_audio_volume():
+    if router.set_volume(request.json.get('percent', 0), request.json.get('mac')):
+        return jsonify({'status': 'ok', 'volume': router.volume(request.json.get('mac') or router.active)})
+    return jsonify({'status': 'error', 'message': 'no active device'}), 400
+
+@app.route('/api/settings', methods=['GET'])
+def get_settings():
+    if player_control:
+        return jsonify(player_control.settings.settings())
+    return jsonify({})
+
+@app.route('/api/settings', methods=['POST'])
+def update_settings():
+    if player_control:
+        errors = player_control.settings.update(request.json or {})
+        if errors:
+            return jsonify({'status': 'error', 'errors': errors}), 400
+        return jsonify({'status': 'ok'})
+    return jsonify({'status': 'error', 'message': 'player not ready'}), 400
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     if player_control:
@@ -101,6 +188,35 @@ def get_status():
         return jsonify(status)
     return jsonify({'view_state': 'UNAVAILABLE'})
 
+@app.route('/api/offline', methods=['GET'])
+def offline_status():
+    if player_control and player_control.offline is not None:
+        return jsonify(player_control.offline.status)
+    return jsonify({'state': 'disabled'})
+
+@app.route('/api/offline/sync', methods=['POST'])
+def offline_sync():
+    if player_control and player_control.offline is not None:
+        player_control.offline.sync_async(force=True)
+        return jsonify({'status': 'sync_started'})
+    return jsonify({'status': 'error', 'message': 'offline sync disabled'}), 400
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profiler', methods=['GET'])
+def get_profile():
+    return Response(metrics.profiler.collapsed(), mimetype='text/plain')
+
+@app.route('/api/profiler', methods=['POST'])
+def toggle_profiler():
+    if request.json.get('enabled'):
+        metrics.profiler.start()
+    else:
+        metrics.profiler.stop()
+    return jsonify({'status': 'profiling' if metrics.profiler.running else 'stopped'})
+
 
 def run_server(player):
     global player_control
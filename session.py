@@ -0,0 +1,60 @@
+"""Session snapshots, so a reboot resumes where the player left off.
+
+While something is loaded the player writes what it is doing to
+session.json: the view, which playlist (source and length), the current
+item and the tracks it resolved to, the position and the play queue. On
+boot the snapshot is played straight from those saved tracks (or the
+item's offline copy) and the on-disk catalogs, without a catalog fetch.
+"""
+import json
+import logging
+import os
+import time
+
+import metrics
+from app_config import SESSION_FILE
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the snapshot layout changes; older snapshots are ignored
+VERSION = 1
+
+# Playlist source recorded for the merged library browser
+LIBRARY_VIEW = "LIBRARY"
+
+
+class Session:
+    """Reads and atomically replaces the session snapshot file."""
+
+    def __init__(self, path=SESSION_FILE):
+        self.path = path
+
+    @metrics.timed("session_save")
+    def save(self, state):
+        """Write a snapshot dict; a crash mid-write leaves the previous one."""
+        state = {**state, "version": VERSION, "saved": time.time()}
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, default=str)
+        os.replace(tmp, self.path)
+
+    def load(self):
+        """The last snapshot, or None if there is none or it is unusable."""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring session snapshot: {e}")
+            return None
+        if state.get("version") != VERSION or not state.get("item"):
+            return None
+        return state
+
+    def clear(self):
+        """Forget the snapshot so the next boot starts at the menu."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
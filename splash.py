@@ -0,0 +1,26 @@
+"""Boot splash: put the pre-rendered splash frame on the LCD immediately.
+
+Runs before player.py (ExecStartPre in the systemd unit) so the screen
+lights up while the app is still importing. Needs only the LCD driver and
+assets.bin; no PIL or numpy.
+"""
+import sys
+
+import assets
+
+
+def main():
+    bundle = assets.load()
+    frame = bundle.get("splash") if bundle else None
+    if frame is None:
+        return 0
+    import LCD_1in44
+
+    lcd = LCD_1in44.LCD()
+    lcd.LCD_Init(LCD_1in44.SCAN_DIR_DFT)
+    assets.blit(lcd, frame.data, frame.x, frame.y, frame.width, frame.height)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Startup timeline instrumentation.
+
+Import this module first so its clock starts as early as possible. Stage
+marks and per-module import times are measured from process start (read
+from /proc when available) and logged, so a slow boot can be broken down
+the way ``python -X importtime`` does for imports.
+"""
+import importlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _process_age():
+    """Seconds since this process was started, or 0 if unknown."""
+    try:
+        with open("/proc/self/stat") as f:
+            # starttime is field 22, counted after the ")" closing the comm field
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+_T0 = time.perf_counter() - _process_age()
+_lock = threading.Lock()
+marks = {}
+imports = {}
+
+
+def elapsed():
+    """Seconds since process start."""
+    return time.perf_counter() - _T0
+
+
+def mark(stage):
+    """Record the first time a startup stage is reached; True if this was it."""
+    with _lock:
+        if stage in marks:
+            return False
+        marks[stage] = elapsed()
+    logger.info(
+        f"Startup: {stage} at {marks[stage] * 1000:.0f} ms",
+        extra={"stage": stage, "elapsed_ms": round(marks[stage] * 1000, 1)},
+    )
+    return True
+
+
+def timed_import(name):
+    """Import a module, recording how long it took if it was not yet loaded."""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    duration = time.perf_counter() - start
+    if duration > 0.001:
+        with _lock:
+            imports.setdefault(name, duration)
+        logger.debug(f"Import {name}: {duration * 1000:.1f} ms")
+    return module
+
+
+def report():
+    """Stage and import timings in milliseconds."""
+    with _lock:
+        return {
+            "stages": {k: round(v * 1000, 1) for k, v in marks.items()},
+            "imports": {k: round(v * 1000, 1) for k, v in imports.items()},
+        }
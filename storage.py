@@ -1,13 +1,20 @@
 """Bookmark and persistence management."""
 import json
 import os
+import time
 from app_config import BOOKMARK_FILE
 
 BLUETOOTH_DEVICE_FILE = "bt_device.json"
+BLUETOOTH_VOLUME_FILE = "bt_volumes.json"
 
 
 class Storage:
-    """Handles bookmark persistence."""
+    """Handles bookmark persistence.
+
+    Bookmarks map an item name to {"position": ms, "updated": epoch s}.
+    They are a merged view: local saves and server-side progress pulled
+    when a catalog loads, whichever was updated last.
+    """
 
     @staticmethod
     def load_bookmarks():
@@ -15,24 +22,47 @@ class Storage:
         if os.path.exists(BOOKMARK_FILE):
             try:
                 with open(BOOKMARK_FILE, "r") as f:
-                    return json.load(f)
+                    bookmarks = json.load(f)
             except Exception:
                 return {}
+            # Older files stored a bare position per name
+            return {
+                name: entry if isinstance(entry, dict) else {"position": entry, "updated": 0}
+                for name, entry in bookmarks.items()
+            }
         return {}
 
+    @staticmethod
+    def _write(bookmarks):
+        with open(BOOKMARK_FILE, "w") as f:
+            json.dump(bookmarks, f)
+
     @staticmethod
     def save_bookmark(bookmarks, item_name, position):
         """Save a bookmark for an item."""
         if position > 0:
-            bookmarks[item_name] = position
-            with open(BOOKMARK_FILE, "w") as f:
-                json.dump(bookmarks, f)
+            bookmarks[item_name] = {"position": position, "updated": time.time()}
+            Storage._write(bookmarks)
         return bookmarks
 
     @staticmethod
     def get_bookmark(bookmarks, item_name):
         """Get bookmark position for an item."""
-        return bookmarks.get(item_name, None)
+        entry = bookmarks.get(item_name)
+        return entry["position"] if entry else None
+
+    @staticmethod
+    def merge_remote(bookmarks, remote):
+        """Fold server positions {name: (position, updated)} in where newer."""
+        changed = False
+        for name, (position, updated) in remote.items():
+            local = bookmarks.get(name)
+            if local is None or updated > local["updated"]:
+                bookmarks[name] = {"position": position, "updated": updated}
+                changed = True
+        if changed:
+            Storage._write(bookmarks)
+        return bookmarks
 
     @staticmethod
     def save_last_bluetooth_device(mac_address, device_name):
@@ -55,3 +85,22 @@ class Storage:
                 return None
         return None
 
+    @staticmethod
+    def save_bluetooth_volumes(volumes):
+        """Save per-device volume percentages {mac: percent}."""
+        tmp = f"{BLUETOOTH_VOLUME_FILE}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(volumes, f)
+            os.replace(tmp, BLUETOOTH_VOLUME_FILE)
+        except Exception:
+            pass
+
+    @staticmethod
+    def load_bluetooth_volumes():
+        """Load per-device volume percentages."""
+        try:
+            with open(BLUETOOTH_VOLUME_FILE, "r") as f:
+                return json.load(f)
+        except Exception:
+            return {}
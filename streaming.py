@@ -0,0 +1,145 @@
+"""Stream profile selection and network-adaptive caching.
+
+Jellyfin items are played direct when VLC can decode their container and
+their bitrate is within the cap, transcoded otherwise. How much VLC buffers
+before starting is sized from the measured RTT and throughput to the
+server instead of a fixed 3 s.
+"""
+import logging
+import threading
+import time
+
+import metrics
+from app_config import STREAMING
+
+logger = logging.getLogger(__name__)
+
+# Stream profiles; also used as metric labels
+DIRECT = "direct"
+UNIVERSAL = "universal"
+TRANSCODE = "transcode"
+
+LOSSLESS = ("flac", "alac", "wav", "aiff", "ape")
+LOSSLESS_KBPS = 1411
+LOSSY_KBPS = 320
+
+# Re-measure the network at most this often (seconds)
+PROBE_INTERVAL = 300
+PROBE_BYTES = 256 * 1024
+# Weight of the newest sample in the running estimates
+SMOOTHING = 0.3
+
+
+def choose_profile(item, max_bitrate_kbps=None):
+    """Pick DIRECT, UNIVERSAL or TRANSCODE for a Jellyfin item."""
+    cap = STREAMING["max_bitrate_kbps"] if max_bitrate_kbps is None else max_bitrate_kbps
+    container = (item.get("container") or "").lower()
+    if not container:
+        # Unknown format: let the server decide via its universal endpoint
+        return UNIVERSAL
+    if container not in STREAMING["direct_play"]:
+        return TRANSCODE
+    if 0 < cap < expected_bitrate(item, DIRECT, cap):
+        return TRANSCODE
+    return DIRECT
+
+
+def expected_bitrate(item, profile, max_bitrate_kbps=None):
+    """Rough bitrate in kbps of the stream a profile will produce."""
+    cap = STREAMING["max_bitrate_kbps"] if max_bitrate_kbps is None else max_bitrate_kbps
+    if profile == DIRECT:
+        # The file's own rate when the server reported it, else a guess from the container
+        if item.get("bitrate"):
+            return item["bitrate"]
+        lossless = (item.get("container") or "").lower() in LOSSLESS
+        return LOSSLESS_KBPS if lossless else LOSSY_KBPS
+    return min(cap, LOSSY_KBPS) if cap else LOSSY_KBPS
+
+
+class NetworkMonitor:
+    """Running RTT and throughput estimates for the media server."""
+
+    def __init__(self):
+        self.rtt = None  # seconds
+        self.throughput = None  # kbps
+        self._last_probe = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _smooth(old, new):
+        return new if old is None else old + SMOOTHING * (new - old)
+
+    def record_rtt(self, seconds):
+        """Fold a round-trip time into the estimate."""
+        self.rtt = self._smooth(self.rtt, seconds)
+        metrics.gauge("network_rtt_ms", round(self.rtt * 1000, 1))
+
+    def record_transfer(self, nbytes, seconds):
+        """Fold an observed download into the throughput estimate."""
+        if nbytes <= 0 or seconds <= 0:
+            return
+        self.throughput = self._smooth(self.throughput, nbytes * 8 / 1000 / seconds)
+        metrics.gauge("network_throughput_kbps", round(self.throughput))
+
+    def caching_ms(self, bitrate_kbps):
+        """VLC network caching for a stream of bitrate_kbps.
+
+        A few round trips cover the initial requests; when the stream uses
+        most of the measured throughput, the buffer grows toward the max so
+        dips in Wi-Fi don't stall playback.
+        """
+        low, high = STREAMING["min_caching_ms"], STREAMING["max_caching_ms"]
+        if self.rtt is None or self.throughput is None:
+            return STREAMING["default_caching_ms"]
+        load = bitrate_kbps / self.throughput
+        if load >= 0.8:
+            return high
+        caching = low + 4 * self.rtt * 1000 + load * (high - low)
+        return int(max(low, min(high, caching)))
+
+    def maybe_probe(self, ping_url, sample_url):
+        """Measure the server in the background if the estimate is stale."""
+        with self._lock:
+            if self._probing or time.monotonic() - self._last_probe < PROBE_INTERVAL:
+                return
+            self._probing = True
+        threading.Thread(
+            target=self._probe, args=(ping_url, sample_url), name="net-probe", daemon=True
+        ).start()
+
+    def _probe(self, ping_url, sample_url):
+        import requests
+
+        try:
+            # Best of three pings; the first may include connection setup
+            rtts = []
+            for _ in range(3):
+                start = time.monotonic()
+                requests.get(ping_url, timeout=5)
+                rtts.append(time.monotonic() - start)
+            self.record_rtt(min(rtts))
+
+            start = time.monotonic()
+            received = 0
+            headers = {"Range": f"bytes=0-{PROBE_BYTES - 1}"}
+            with requests.get(sample_url, headers=headers, stream=True, timeout=10) as r:
+                r.raise_for_status()
+                for chunk in r.iter_content(chunk_size=16384):
+                    received += len(chunk)
+                    if received >= PROBE_BYTES:
+                        break
+            self.record_transfer(received, time.monotonic() - start)
+            logger.info(
+                f"Network probe: rtt={self.rtt * 1000:.0f} ms, "
+                f"throughput={self.throughput:.0f} kbps"
+            )
+        except Exception as e:
+            logger.warning(f"Network probe failed: {e}")
+        finally:
+            with self._lock:
+                self._probing = False
+                self._last_probe = time.monotonic()
+
+
+monitor = NetworkMonitor()
@@ -0,0 +1,121 @@
+"""One position range over a book split across several audio files."""
+import logging
+import threading
+from bisect import bisect_right
+
+logger = logging.getLogger(__name__)
+
+# Pressing "previous chapter" this far into a chapter restarts it instead (ms)
+CHAPTER_RESTART = 3000
+
+
+class Timeline:
+    """Maps book positions onto (file, offset) and drives the audio player.
+
+    Positions, durations and seeks are book-wide; crossing a file
+    boundary loads the next file. A single file of unknown length is a
+    plain pass-through to the audio player.
+
+    Seeks arrive from the seek worker while the main loop loads books and
+    rolls over files, so the file index and track list change under a lock.
+    """
+
+    def __init__(self, audio):
+        self.audio = audio
+        self.tracks = []
+        self.chapters = []
+        self.index = 0
+        self._load_options = {}
+        self._lock = threading.RLock()
+
+    def load(self, tracks, start_time=0, chapters=None, **load_options):
+        """Play tracks ([(uri, duration_ms)], -1 if unknown) from a book position."""
+        starts, start = [], 0
+        for uri, duration in tracks:
+            starts.append(start)
+            start += max(duration, 0)
+        with self._lock:
+            self.tracks = [
+                {"uri": uri, "start": s, "duration": d} for (uri, d), s in zip(tracks, starts)
+            ]
+            self.chapters = chapters or []
+            self._load_options = load_options
+            self._open(*self._locate(start_time))
+
+    def _locate(self, position):
+        """(track index, offset in that track) for a book position."""
+        if len(self.tracks) < 2:
+            return 0, position
+        starts = [t["start"] for t in self.tracks]
+        index = max(0, bisect_right(starts, position) - 1)
+        track = self.tracks[index]
+        return index, min(position - track["start"], max(track["duration"] - 100, 0))
+
+    def _open(self, index, offset):
+        self.index = index
+        track = self.tracks[index]
+        logger.debug(f"Opening track {index + 1}/{len(self.tracks)} at {offset} ms")
+        self.audio.load_uri(track["uri"], start_time=offset, **self._load_options)
+
+    @property
+    def offset(self):
+        """Book position where the current file starts."""
+        return self.tracks[self.index]["start"] if self.tracks else 0
+
+    def get_time(self):
+        """Book position in milliseconds."""
+        with self._lock:
+            return self.offset + self.audio.get_time()
+
+    def set_time(self, position):
+        """Seek to a book position, switching files if needed."""
+        with self._lock:
+            index, offset = self._locate(position)
+            if index == self.index:
+                self.audio.set_time(offset)
+            else:
+                self._open(index, offset)
+
+    def get_duration(self):
+        """Book length in milliseconds."""
+        with self._lock:
+            if len(self.tracks) < 2:
+                return self.audio.get_duration()
+            return self.tracks[-1]["start"] + self.tracks[-1]["duration"]
+
+    def consume_end(self):
+        """True once the last file ends; earlier files roll over to the next."""
+        with self._lock:
+            if not self.audio.consume_end():
+                return False
+            if self.index < len(self.tracks) - 1:
+                self._open(self.index + 1, 0)
+                return False
+            return True
+
+    # --- Chapters ---
+    def chapter_index(self, position):
+        """Index of the chapter containing position, or None without chapters."""
+        if not self.chapters:
+            return None
+        starts = [c["start"] for c in self.chapters]
+        return max(0, bisect_right(starts, position) - 1)
+
+    def chapter_title(self, position):
+        index = self.chapter_index(position)
+        return None if index is None else self.chapters[index]["title"]
+
+    def chapter_target(self, position, direction):
+        """Book position for a chapter jump, or None past either end.
+
+        Going back from more than CHAPTER_RESTART into a chapter restarts it.
+        """
+        index = self.chapter_index(position)
+        if index is None:
+            return None
+        if direction < 0 and position - self.chapters[index]["start"] > CHAPTER_RESTART:
+            return self.chapters[index]["start"]
+        index += 1 if direction > 0 else -1
+        if 0 <= index < len(self.chapters):
+            return self.chapters[index]["start"]
+        return None
@@ -0,0 +1,246 @@
+"""Spectrum bars for the PLAYING view.
+
+PCM is tapped from PulseAudio's monitor of the sink VLC plays to (parec),
+so the audio path itself is untouched: if the visualizer falls behind it
+only skips frames. Samples land in a single-producer ring buffer that
+never blocks the reader thread. A worker wakes at a capped rate, takes
+the latest window, decimates it, applies a Hann window and an rfft, folds
+the bins into log-spaced bars and draws them straight into a small
+RGB565 tile. If its measured CPU use exceeds the budget it lowers its own
+rate.
+"""
+import logging
+import os
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from app_config import VISUALIZER
+from assets import Frame
+
+logger = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """Latest samples of an int16 stream; one writer, one reader, no locks.
+
+    The writer only ever advances `written` after copying its samples in,
+    so a reader that sees the count also sees the data. A reader lapped
+    while copying gets None rather than torn samples.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self.written = 0
+
+    def write(self, samples):
+        n = len(samples)
+        if n >= self.capacity:
+            samples, n = samples[-self.capacity:], self.capacity
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:n - first] = samples[first:]
+        self.written += n
+
+    def latest(self, n):
+        """Copy of the newest n samples, or None if not enough have arrived."""
+        end = self.written
+        if end < n or n > self.capacity:
+            return None
+        start = (end - n) % self.capacity
+        if start + n <= self.capacity:
+            samples = self._data[start:start + n].copy()
+        else:
+            samples = np.concatenate((self._data[start:], self._data[:n - (self.capacity - start)]))
+        if self.written - end > self.capacity - n:
+            return None
+        return samples
+
+
+class PcmTap:
+    """Reads mono 16-bit PCM from a PulseAudio monitor source into a RingBuffer."""
+
+    CHUNK = 4096
+
+    def __init__(self, config=None):
+        self.config = config or VISUALIZER
+        self.process = None
+        self._thread = None
+
+    def start(self, ring):
+        if self.process is not None:
+            return
+        command = [
+            "parec", "--raw", "--format=s16le", "--channels=1",
+            f"--rate={self.config['rate']}", "--latency-msec=50",
+            f"--device={self.config['source']}",
+        ]
+        try:
+            # Niced so that the tap loses any contention with playback
+            self.process = subprocess.Popen(
+                command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                preexec_fn=lambda: os.nice(10),
+            )
+        except OSError as e:
+            logger.warning(f"Visualizer tap unavailable: {e}")
+            return
+        self._thread = threading.Thread(
+            target=self._read, args=(self.process, ring), name="pcm-tap", daemon=True
+        )
+        self._thread.start()
+
+    def _read(self, process, ring):
+        fd = process.stdout.fileno()
+        pending = b""
+        while True:
+            try:
+                chunk = os.read(fd, self.CHUNK)
+            except OSError:
+                break
+            if not chunk:
+                break
+            # Keep sample boundaries when a read splits one
+            chunk, pending = pending + chunk, b""
+            if len(chunk) % 2:
+                chunk, pending = chunk[:-1], chunk[-1:]
+            ring.write(np.frombuffer(chunk, dtype="<i2"))
+
+    def stop(self):
+        process, self.process = self.process, None
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class Spectrum:
+    """Bar heights (0..1) from a block of samples."""
+
+    def __init__(self, config=None):
+        self.config = config or VISUALIZER
+        size, bars = self.config["fft_size"], self.config["bars"]
+        self.decimate = self.config["decimate"]
+        self.block = size * self.decimate
+        self.window = np.hanning(size).astype(np.float32)
+        # Log-spaced band edges over the rfft bins, skipping DC; each band gets a bin at least
+        edges = np.geomspace(1, size // 2, bars + 1).astype(int)
+        for i in range(1, len(edges)):
+            edges[i] = max(edges[i], edges[i - 1] + 1)
+        self.edges = edges[:-1]
+        self.bars = bars
+        self.levels = np.zeros(self.bars, dtype=np.float32)
+
+    def compute(self, samples):
+        """Smoothed bar levels for the newest block of samples."""
+        # Averaging groups of samples is a cheap low-pass before decimation
+        block = samples[-self.block:].astype(np.float32).reshape(-1, self.decimate).mean(axis=1)
+        spectrum = np.abs(np.fft.rfft(block * self.window))
+        bands = np.maximum.reduceat(spectrum, self.edges)
+        floor, ceiling = self.config["floor_db"], self.config["ceiling_db"]
+        db = 20 * np.log10(bands + 1e-3)
+        levels = np.clip((db - floor) / (ceiling - floor), 0.0, 1.0)
+        # Bars jump up at once and fall back gradually
+        decay = self.config["decay"]
+        self.levels = np.maximum(levels, self.levels * decay)
+        return self.levels
+
+
+class Visualizer:
+    """Worker turning tapped PCM into a bar tile at a capped frame rate.
+
+    frame is the latest tile as an assets.Frame placed at (x, y); version
+    goes up with each new one.
+    """
+
+    def __init__(self, x, y, size, tap=None, config=None):
+        self.config = config or VISUALIZER
+        self.x, self.y, self.size = x, y, size
+        self.spectrum = Spectrum(self.config)
+        # A second of audio; the worker only ever reads the newest block
+        self.ring = RingBuffer(max(self.config["rate"], self.spectrum.block * 4))
+        self.tap = tap or PcmTap(self.config)
+        self.frame = None
+        self.version = 0
+        self.interval = 1 / self.config["fps"]
+        self._active = threading.Event()
+        self._stop = False
+        self._thread = None
+
+        # Column -> bar index (-1 for gaps), and the pixel row grid, for drawing
+        pitch = size // self.spectrum.bars
+        columns = np.arange(size)
+        self._bar_of_column = np.where(columns % pitch < pitch - 1, columns // pitch, -1)
+        self._bar_of_column[self._bar_of_column >= self.spectrum.bars] = -1
+        self._rows = np.arange(size)[:, None]
+        self._colors = np.where(
+            np.arange(size) < size // 4, self.config["peak_color"], self.config["color"]
+        ).astype(">u2")[:, None]
+
+    @property
+    def active(self):
+        return self._active.is_set()
+
+    def set_active(self, active):
+        """Run the tap and worker only while bars are on screen."""
+        if active == self.active:
+            return
+        if active:
+            self.tap.start(self.ring)
+            self._active.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="visualizer", daemon=True)
+                self._thread.start()
+        else:
+            self._active.clear()
+            self.tap.stop()
+            self.spectrum.levels[:] = 0
+
+    def stop(self):
+        self._stop = True
+        self.set_active(False)
+        self._active.set()
+
+    def tile(self, levels):
+        """RGB565 bytes of the bars for levels."""
+        heights = np.round(levels * self.size).astype(int)
+        column_heights = np.where(self._bar_of_column >= 0, heights[self._bar_of_column], 0)
+        lit = self._rows >= self.size - column_heights[None, :]
+        return np.where(lit, self._colors, np.uint16(0)).astype(">u2").tobytes()
+
+    def _run(self):
+        budget = self.config["cpu_budget"]
+        window_start, window_cpu = time.monotonic(), time.thread_time()
+        next_frame = time.monotonic()
+        while not self._stop:
+            self._active.wait()
+            if self._stop:
+                break
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_frame = max(next_frame + self.interval, time.monotonic())
+            samples = self.ring.latest(self.spectrum.block)
+            if samples is None:
+                continue
+            with metrics.timer("visualizer_frame"):
+                data = self.tile(self.spectrum.compute(samples))
+                self.frame = Frame("visualizer", self.x, self.y, self.size, self.size, data)
+                self.version += 1
+
+            # Once a second, compare CPU used with the budget and adjust the rate
+            now = time.monotonic()
+            if now - window_start >= 1.0:
+                cpu = (time.thread_time() - window_cpu) / (now - window_start)
+                metrics.gauge("visualizer_cpu_percent", round(cpu * 100, 2))
+                if cpu > budget:
+                    self.interval = min(self.interval * 2, 1.0)
+                elif cpu < budget / 2 and self.interval > 1 / self.config["fps"]:
+                    self.interval = max(self.interval / 2, 1 / self.config["fps"])
+                window_start, window_cpu = now, time.thread_time()